@@ -1,15 +1,30 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
+from bulk_actions import BulkActions
 from home import HomePage
+from virtual_tree import VirtualTreeview
+from search_bar import SearchBar
+from summary_panel import SummaryWindow
 from edit_reservation import EditReservationPage
 
 class ReservationsPage(tk.Frame):
     def __init__(self, parent, controller):
         super().__init__(parent)
         self.controller = controller
+        self.loaded = False
+        
+        # Debounced search over name, flight, route and date range
+        search_bar = SearchBar(self, on_search=self.search_reservations)
+        search_bar.pack(fill='x', padx=10, pady=(10, 0))
         
         # Treeview for reservations
-        self.tree = ttk.Treeview(self, columns=('id', 'name', 'flight', 'departure', 'destination', 'date', 'seat'), show='headings')
+        db = controller.db
+        self.tree = VirtualTreeview(self, db.method('count_reservations'), db.method('get_reservations_page'),
+                                    fetch_rows=db.method('get_reservations_by_ids'),
+                                    fetch_ids=db.method('get_reservation_ids'),
+                                    collect_changes=db.method('collect_changes'),
+                                    run=db.submit,
+                                    columns=('id', 'name', 'flight', 'departure', 'destination', 'date', 'seat'), show='headings')
         
         # Define headings
         self.tree.heading('id', text='ID')
@@ -20,6 +35,10 @@ class ReservationsPage(tk.Frame):
         self.tree.heading('date', text='Date')
         self.tree.heading('seat', text='Seat')
         
+        # Clicking a heading sorts by it in SQL, along an index
+        self.tree.make_sortable({'id': 'id', 'name': 'name', 'flight': 'flight_number',
+                                 'departure': 'departure', 'destination': 'destination', 'date': 'date'})
+        
         # Set column widths
         self.tree.column('id', width=50)
         self.tree.column('name', width=120)
@@ -29,8 +48,19 @@ class ReservationsPage(tk.Frame):
         self.tree.column('date', width=100)
         self.tree.column('seat', width=80)
         
+        scrollbar = ttk.Scrollbar(self, orient='vertical')
+        scrollbar.pack(side='right', fill='y')
+        self.tree.attach_scrollbar(scrollbar)
+        
         self.tree.pack(fill='both', expand=True, padx=10, pady=10)
         
+        footer = ttk.Label(self)
+        footer.pack()
+        self.tree.attach_footer(footer)
+        
+        # Delete, reassign and seat shifts act on every selected row at once
+        self.bulk = BulkActions(self, db, self.tree, on_done=self.sync_reservations)
+        
         # Add buttons
         btn_frame = tk.Frame(self)
         btn_frame.pack(pady=10)
@@ -41,6 +71,19 @@ class ReservationsPage(tk.Frame):
         delete_btn = ttk.Button(btn_frame, text="Delete", command=self.delete_reservation)
         delete_btn.pack(side='left', padx=5)
         
+        reassign_btn = ttk.Button(btn_frame, text="Reassign", command=self.bulk.reassign)
+        reassign_btn.pack(side='left', padx=5)
+        
+        shift_btn = ttk.Button(btn_frame, text="Shift Seats", command=self.bulk.shift_seats)
+        shift_btn.pack(side='left', padx=5)
+        
+        select_btn = ttk.Button(btn_frame, text="Select All", command=self.tree.select_all)
+        select_btn.pack(side='left', padx=5)
+        
+        summary_btn = ttk.Button(btn_frame, text="Summary",
+                                 command=lambda: SummaryWindow(self, controller.db))
+        summary_btn.pack(side='left', padx=5)
+        
         back_btn = ttk.Button(btn_frame, text="Back", 
                              command=lambda: controller.show_frame(HomePage))
         back_btn.pack(side='left', padx=5)
@@ -48,26 +91,31 @@ class ReservationsPage(tk.Frame):
     def on_show(self):
         """Refresh data when page is shown"""
         try:
-            self.load_reservations()
+            if self.loaded:
+                self.sync_reservations()
+            else:
+                self.load_reservations()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load reservations: {str(e)}")
     
     def load_reservations(self):
-        """Load reservations from database into the treeview"""
-        # Clear existing data
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
+        """Load the visible window of reservations into the treeview"""
         try:
-            # Load from database
-            reservations = self.controller.db.get_all_reservations()
-            for res in reservations:
-                self.tree.insert('', 'end', values=res)
+            self.tree.refresh()
+            self.loaded = True
         except AttributeError:
             messagebox.showerror("Error", "Database connection not available")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load reservations: {str(e)}")
     
+    def search_reservations(self, filters):
+        """Narrow the treeview to reservations matching the search bar"""
+        self.tree.set_filters(filters)
+    
+    def sync_reservations(self):
+        """Patch only the rows that changed since the treeview was last synced"""
+        self.tree.sync()
+    
     def edit_reservation(self):
         """Open edit page for selected reservation"""
         selected = self.tree.selection()
@@ -76,33 +124,14 @@ class ReservationsPage(tk.Frame):
             return
         
         try:
-            reservation_id = self.tree.item(selected[0])['values'][0]
-            # Check if EditReservationPage exists in controller
-            if EditReservationPage not in self.controller.frames:
-                messagebox.showerror("Error", "Edit page not available")
-                return
-                
+            reservation_id = int(selected[0])
             self.controller.show_frame(EditReservationPage)
-            edit_page = self.controller.frames[EditReservationPage]
+            edit_page = self.controller.get_frame(EditReservationPage)
             if hasattr(edit_page, 'load_reservation'):
                 edit_page.load_reservation(reservation_id)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to edit reservation: {str(e)}")
     
     def delete_reservation(self):
-        """Delete selected reservation"""
-        selected = self.tree.selection()
-        if not selected:
-            messagebox.showwarning("Warning", "Please select a reservation to delete")
-            return
-        
-        if not messagebox.askyesno("Confirm", "Are you sure you want to delete this reservation?"):
-            return
-        
-        try:
-            reservation_id = self.tree.item(selected[0])['values'][0]
-            self.controller.db.delete_reservation(reservation_id)
-            self.load_reservations()
-            messagebox.showinfo("Success", "Reservation deleted successfully")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to delete reservation: {str(e)}")
\ No newline at end of file
+        """Delete the selected reservations"""
+        self.bulk.delete()
@@ -0,0 +1,433 @@
+"""Headless JSON API for reservations, for kiosks and agents without a Tk display.
+
+    python api_server.py --port 8080 --readers 4
+    python api_server.py --metrics-port 9464 --slow-query-ms 50    (see metrics.py)
+
+    POST   /reservations         {"name": ..., "flight_number": ..., "departure": ...,
+                                  "destination": ..., "date": ..., "seat_number": ...,
+                                  "hold": ...}   (hold optional, see /holds)
+    GET    /reservations         ?limit=50&after_id=...&name=...&flight_number=...
+                                  &departure=...&destination=...&date_from=...&date_to=...
+    GET    /reservations/<id>
+    PUT    /reservations/<id>    same body as POST, plus the "version" last read;
+                                 answers 409 if the row changed since
+    DELETE /reservations/<id>
+    GET    /flights/<flight_number>/<date>   reservations on one flight
+    GET    /routes               ?from=JFK&to=Paris&date=2024-05-01&max_connections=2
+                                  &min_layover=45&max_layover=360&limit=20
+                                 itineraries, see routes.py
+    POST   /bookings             {"contact": ..., "passengers": [{same fields as POST
+                                  /reservations, seat_number optional}, ...]}
+                                 books a group under one PNR, all or nothing
+    GET    /bookings/<pnr>
+    POST   /holds                {"flight_number": ..., "date": ..., "seat_number": ...,
+                                  "holder": ..., "ttl": 120, "token": ...}
+                                 holds a free seat, see holds.py; with the token of
+                                 an earlier hold, extends or moves it
+    DELETE /holds/<token>
+
+Requests are parsed on one asyncio loop. Keep-alive connections may
+pipeline: each request is dispatched as soon as it is read, and the
+responses are written back in request order. All database work goes
+through a DatabasePool, so the loop itself never blocks on SQLite.
+With ``--profile replica`` (see replication.py) only GETs are served.
+"""
+import argparse
+import asyncio
+import json
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+import metrics
+from connection import DEFAULT_PROFILE, PROFILES, get_profile
+from database import RESERVATION_COLUMNS, ConflictError, Database
+from validation import (FIELDS, normalize_date, normalize_flight_number, normalize_seat, validate_passenger,
+                        validate_reservation)
+
+FILTER_KEYS = ('name', 'flight_number', 'departure', 'destination', 'date_from', 'date_to')
+
+STATUS_TEXT = {
+    200: 'OK', 201: 'Created', 204: 'No Content', 400: 'Bad Request', 404: 'Not Found',
+    405: 'Method Not Allowed', 409: 'Conflict', 411: 'Length Required',
+    413: 'Payload Too Large', 431: 'Request Header Fields Too Large', 500: 'Internal Server Error',
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class DatabasePool:
+    """One writer connection plus ``readers`` read-only connections.
+
+    Every connection is a Database owned by one pool thread. Writes are
+    serialized on the writer thread, since SQLite allows one writer at a
+    time anyway, and its seat inventory stays warm. Reads fan out over the
+    reader threads, which WAL lets run alongside the writer. An in-memory
+    profile has no file to share, so there everything runs on the writer.
+    """
+
+    def __init__(self, db_name='flights.db', profile=DEFAULT_PROFILE, readers=4):
+        self._local = threading.local()
+        self.read_only = get_profile(profile).query_only
+        self._writer = ThreadPoolExecutor(1, 'db-writer', initializer=self._open, initargs=(db_name, profile))
+        # Let the writer create the schema before any reader opens the file
+        self._writer.submit(lambda: None).result()
+        if get_profile(profile).path == ':memory:' or readers < 1:
+            self._readers = self._writer
+        else:
+            self._readers = ThreadPoolExecutor(readers, 'db-reader', initializer=self._open,
+                                               initargs=(db_name, profile))
+
+    def _open(self, db_name, profile):
+        self._local.db = Database(db_name, profile)
+
+    def _call(self, name, args, kwargs):
+        return getattr(self._local.db, name)(*args, **kwargs)
+
+    async def read(self, name, *args, **kwargs):
+        """Run ``Database.<name>`` on a reader connection"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, self._call, name, args, kwargs)
+
+    async def write(self, name, *args, **kwargs):
+        """Run ``Database.<name>`` on the writer connection"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, self._call, name, args, kwargs)
+
+    def close(self):
+        self._readers.shutdown()
+        self._writer.shutdown()
+
+
+def reservation_json(row):
+    return dict(zip(RESERVATION_COLUMNS, row))
+
+
+def json_body(body):
+    try:
+        record = json.loads(body or b'null')
+    except ValueError:
+        raise HttpError(400, "Body is not valid JSON")
+    if not isinstance(record, dict):
+        raise HttpError(400, "Body must be a JSON object")
+    return record
+
+
+def reservation_data(record):
+    return validate_reservation(tuple(record.get(field) for field in FIELDS))
+
+
+async def read_request(reader, max_body):
+    """Read one request; returns ``(method, target, body, keep_alive)`` or None at EOF"""
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise HttpError(431, "Request headers too large")
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, version = lines[0].split(' ')
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+    if 'transfer-encoding' in headers:
+        raise HttpError(411, "Chunked bodies are not supported; send Content-Length")
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise HttpError(400, "Invalid Content-Length")
+    if length > max_body:
+        raise HttpError(413, "Request body too large")
+    body = await reader.readexactly(length) if length else b''
+    connection = headers.get('connection', '').lower()
+    keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+    return method, target, body, keep_alive
+
+
+def encode_response(status, payload, keep_alive):
+    body = b'' if payload is None else json.dumps(payload).encode()
+    head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+
+class ReservationServer:
+    """Maps the routes in the module docstring onto Database operations"""
+
+    PIPELINE_DEPTH = 32
+    MAX_BODY = 64 * 1024
+    MAX_PAGE = 500
+    # Seconds; a longer hold would keep a seat from sale for nobody
+    MAX_HOLD_TTL = 900
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Serving reservations on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        # Responses are queued as tasks in request order, so a slow write
+        # never lets a later, faster read answer out of turn
+        responses = asyncio.Queue(self.PIPELINE_DEPTH)
+        sender = asyncio.create_task(self._send_responses(responses, writer))
+        # Pipelined GETs run concurrently, but never overtake an earlier
+        # write on the same connection, and a write waits for everything
+        # before it
+        last_write = None
+        since_write = []
+        try:
+            while True:
+                try:
+                    request = await read_request(reader, self.MAX_BODY)
+                except HttpError as e:
+                    await responses.put(self._error_response(e))
+                    break
+                if request is None:
+                    break
+                method, target, body, keep_alive = request
+                if method == 'GET':
+                    after = [last_write] if last_write else []
+                else:
+                    after = since_write + ([last_write] if last_write else [])
+                task = asyncio.create_task(self._respond(method, target, body, keep_alive, after))
+                if method == 'GET':
+                    since_write = [t for t in since_write if not t.done()]
+                    since_write.append(task)
+                else:
+                    last_write, since_write = task, []
+                await responses.put(task)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            await responses.put(None)
+            await sender
+
+    def _error_response(self, error):
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(encode_response(error.status, {'error': error.message}, False))
+        return future
+
+    async def _send_responses(self, responses, writer):
+        try:
+            while True:
+                response = await responses.get()
+                if response is None:
+                    break
+                writer.write(await response)
+                if responses.empty():
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, method, target, body, keep_alive, after=()):
+        if after:
+            await asyncio.wait(after)
+        try:
+            status, payload = await self.dispatch(method, target, body)
+        except HttpError as e:
+            status, payload = e.status, {'error': e.message}
+        except ConflictError as e:
+            status, payload = 409, {'error': str(e)}
+        except ValueError as e:
+            status, payload = 400, {'error': str(e)}
+        except Exception:
+            traceback.print_exc()
+            status, payload = 500, {'error': "Internal server error"}
+        return encode_response(status, payload, keep_alive)
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        if method != 'GET' and self.pool.read_only:
+            raise HttpError(405, "This server reads a replica; send changes to the primary")
+        parts = [part for part in url.path.split('/') if part]
+        if len(parts) == 3 and parts[0] == 'flights':
+            if method != 'GET':
+                raise HttpError(405, "Use GET on /flights/<flight_number>/<date>")
+            rows = await self.pool.read('get_flight_reservations', parts[1], parts[2])
+            return 200, {'reservations': [reservation_json(row) for row in rows]}
+        if parts == ['routes']:
+            if method != 'GET':
+                raise HttpError(405, "Use GET on /routes")
+            return 200, await self.search_routes(dict(parse_qsl(url.query)))
+        if parts and parts[0] == 'bookings' and len(parts) <= 2:
+            if len(parts) == 1 and method == 'POST':
+                return 201, await self.create_booking(body)
+            if len(parts) == 2 and method == 'GET':
+                return 200, await self.get_booking(parts[1])
+            raise HttpError(405, "Use POST on /bookings and GET on /bookings/<pnr>")
+        if parts and parts[0] == 'holds' and len(parts) <= 2:
+            if len(parts) == 1 and method == 'POST':
+                return 201, await self.hold_seat(body)
+            if len(parts) == 2 and method == 'DELETE':
+                if not await self.pool.write('release_hold', parts[1]):
+                    raise HttpError(404, "Hold not found or already expired")
+                return 204, None
+            raise HttpError(405, "Use POST on /holds and DELETE on /holds/<token>")
+        if not parts or parts[0] != 'reservations' or len(parts) > 2:
+            raise HttpError(404, "Not found")
+        if len(parts) == 1:
+            if method == 'GET':
+                return 200, await self.list_reservations(dict(parse_qsl(url.query)))
+            if method == 'POST':
+                return 201, await self.create_reservation(body)
+            raise HttpError(405, "Use GET or POST on /reservations")
+        try:
+            reservation_id = int(parts[1])
+        except ValueError:
+            raise HttpError(404, "Not found")
+        if method == 'GET':
+            return 200, await self.get_reservation(reservation_id)
+        if method == 'PUT':
+            return 200, await self.update_reservation(reservation_id, body)
+        if method == 'DELETE':
+            return 204, await self.delete_reservation(reservation_id)
+        raise HttpError(405, "Use GET, PUT or DELETE on /reservations/<id>")
+
+    def page_limit(self, query, default):
+        limit = int(query.get('limit', default))
+        if limit < 1:
+            raise HttpError(400, "limit must be at least 1")
+        return min(limit, self.MAX_PAGE)
+
+    async def list_reservations(self, query):
+        limit = self.page_limit(query, 50)
+        kwargs = {'limit': limit}
+        for key in ('after_id', 'before_id', 'offset'):
+            if key in query:
+                kwargs[key] = int(query[key])
+        filters = {key: query[key] for key in FILTER_KEYS if query.get(key)}
+        if filters:
+            kwargs['filters'] = filters
+        rows = await self.pool.read('get_reservations_page', **kwargs)
+        return {
+            'reservations': [reservation_json(row) for row in rows],
+            'next_after_id': rows[-1][0] if rows and len(rows) == limit else None,
+        }
+
+    async def search_routes(self, query):
+        missing = [key for key in ('from', 'to', 'date') if not query.get(key)]
+        if missing:
+            raise HttpError(400, f"Missing {', '.join(missing)}")
+        kwargs = {key: int(query[key]) for key in ('max_connections', 'min_layover', 'max_layover')
+                  if key in query}
+        kwargs['limit'] = self.page_limit(query, 20)
+        itineraries = await self.pool.read('search_routes_json', query['from'], query['to'], query['date'],
+                                           **kwargs)
+        return {'itineraries': itineraries}
+
+    async def get_reservation(self, reservation_id):
+        row = await self.pool.read('get_reservation', reservation_id)
+        if row is None:
+            raise HttpError(404, f"Reservation {reservation_id} not found")
+        return reservation_json(row)
+
+    async def create_booking(self, body):
+        record = json_body(body)
+        passengers = record.get('passengers')
+        if not isinstance(passengers, list) or not all(isinstance(p, dict) for p in passengers):
+            raise HttpError(400, "passengers must be a list of objects")
+        data = []
+        for number, passenger in enumerate(passengers, 1):
+            try:
+                data.append(validate_passenger(tuple(passenger.get(field) for field in FIELDS)))
+            except ValueError as e:
+                raise HttpError(400, f"Passenger {number}: {e}")
+        pnr, _ = await self.pool.write('create_booking', data, record.get('contact'))
+        return await self.get_booking(pnr)
+
+    async def get_booking(self, pnr):
+        booking = await self.pool.read('get_booking', pnr)
+        if booking is None:
+            raise HttpError(404, f"Booking {pnr} not found")
+        pnr, contact, created_at, rows = booking
+        return {'pnr': pnr, 'contact': contact, 'created_at': created_at,
+                'reservations': [reservation_json(row) for row in rows]}
+
+    async def hold_seat(self, body):
+        record = json_body(body)
+        fields = ('flight_number', 'date', 'seat_number')
+        # Normalized here too, so the response echoes the key that is held
+        key = [normalize(record.get(field)) for normalize, field in
+               zip((normalize_flight_number, normalize_date, normalize_seat), fields)]
+        ttl = record.get('ttl')
+        if ttl is not None and (not isinstance(ttl, (int, float)) or not 0 < ttl <= self.MAX_HOLD_TTL):
+            raise HttpError(400, f"ttl must be a number of seconds up to {self.MAX_HOLD_TTL}")
+        token, expires_at = await self.pool.write('hold_seat', *key, record.get('holder'),
+                                                  record.get('token'), ttl)
+        return {'token': token, 'expires_at': expires_at, **dict(zip(fields, key))}
+
+    async def create_reservation(self, body):
+        record = json_body(body)
+        data = reservation_data(record)
+        reservation_id = await self.pool.write('create_reservation', data, record.get('hold'))
+        return {'id': reservation_id, **dict(zip(FIELDS, data)), 'version': 1}
+
+    async def update_reservation(self, reservation_id, body):
+        record = json_body(body)
+        data = reservation_data(record)
+        version = record.get('version')
+        # bool is an int subclass, but "version": true is no version
+        if version is not None and (not isinstance(version, int) or isinstance(version, bool)):
+            raise HttpError(400, "version must be an integer")
+        if not await self.pool.write('update_reservation', reservation_id, data, version):
+            raise HttpError(404, f"Reservation {reservation_id} not found")
+        return await self.get_reservation(reservation_id)
+
+    async def delete_reservation(self, reservation_id):
+        if not await self.pool.write('delete_reservation', reservation_id):
+            raise HttpError(404, f"Reservation {reservation_id} not found")
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless JSON API for reservations")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--db', default='flights.db')
+    parser.add_argument('--profile', choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help="connection profile (see connection.py)")
+    parser.add_argument('--readers', type=int, default=4, help="read connections in the pool")
+    parser.add_argument('--metrics-port', type=int, help="serve Prometheus metrics on this port")
+    parser.add_argument('--slow-query-ms', type=float, help="log statements slower than this, with their plan")
+    args = parser.parse_args(argv)
+
+    if args.metrics_port or args.slow_query_ms is not None:
+        metrics.enable(args.slow_query_ms)
+        metrics.instrument(Database, 'db')
+        metrics.instrument(ReservationServer, 'api', ['list_reservations', 'get_reservation', 'create_reservation',
+                                                      'update_reservation', 'delete_reservation'])
+        if args.metrics_port:
+            metrics.serve(args.metrics_port, args.host)
+
+    pool = DatabasePool(args.db, args.profile, args.readers)
+    try:
+        asyncio.run(ReservationServer(pool).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Booking throughput of api_server.py under many concurrent clients.
+
+    python api_server.py --db /tmp/load.db &
+    python benchmarks/api_load.py --clients 200 --requests 20000 --pipeline 8
+
+Each client holds one keep-alive connection and keeps up to ``--pipeline``
+POST /reservations requests in flight on it. Every booking is for a
+distinct seat, so all of them should come back 201.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+
+SEATS = [f'{row}{letter}' for row in range(1, 31) for letter in 'ABCDEF']
+
+
+def booking_request(i, host):
+    body = json.dumps({
+        'name': f'Load Test {i}', 'flight_number': f'LT{i // len(SEATS):05d}',
+        'departure': 'Austin', 'destination': 'Portland', 'date': '2024-09-01',
+        'seat_number': SEATS[i % len(SEATS)],
+    }).encode()
+    return (f'POST /reservations HTTP/1.1\r\nHost: {host}\r\n'
+            f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n').encode() + body
+
+
+async def read_status(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    length = next(int(line.split(':')[1]) for line in lines if line.lower().startswith('content-length'))
+    await reader.readexactly(length)
+    return int(lines[0].split(' ')[1])
+
+
+async def client(host, port, numbers, pipeline, statuses, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    sent = asyncio.Queue(pipeline)
+
+    async def receive():
+        while True:
+            started = await sent.get()
+            if started is None:
+                return
+            statuses[await read_status(reader)] += 1
+            latencies.append(time.perf_counter() - started)
+
+    receiver = asyncio.create_task(receive())
+    for i in numbers:
+        await sent.put(time.perf_counter())
+        writer.write(booking_request(i, host))
+        await writer.drain()
+    await sent.put(None)
+    await receiver
+    writer.close()
+
+
+async def run(args):
+    counter = itertools.count(args.start)
+    per_client = args.requests // args.clients
+    statuses = Counter()
+    latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        client(args.host, args.port, [next(counter) for _ in range(per_client)], args.pipeline,
+               statuses, latencies)
+        for _ in range(args.clients)
+    ))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(f"{sum(statuses.values())} requests in {elapsed:.2f}s: "
+          f"{sum(statuses.values()) / elapsed:,.0f} req/s, statuses {dict(statuses)}")
+    print(f"latency median {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--pipeline', type=int, default=8)
+    parser.add_argument('--start', type=int, default=0, help="first booking number (to avoid seat clashes between runs)")
+    asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == '__main__':
+    main()
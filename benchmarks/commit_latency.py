@@ -0,0 +1,61 @@
+"""Commit latency of single bookings under each connection profile.
+
+    python benchmarks/commit_latency.py --commits 500
+
+Every booking goes through Database.create_reservation (one INSERT, one
+commit), against a fresh file in a temporary directory. "legacy" is what
+the app used before connection profiles: a bare sqlite3.connect() with
+a rollback journal and synchronous=FULL.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connection import PROFILES, ConnectionProfile
+from database import Database
+
+LEGACY = ConnectionProfile('legacy', journal_mode='DELETE', synchronous='FULL')
+
+
+def booking(i):
+    return (f'Passenger {i}', f'BM{i // 180:04d}', 'Boston', 'Denver', '2024-06-01',
+            f'{i % 180 // 6 + 1}{"ABCDEF"[i % 6]}')
+
+
+def measure(profile, commits):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bench.db'), profile)
+        latencies = []
+        for i in range(commits):
+            started = time.perf_counter()
+            db.create_reservation(booking(i))
+            latencies.append((time.perf_counter() - started) * 1000)
+        db.conn.close()
+    latencies.sort()
+    return {
+        'median': statistics.median(latencies),
+        'p95': latencies[int(len(latencies) * 0.95) - 1],
+        'max': latencies[-1],
+        'per_sec': commits / (sum(latencies) / 1000),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--commits', type=int, default=500)
+    args = parser.parse_args(argv)
+
+    print(f"{'profile':<10}{'median ms':>12}{'p95 ms':>10}{'max ms':>10}{'commits/s':>12}")
+    for profile in [LEGACY] + [profile for profile in PROFILES.values() if not profile.query_only]:
+        result = measure(profile, args.commits)
+        print(f"{profile.name:<10}{result['median']:>12.3f}{result['p95']:>10.3f}"
+              f"{result['max']:>10.3f}{result['per_sec']:>12,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+"""Timings of the reservation data path and view refresh, with a baseline check.
+
+    python benchmarks/harness.py --sizes 1000 100000 --output results.json
+    python benchmarks/harness.py --sizes 1000 100000 --baseline benchmarks/baseline.json
+    python benchmarks/harness.py --sizes 1000 100000 --save-baseline benchmarks/baseline.json
+
+For each size a synthetic flights.db is generated once (cached under
+``--data-dir``, keyed by size and seed) and copied to a scratch file, so
+every run starts from the same data. Each operation is timed over
+``--ops`` calls and reported as median and p95 in milliseconds.
+
+``load_reservations`` times a first fill and a scrollbar jump of a
+VirtualTreeview. If there is no display, Tk is replaced by an in-memory
+stand-in with the few Treeview calls the view makes, so the figures
+cover the query and diffing work but not Tk drawing.
+
+With ``--baseline`` the medians are compared against a stored run. Any
+metric slower than baseline * (1 + ``--tolerance``) is reported, and the
+exit status is 1. A baseline also stores a digest of each of
+MEASURED_FILES, and the check warns about those changed since it was
+recorded. Re-record it (``--save-baseline``) in the same commit as any
+change to a measured path, or say in the commit message why a slower
+figure is accepted.
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from tkinter import ttk
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bulk_io import import_reservations
+from database import INSERT_RESERVATION, Database
+from virtual_tree import VirtualTreeview
+
+FIRST_NAMES = ['James', 'Mary', 'Wei', 'Aisha', 'Carlos', 'Olga', 'Kenji', 'Fatima', 'Liam', 'Priya',
+               'Noah', 'Sofia', 'Mateo', 'Chloe', 'Arjun', 'Elena', 'Omar', 'Hana', 'Lucas', 'Zara']
+LAST_NAMES = ['Smith', 'Garcia', 'Chen', 'Khan', 'Ivanova', 'Tanaka', 'Okafor', 'Muller', 'Rossi',
+              'Silva', 'Kim', 'Nguyen', 'Cohen', 'Patel', 'Novak', 'Haddad', 'Larsen', 'Murphy']
+CITIES = ['New York', 'Los Angeles', 'Chicago', 'Miami', 'Seattle', 'Denver', 'Boston', 'Atlanta',
+          'Dallas', 'San Francisco', 'Houston', 'Phoenix', 'Portland', 'Austin', 'Detroit']
+SEATS = [f'{row}{letter}' for row in range(1, 31) for letter in 'ABCDEF']
+
+# Modules on the timed paths; a change to any of them makes a baseline stale
+MEASURED_FILES = ('bulk_io.py', 'cache.py', 'change_tracker.py', 'connection.py', 'database.py', 'holds.py',
+                  'migrations.py', 'partitions.py', 'search.py', 'seats.py', 'validation.py', 'virtual_tree.py')
+
+
+def measured_digests():
+    digests = {}
+    for name in MEASURED_FILES:
+        with open(os.path.join(ROOT, name), 'rb') as f:
+            digests[name] = hashlib.sha256(f.read()).hexdigest()[:16]
+    return digests
+
+
+def stale_files(baseline):
+    """MEASURED_FILES that differ from the tree the baseline was recorded on (None if unknown)"""
+    recorded = baseline.get('meta', {}).get('measured')
+    if recorded is None:
+        return None
+    return [name for name, digest in measured_digests().items() if recorded.get(name) != digest]
+
+
+def synthetic_reservations(count, seed=0, start=0):
+    """Yield ``count`` distinct bookings; each flight fills its 180 seats in order"""
+    rng = random.Random(seed)
+    for i in range(start, start + count):
+        flight = i // len(SEATS)
+        route = random.Random(flight).sample(CITIES, 2)
+        yield (f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}', f'SY{flight:06d}',
+               route[0], route[1], f'2024-{flight % 12 + 1:02d}-{flight % 28 + 1:02d}',
+               SEATS[i % len(SEATS)])
+
+
+def dataset(size, data_dir, seed):
+    path = os.path.join(data_dir, f'bench_{size}_{seed}.db')
+    if not os.path.exists(path):
+        print(f"Generating {size} reservations into {path} ...", file=sys.stderr)
+        db = Database(path + '.tmp')
+        rows = synthetic_reservations(size, seed)
+        while True:
+            batch = [row for _, row in zip(range(50000), rows)]
+            if not batch:
+                break
+            db.cursor.executemany(INSERT_RESERVATION, batch)
+            db.conn.commit()
+        db.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        db.conn.close()
+        os.replace(path + '.tmp', path)
+    return path
+
+
+def timed(fn, ops):
+    samples = []
+    for i in range(ops):
+        started = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'ops': ops,
+        'median_ms': round(statistics.median(samples), 4),
+        'p95_ms': round(samples[max(0, int(len(samples) * 0.95) - 1)], 4),
+    }
+
+
+class _StubTreeview(ttk.Treeview):
+    """The Treeview calls VirtualTreeview makes, kept in a list instead of Tk"""
+
+    def __init__(self, parent, **kwargs):
+        self._items = []
+        self._values = {}
+        self._selection = ()
+
+    def bind(self, *args, **kwargs):
+        pass
+
+    def get_children(self, item=None):
+        return tuple(self._items)
+
+    def delete(self, *items):
+        gone = set(items)
+        self._items = [iid for iid in self._items if iid not in gone]
+        for iid in gone:
+            del self._values[iid]
+        self._selection = tuple(iid for iid in self._selection if iid not in gone)
+
+    def insert(self, parent, index, iid=None, values=()):
+        self._items.insert(index, iid)
+        self._values[iid] = values
+        return iid
+
+    def exists(self, item):
+        return item in self._values
+
+    def item(self, item, option=None, **kwargs):
+        if 'values' in kwargs:
+            self._values[item] = kwargs['values']
+        return {'values': self._values[item]}
+
+    def index(self, item):
+        return self._items.index(item)
+
+    def move(self, item, parent, index):
+        self._items.remove(item)
+        self._items.insert(index, item)
+
+    def selection(self):
+        return self._selection
+
+    def selection_set(self, *items):
+        self._selection = tuple(items[0] if len(items) == 1 and isinstance(items[0], (list, tuple)) else items)
+
+
+class HeadlessTreeview(VirtualTreeview, _StubTreeview):
+    pass
+
+
+def make_treeview(db, rows):
+    kwargs = dict(fetch_rows=db.get_reservations_by_ids, collect_changes=db.collect_changes,
+                  height=rows, columns=('id', 'name', 'flight', 'departure', 'destination', 'date', 'seat'),
+                  show='headings')
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+        root.withdraw()
+        return VirtualTreeview(root, db.count_reservations, db.get_reservations_page, **kwargs), 'tk'
+    except Exception:
+        return HeadlessTreeview(None, db.count_reservations, db.get_reservations_page, **kwargs), 'stub'
+
+
+def run_size(size, args):
+    results = {}
+    source = dataset(size, args.data_dir, args.seed)
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, 'flights.db')
+        shutil.copyfile(source, path)
+        db = Database(path, args.profile)
+        rng = random.Random(args.seed)
+        ids = [row[0] for row in db.conn.execute('SELECT id FROM reservations')]
+        fresh = synthetic_reservations(args.ops * 2 + args.batch, args.seed, start=size)
+
+        results['create_reservation'] = timed(lambda i: db.create_reservation(next(fresh)), args.ops)
+
+        batch_file = os.path.join(scratch, 'batch.csv')
+        with open(batch_file, 'w') as f:
+            f.write('name,flight_number,departure,destination,date,seat_number\n')
+            for row in (next(fresh) for _ in range(args.batch)):
+                f.write(','.join(row) + '\n')
+        started = time.perf_counter()
+        imported, _ = import_reservations(db.conn, batch_file)
+        elapsed = time.perf_counter() - started
+        results['create_reservations_batched'] = {
+            'ops': imported,
+            'median_ms': round(elapsed * 1000 / imported, 4),
+            'rows_per_s': round(imported / elapsed),
+        }
+
+        results['get_all_reservations'] = timed(lambda i: db.get_all_reservations(), args.full_scans)
+        results['get_reservation'] = timed(lambda i: db.get_reservation(rng.choice(ids)), args.ops * 5)
+        # (flight_number, date) of the first 20 flights, all of them booked
+        flights = sorted({(row[1], row[4]) for row in
+                          synthetic_reservations(min(size, 20 * len(SEATS)), args.seed)})
+        results['get_flight_reservations'] = timed(
+            lambda i: db.get_flight_reservations(*rng.choice(flights)), args.ops * 5)
+
+        targets = rng.sample(ids, min(len(ids), args.ops * 2))
+        updates = iter(targets[:args.ops])
+
+        def update(i):
+            row = db.get_reservation(next(updates))
+            db.update_reservation(row[0], (row[1] + ' Jr', *row[2:7]), row[8])
+
+        results['update_reservation'] = timed(update, min(args.ops, len(targets)))
+        deletes = iter(targets[args.ops:])
+        results['delete_reservation'] = timed(lambda i: db.delete_reservation(next(deletes)),
+                                              len(targets) - args.ops)
+
+        tree, mode = make_treeview(db, 25)
+        results['load_reservations'] = timed(lambda i: tree.refresh(), args.ops)
+        results['load_reservations']['mode'] = mode
+        results['scroll_jump'] = timed(lambda i: tree.yview('moveto', rng.random()), args.ops)
+        results['scroll_jump']['mode'] = mode
+        db.conn.close()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for size, operations in results.items():
+        for name, result in operations.items():
+            before = baseline.get('results', {}).get(size, {}).get(name)
+            if before is None:
+                continue
+            limit = before['median_ms'] * (1 + tolerance)
+            if result['median_ms'] > limit:
+                regressions.append(f"{size} rows / {name}: {result['median_ms']:.3f} ms "
+                                   f"vs baseline {before['median_ms']:.3f} ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--ops', type=int, default=200, help="calls per timed operation")
+    parser.add_argument('--batch', type=int, default=10000, help="rows in the batched create")
+    parser.add_argument('--full-scans', type=int, default=3, help="get_all_reservations calls")
+    parser.add_argument('--profile', default='fast', help="connection profile (see connection.py)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'flights-bench'))
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    parser.add_argument('--baseline', help="compare against this results file")
+    parser.add_argument('--save-baseline', help="write the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args(argv)
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'profile': args.profile,
+            'ops': args.ops,
+            'measured': measured_digests(),
+        },
+        'results': {},
+    }
+    for size in args.sizes:
+        report['results'][str(size)] = run_size(size, args)
+        for name, result in report['results'][str(size)].items():
+            p95 = f"{result['p95_ms']:>10.3f} ms p95" if 'p95_ms' in result else ''
+            print(f"{size:>8} rows  {name:<28}{result['median_ms']:>10.3f} ms median{p95}")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+                f.write('\n')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        stale = stale_files(baseline)
+        if stale is None:
+            print(f"WARNING {args.baseline} does not record the tree it was measured on")
+        elif stale:
+            print(f"WARNING {args.baseline} predates changes to {', '.join(stale)}; "
+                  f"re-record it with --save-baseline")
+        regressions = compare(report['results'], baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Itinerary search latency on a synthetic schedule.
+
+    python benchmarks/route_search.py --airports 500 --legs-per-day 50000 --days 3
+
+Airports get Zipf-like traffic weights, so a few hubs carry most legs,
+as in a real network. Each leg leaves at a random time between 05:00 and
+23:00 UTC and flies 1-10 hours. The schedule is imported into a scratch
+file. A "cold" search includes building the day indexes, and the
+"warm" figures are medians and p95 over random origin/destination
+pairs searched with up to two connections.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import zlib
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+
+def airport_codes(count):
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    return [a + b + c for a in letters for b in letters for c in letters][:count]
+
+
+def synthetic_schedule(codes, legs_per_day, days, start, seed=0):
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(codes))]
+    for day in range(days):
+        flight_date = (start + timedelta(days=day)).isoformat()
+        origins = rng.choices(codes, weights, k=legs_per_day)
+        destinations = rng.choices(codes, weights, k=legs_per_day)
+        for n, (origin, destination) in enumerate(zip(origins, destinations)):
+            if origin == destination:
+                continue
+            # Stable per-route flight time, as if set by distance; crc32
+            # rather than hash(), which is salted per process for str
+            duration = 60 + zlib.crc32(f'{origin}{destination}'.encode()) % 540
+            yield (f'SY{n:06d}', flight_date, 'A320', origin, destination,
+                   rng.randrange(5 * 60, 23 * 60), duration)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--airports', type=int, default=500)
+    parser.add_argument('--legs-per-day', type=int, default=50000)
+    parser.add_argument('--days', type=int, default=3)
+    parser.add_argument('--searches', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    codes = airport_codes(args.airports)
+    start = date(2024, 5, 1)
+    with tempfile.TemporaryDirectory() as scratch:
+        db = Database(os.path.join(scratch, 'routes.db'))
+        db.add_airports((code, f'City {code}', None) for code in codes)
+        started = time.perf_counter()
+        db.import_schedule(synthetic_schedule(codes, args.legs_per_day, args.days, start, args.seed))
+        legs = db.conn.execute('SELECT COUNT(*) FROM flights').fetchone()[0]
+        print(f"Imported {legs} legs in {time.perf_counter() - started:.1f}s")
+
+        rng = random.Random(args.seed)
+        pairs = [rng.sample(codes, 2) for _ in range(args.searches)]
+        day = start.isoformat()
+        started = time.perf_counter()
+        results = db.search_routes(*pairs[0], day)
+        print(f"cold search (builds {args.days} day indexes): {(time.perf_counter() - started) * 1000:.1f} ms, "
+              f"{len(results)} itineraries")
+
+        samples, found = [], []
+        for origin, destination in pairs:
+            started = time.perf_counter()
+            results = db.search_routes(origin, destination, day)
+            samples.append((time.perf_counter() - started) * 1000)
+            found.append(len(results))
+        samples.sort()
+        print(f"warm search: {statistics.median(samples):.2f} ms median, "
+              f"{samples[int(len(samples) * 0.95) - 1]:.2f} ms p95, {samples[-1]:.2f} ms max; "
+              f"{statistics.mean(found):.1f} itineraries on average, {found.count(0)} pairs with none")
+        db.conn.close()
+
+
+if __name__ == '__main__':
+    main()
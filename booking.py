@@ -1,5 +1,9 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
+from group_booking import GroupBookingWindow
+from hold_status import HoldStatus
+from route_panel import RouteSearchWindow
+from validation import validate_reservation
 
 class BookingPage(tk.Frame):
     def __init__(self, parent, controller):
@@ -23,37 +27,73 @@ class BookingPage(tk.Frame):
             entry.grid(row=i, column=1, padx=10, pady=5, sticky="w")
             self.entries[field] = entry
         
+        seat_btn = ttk.Button(self, text="Window Seat", command=self.suggest_window_seat)
+        seat_btn.grid(row=len(fields) - 1, column=2, padx=10, pady=5, sticky="w")
+        
+        route_btn = ttk.Button(self, text="Find Route",
+                               command=lambda: RouteSearchWindow(self, controller.db, self.entries))
+        route_btn.grid(row=2, column=2, padx=10, pady=5, sticky="w")
+        
+        group_btn = ttk.Button(self, text="Group Booking",
+                               command=lambda: GroupBookingWindow(self, controller.db, self.entries))
+        group_btn.grid(row=1, column=2, padx=10, pady=5, sticky="w")
+        
+        self.hold = HoldStatus(self, controller.db, self.entries)
+        self.hold.grid(row=len(fields), column=0, columnspan=3, padx=10, sticky="w")
+        
         btn_frame = ttk.Frame(self)
-        btn_frame.grid(row=len(fields), column=0, columnspan=2, pady=20)
+        btn_frame.grid(row=len(fields) + 1, column=0, columnspan=2, pady=20)
         
         submit_btn = ttk.Button(btn_frame, text="Submit", command=self.submit)
         submit_btn.pack(side=tk.LEFT, padx=10)
         
-        back_btn = ttk.Button(btn_frame, text="Back", 
-                            command=lambda: controller.show_frame("HomePage"))
+        back_btn = ttk.Button(btn_frame, text="Back", command=self.back)
         back_btn.pack(side=tk.LEFT, padx=10)
     
     def submit(self):
+        data = (
+            self.entries['name'].get(),
+            self.entries['flight_number'].get(),
+            self.entries['departure'].get(),
+            self.entries['destination'].get(),
+            self.entries['date'].get(),
+            self.entries['seat_number'].get()
+        )
+        
         try:
-            data = (
-                self.entries['name'].get(),
-                self.entries['flight_number'].get(),
-                self.entries['departure'].get(),
-                self.entries['destination'].get(),
-                self.entries['date'].get(),
-                self.entries['seat_number'].get()
-            )
-            
-            if not all(data):
-                raise ValueError("All fields are required")
-            
-            self.controller.db.create_reservation(data)
-            messagebox.showinfo("Success", "Reservation created successfully!")
-            
-            for entry in self.entries.values():
-                entry.delete(0, tk.END)
-            
-            self.controller.show_frame("HomePage")
-            
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
\ No newline at end of file
+            data = validate_reservation(data)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        
+        self.controller.db.submit('create_reservation', data, self.hold.token, callback=self.submitted)
+    
+    def back(self):
+        self.hold.release()
+        self.controller.show_frame("HomePage")
+    
+    def suggest_window_seat(self):
+        flight_number = self.entries['flight_number'].get()
+        date = self.entries['date'].get()
+        if not flight_number or not date:
+            messagebox.showwarning("Warning", "Enter the flight number and date first")
+            return
+        
+        self.controller.db.submit('next_free_window_seat', flight_number, date, callback=self.window_seat_found)
+    
+    def window_seat_found(self, seat_number):
+        if seat_number is None:
+            messagebox.showinfo("Seats", "No window seats left on this flight")
+            return
+        self.entries['seat_number'].delete(0, tk.END)
+        self.entries['seat_number'].insert(0, seat_number)
+        self.hold.refresh()
+    
+    def submitted(self, reservation_id):
+        self.hold.clear()
+        messagebox.showinfo("Success", "Reservation created successfully!")
+        
+        for entry in self.entries.values():
+            entry.delete(0, tk.END)
+        
+        self.controller.show_frame("HomePage")
\ No newline at end of file
@@ -0,0 +1,53 @@
+"""Booking records (PNRs): one locator for a group of passengers booked together.
+
+``Database.create_booking`` books the whole group in one transaction:
+every seat is checked first, then the reservations go in with one
+``executemany``, so either every passenger is booked or none is. The
+passengers are ordinary reservations; ``booking_passengers`` ties their
+ids to the locator.
+
+Links are left in place when a passenger is deleted or archived, and
+``Database.get_booking`` reads through to the archives and skips ids that
+are gone. Replicas replay reservations only (see replication.py), so a
+replica learns of new groups at its next full copy.
+"""
+import secrets
+
+BOOKINGS_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS bookings (
+        pnr TEXT PRIMARY KEY,
+        contact TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS booking_passengers (
+        pnr TEXT NOT NULL,
+        reservation_id INTEGER NOT NULL,
+        PRIMARY KEY (pnr, reservation_id)
+    ) WITHOUT ROWID
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_booking_passengers_reservation ON booking_passengers (reservation_id)',
+]
+
+# No 0/O or 1/I, so a locator read out over the phone is unambiguous
+PNR_ALPHABET = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+PNR_LENGTH = 6
+
+# Passengers per booking; larger groups go through bulk_io.py
+MAX_PASSENGERS = 200
+
+
+def install_bookings(cursor):
+    for statement in BOOKINGS_SCHEMA:
+        cursor.execute(statement)
+
+
+def new_pnr(cursor):
+    """A locator no booking uses yet; call inside the write transaction that stores it"""
+    while True:
+        pnr = ''.join(secrets.choice(PNR_ALPHABET) for _ in range(PNR_LENGTH))
+        cursor.execute('SELECT 1 FROM bookings WHERE pnr = ?', (pnr,))
+        if cursor.fetchone() is None:
+            return pnr
@@ -0,0 +1,110 @@
+import tkinter as tk
+from tkinter import ttk, messagebox, simpledialog
+from validation import normalize_date, normalize_flight_number
+
+
+class ProgressWindow(tk.Toplevel):
+    """Determinate progress bar for one bulk action"""
+
+    def __init__(self, parent, title, total):
+        super().__init__(parent)
+        self.title(title)
+        self.resizable(False, False)
+        self.transient(parent)
+        self.label = ttk.Label(self, text=f"0 of {total}")
+        self.label.pack(padx=20, pady=(15, 5))
+        self.bar = ttk.Progressbar(self, length=300, maximum=total)
+        self.bar.pack(padx=20, pady=(0, 15))
+
+    def update_progress(self, done, total):
+        if self.winfo_exists():
+            self.bar.configure(value=done, maximum=total)
+            self.label.configure(text=f"{done} of {total}")
+
+
+class BulkActions:
+    """Delete, reassign and seat-shift commands for the rows selected in a reservations view.
+
+    ``tree`` is the VirtualTreeview (its item ids are reservation ids) and
+    ``db`` the app's DbWorker. Each command is a single Database call, so
+    it is one transaction on the worker thread. When it is done,
+    ``on_done()`` syncs the view, which patches only the rows that changed.
+    """
+
+    # Selections at least this big get a progress window
+    PROGRESS_MIN = 200
+
+    def __init__(self, parent, db, tree, on_done):
+        self.parent = parent
+        self.db = db
+        self.tree = tree
+        self.on_done = on_done
+
+    def selected_ids(self, action):
+        # Includes rows selected and then scrolled out of view
+        ids = sorted(self.tree.selected_ids)
+        if not ids:
+            messagebox.showwarning("Warning", f"Please select the reservations to {action}")
+        return ids
+
+    def delete(self):
+        ids = self.selected_ids("delete")
+        if not ids:
+            return
+        prompt = ("Are you sure you want to delete this reservation?" if len(ids) == 1
+                  else f"Are you sure you want to delete these {len(ids)} reservations?")
+        if not messagebox.askyesno("Confirm", prompt):
+            return
+        self.run("Deleting", 'delete_reservations', ids,
+                 lambda deleted: f"Deleted {len(deleted)} reservation(s)")
+
+    def reassign(self):
+        ids = self.selected_ids("reassign")
+        if not ids:
+            return
+        flight_number = simpledialog.askstring("Reassign", f"Move {len(ids)} reservation(s) to flight:",
+                                               parent=self.parent)
+        if not flight_number or not flight_number.strip():
+            return
+        date = simpledialog.askstring("Reassign", "On date (YYYY-MM-DD):", parent=self.parent)
+        if not date or not date.strip():
+            return
+        try:
+            flight_number, date = normalize_flight_number(flight_number), normalize_date(date)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.run("Reassigning", 'reassign_reservations', ids,
+                 lambda seats: f"Moved {len(seats)} reservation(s) to {flight_number} on {date}",
+                 flight_number, date)
+
+    def shift_seats(self):
+        ids = self.selected_ids("move")
+        if not ids:
+            return
+        rows = simpledialog.askinteger("Shift Seats", "Rows to move back (negative moves forward):",
+                                       parent=self.parent)
+        if not rows:
+            return
+        self.run("Shifting seats", 'shift_seats', ids,
+                 lambda seats: f"Moved {len(seats)} passenger(s) {abs(rows)} row(s) "
+                               f"{'back' if rows > 0 else 'forward'}", rows)
+
+    def run(self, title, method, ids, describe, *args):
+        window = ProgressWindow(self.parent, title, len(ids)) if len(ids) >= self.PROGRESS_MIN else None
+        progress = self.db.progress(window.update_progress) if window else None
+
+        def close():
+            if window is not None and window.winfo_exists():
+                window.destroy()
+
+        def done(result):
+            close()
+            self.on_done()
+            messagebox.showinfo("Success", describe(result))
+
+        def failed(error):
+            close()
+            messagebox.showerror("Error", f"{title} failed: {error}")
+
+        self.db.submit(method, ids, *args, progress=progress, callback=done, errback=failed)
@@ -0,0 +1,240 @@
+"""Bulk import/export of reservations.
+
+    python bulk_io.py import bookings.csv --batch-size 20000 --rejects rejects.csv
+    python bulk_io.py export bookings.jsonl
+
+Both directions stream: rows are read from a generator and written with
+``executemany`` one batch at a time, and exports walk the table with
+``fetchmany``, so neither side ever holds the whole file or table in memory.
+
+Archived months (see partitions.py) are read-only: imported rows that
+travel in one are rejected, and exports merge the archives back in.
+"""
+import argparse
+import csv
+import heapq
+import json
+import sqlite3
+import time
+from itertools import islice
+
+from connection import DEFAULT_PROFILE, PROFILES, write_transaction
+from database import INSERT_RESERVATION, Database
+from partitions import archived_error
+from seats import DEFAULT_AIRCRAFT, SEAT_MAPS
+from validation import CITIES, FIELDS, validate_many
+
+EXPORT_COLUMNS = ('id',) + FIELDS + ('created_at',)
+
+
+def detect_format(path):
+    return 'jsonl' if path.endswith(('.jsonl', '.json', '.ndjson')) else 'csv'
+
+
+def read_rows(path, fmt):
+    """Yield ``(line_number, raw_dict)`` from a CSV (with header) or JSONL file"""
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            for line_number, record in enumerate(csv.DictReader(f), start=2):
+                yield line_number, record
+        else:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, {'_error': f"Invalid JSON: {e}"}
+                    continue
+                if not isinstance(record, dict):
+                    record = {'_error': f"Expected a JSON object, got {type(record).__name__}"}
+                yield line_number, record
+
+
+class RejectWriter:
+    """Side file for rows that failed validation or hit a taken seat"""
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self.count = 0
+        self._file = None
+        self._writer = None
+
+    def write(self, line_number, record, error):
+        self.count += 1
+        if self.path is None:
+            return
+        if self._file is None:
+            self._file = open(self.path, 'w', newline='', encoding='utf-8')
+            if self.fmt == 'csv':
+                self._writer = csv.DictWriter(self._file, FIELDS + ('line', 'error'), extrasaction='ignore')
+                self._writer.writeheader()
+        row = {field: record.get(field, '') for field in FIELDS}
+        row.update(line=line_number, error=error)
+        if self.fmt == 'csv':
+            self._writer.writerow(row)
+        else:
+            self._file.write(json.dumps(row) + '\n')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def load_aircraft(conn):
+    return {(flight, date): aircraft for flight, date, aircraft in
+            conn.execute('SELECT flight_number, date, aircraft_type FROM flights')}
+
+
+def load_archived(conn):
+    return {month for (month,) in conn.execute('SELECT month FROM reservation_partitions')}
+
+
+def validated(records, aircraft, rejects, chunk_size=5000, archived=()):
+    """Apply the booking form rules plus the seat map check to each record.
+
+    Records are normalized ``chunk_size`` at a time with
+    ``validation.validate_many``. Records travelling in an ``archived``
+    month are rejected, as ``Database.create_reservation`` would.
+    """
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+        results = validate_many(tuple(record.get(field) for field in FIELDS) for _, record in chunk)
+        for (line_number, record), data in zip(chunk, results):
+            if '_error' in record:
+                data = ValueError(record['_error'])
+            elif not isinstance(data, ValueError) and data[4][:7] in archived:
+                data = archived_error(data[4])
+            elif not isinstance(data, ValueError):
+                seat_map = SEAT_MAPS.get(aircraft.get((data[1], data[4]), DEFAULT_AIRCRAFT),
+                                         SEAT_MAPS[DEFAULT_AIRCRAFT])
+                if data[5] not in seat_map.index:
+                    data = ValueError(f"Seat {data[5]} does not exist on {seat_map.aircraft_type} ({data[1]})")
+            if isinstance(data, ValueError):
+                rejects.write(line_number, record, str(data))
+                continue
+            yield line_number, record, data
+
+
+def import_reservations(conn, path, fmt=None, batch_size=10000, rejects_path=None):
+    """Stream ``path`` into the reservations table; returns ``(imported, rejected)``.
+
+    Each batch is one ``executemany`` inside one ``write_transaction``
+    (BEGIN IMMEDIATE, retried while another writer holds the lock), as
+    ``Database.write`` runs its writes. If a batch hits the
+    one-passenger-per-seat constraint, it is rolled back and replayed row
+    by row in a second transaction, so only the clashing rows are
+    rejected. (A SAVEPOINT inside the transaction would do the same, but
+    journals every page the batch touches and made imports ten times
+    slower.)
+    """
+    fmt = fmt or detect_format(path)
+    rejects = RejectWriter(rejects_path, fmt)
+    rows = validated(read_rows(path, fmt), load_aircraft(conn), rejects, archived=load_archived(conn))
+    imported = 0
+
+    def insert_rows(batch):
+        """``(stored data, clashing records)``, one row at a time, inside the write transaction"""
+        stored, clashes = [], []
+        for line_number, record, data in batch:
+            try:
+                conn.execute(INSERT_RESERVATION, data)
+                stored.append(data)
+            except sqlite3.IntegrityError:
+                clashes.append((line_number, record, data))
+        return stored, clashes
+
+    try:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            stored = [data for _, _, data in batch]
+            try:
+                write_transaction(conn, lambda: conn.executemany(INSERT_RESERVATION, stored))
+                clashes = []
+            except sqlite3.IntegrityError:
+                stored, clashes = write_transaction(conn, lambda: insert_rows(batch))
+            # Written once the batch has committed, so a failed one leaves no rejects behind
+            for line_number, record, data in clashes:
+                rejects.write(line_number, record, f"Seat {data[5]} on {data[1]} ({data[4]}) is already taken")
+            imported += len(stored)
+            # Spellings are learnt from stored rows only (see validation.CityTable)
+            CITIES.update({city for data in stored for city in data[2:4]})
+    finally:
+        rejects.close()
+    return imported, rejects.count
+
+
+def export_reservations(conn, path, fmt=None, batch_size=10000, partitions=None):
+    """Stream every reservation to ``path``; returns the number of rows written.
+
+    ``partitions`` is the Database's Partitions. The archived months are
+    read through connections of their own, so any number of them can be
+    open, and merged with the live table in id order. Without it the
+    export is refused while any month is archived, rather than leave
+    those months out.
+    """
+    fmt = fmt or detect_format(path)
+    select = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM reservations ORDER BY id"
+    months = partitions.months() if partitions is not None else load_archived(conn)
+    if months and partitions is None:
+        raise ValueError(f"{len(months)} month(s) are archived; pass the database's partitions "
+                         f"to export them too")
+    archives = [partitions.connect(stored) for stored, *_ in months.values()] if months else []
+    written = 0
+    try:
+        # Each id lives in one table, so the merge never compares past it
+        rows = heapq.merge(conn.execute(select), *(archive.execute(select) for archive in archives))
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f) if fmt == 'csv' else None
+            if writer:
+                writer.writerow(EXPORT_COLUMNS)
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                if writer:
+                    writer.writerows(batch)
+                else:
+                    f.writelines(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + '\n' for row in batch)
+                written += len(batch)
+    finally:
+        for archive in archives:
+            archive.close()
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import/export of reservations")
+    parser.add_argument('command', choices=('import', 'export'))
+    parser.add_argument('path')
+    parser.add_argument('--db', default='flights.db')
+    parser.add_argument('--format', choices=('csv', 'jsonl'))
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--rejects', help="file for rejected rows (import only)")
+    parser.add_argument('--profile', choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help="connection profile (see connection.py)")
+    args = parser.parse_args(argv)
+
+    db = Database(args.db, args.profile)
+    conn = db.conn
+
+    started = time.perf_counter()
+    if args.command == 'import':
+        imported, rejected = import_reservations(conn, args.path, args.format, args.batch_size, args.rejects)
+        elapsed = time.perf_counter() - started
+        print(f"Imported {imported} rows, rejected {rejected} in {elapsed:.1f}s "
+              f"({imported / max(elapsed, 1e-9):,.0f} rows/s)")
+    else:
+        written = export_reservations(conn, args.path, args.format, args.batch_size, db.partitions)
+        elapsed = time.perf_counter() - started
+        print(f"Exported {written} rows in {elapsed:.1f}s")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
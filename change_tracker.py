@@ -0,0 +1,210 @@
+from connection import write_transaction
+
+CHANGE_LOG_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS reservation_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        reservation_id INTEGER NOT NULL,
+        op TEXT NOT NULL
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS reservations_log_insert AFTER INSERT ON reservations
+    BEGIN
+        INSERT INTO reservation_changes (reservation_id, op) VALUES (new.id, 'insert');
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS reservations_log_update AFTER UPDATE ON reservations
+    BEGIN
+        INSERT INTO reservation_changes (reservation_id, op) VALUES (new.id, 'update');
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS reservations_log_delete AFTER DELETE ON reservations
+    BEGIN
+        INSERT INTO reservation_changes (reservation_id, op) VALUES (old.id, 'delete');
+    END
+    ''',
+]
+
+
+def install_change_log(cursor):
+    for statement in CHANGE_LOG_SCHEMA:
+        cursor.execute(statement)
+
+
+# json_array of a row in database.RESERVATION_COLUMNS order, so a replica
+# can replay the log without reading the primary's tables
+_ROW_JSON = ('json_array(new.id, new.name, new.flight_number, new.departure, new.destination, new.date, '
+             'new.seat_number, new.created_at, new.version)')
+
+CHANGE_PAYLOAD_SCHEMA = [
+    'DROP TRIGGER IF EXISTS reservations_log_insert',
+    'DROP TRIGGER IF EXISTS reservations_log_update',
+] + [
+    f'''
+    CREATE TRIGGER reservations_log_{op} AFTER {op.upper()} ON reservations
+    BEGIN
+        INSERT INTO reservation_changes (reservation_id, op, data) VALUES (new.id, '{op}', {_ROW_JSON});
+    END
+    ''' for op in ('insert', 'update')
+]
+
+
+def install_change_payloads(cursor):
+    """Log the new row with every insert and update (see replication.py)"""
+    cursor.execute('PRAGMA table_info(reservation_changes)')
+    if 'data' not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE reservation_changes ADD COLUMN data TEXT')
+    for statement in CHANGE_PAYLOAD_SCHEMA:
+        cursor.execute(statement)
+
+
+def prune_changes(conn, before_seq, batch_size=10000):
+    """Delete log entries with ``seq < before_seq``; returns how many went.
+
+    The newest entry is always kept, so ``MAX(seq)``, which trackers and
+    followers measure positions against, never goes back. Each batch is
+    a write transaction of its own, so other writers wait for one batch
+    at most. A ChangeTracker or follower that had not read the deleted
+    entries starts over (a full reload or a fresh copy).
+    """
+    def delete():
+        return conn.execute('DELETE FROM reservation_changes WHERE seq IN '
+                            '(SELECT seq FROM reservation_changes WHERE seq < ? '
+                            'AND seq < (SELECT MAX(seq) FROM reservation_changes) ORDER BY seq LIMIT ?)',
+                            (before_seq, batch_size)).rowcount
+
+    deleted = 0
+    while True:
+        count = write_transaction(conn, delete)
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+def merge_op(previous, op):
+    """Fold two consecutive changes to the same row into one (None = no-op).
+
+    Only right for changes folded in the order they happened, i.e. by
+    ``seq``: a delete and an insert fold into 'update' only when the
+    delete came first.
+    """
+    if previous is None:
+        return op
+    if previous == 'insert':
+        return None if op == 'delete' else 'insert'
+    if previous == 'delete':
+        return 'update' if op == 'insert' else 'delete'
+    return op
+
+
+class ChangeTracker:
+    """Remembers which reservation ids changed since a view last synced.
+
+    Writes made through this connection are recorded directly with
+    ``record``, which must be called after the statement and before the
+    commit, while the write lock is still held. Writes from other
+    connections are noticed through ``PRAGMA data_version`` and read
+    back from the ``reservation_changes`` log.
+
+    Changes are folded strictly in ``seq`` order. A local write whose seq
+    follows the last one folded is folded at once; one that lands after
+    unread entries from another connection is left in the log, and
+    ``poll`` folds it there in turn with the rest.
+
+    When more than ``max_pending`` changes pile up (a bulk import, say)
+    the tracker stops itemising them, and ``collect`` returns None to mean
+    "reload everything".
+    """
+
+    max_pending = 10000
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.pending = {}
+        self.overflowed = False
+        # Set when this connection logged changes after entries not yet read
+        self._unread = False
+        self.last_seq = self._max_seq()
+        self.data_version = self._data_version()
+
+    def _max_seq(self):
+        return self.conn.execute('SELECT COALESCE(MAX(seq), 0) FROM reservation_changes').fetchone()[0]
+
+    def _data_version(self):
+        return self.conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def _add(self, reservation_id, op):
+        if self.overflowed:
+            return
+        op = merge_op(self.pending.get(reservation_id), op)
+        if op is None:
+            del self.pending[reservation_id]
+        else:
+            self.pending[reservation_id] = op
+        if len(self.pending) > self.max_pending:
+            self.overflowed = True
+            self.pending = {}
+
+    def record(self, op, reservation_id):
+        seq = self._max_seq()
+        if seq == self.last_seq + 1:
+            self.last_seq = seq
+            self._add(reservation_id, op)
+        else:
+            self._unread = True
+
+    def record_many(self, op, reservation_ids):
+        """``record`` for a statement run once per id, e.g. by executemany"""
+        reservation_ids = list(reservation_ids)
+        if not reservation_ids:
+            return
+        # The log triggers gave this transaction's rows the last seqs
+        seq = self._max_seq()
+        first = seq - len(reservation_ids) + 1
+        if first == self.last_seq + 1:
+            self.last_seq = seq
+            for reservation_id in reservation_ids:
+                self._add(reservation_id, op)
+        else:
+            self._unread = True
+
+    def poll(self):
+        """Pull in changes committed by other connections, if there are any"""
+        version = self._data_version()
+        if version == self.data_version and not self._unread:
+            return False
+        self.data_version = version
+        self._unread = False
+        latest = self._max_seq()
+        if latest - self.last_seq > self.max_pending:
+            self.overflowed = True
+            self.pending = {}
+            self.last_seq = latest
+            return True
+        rows = self.conn.execute(
+            'SELECT seq, reservation_id, op FROM reservation_changes WHERE seq > ? ORDER BY seq',
+            (self.last_seq,)
+        ).fetchall()
+        if rows and rows[0][0] > self.last_seq + 1:
+            # Seqs are contiguous, so a gap means entries this tracker had
+            # not read were pruned (see prune_changes)
+            self.overflowed = True
+            self.pending = {}
+            self.last_seq = rows[-1][0]
+            return True
+        for seq, reservation_id, op in rows:
+            self._add(reservation_id, op)
+            self.last_seq = seq
+        return bool(rows)
+
+    def collect(self):
+        """Return ``{reservation_id: op}`` for everything not yet synced"""
+        self.poll()
+        if self.overflowed:
+            self.overflowed = False
+            return None
+        changes, self.pending = self.pending, {}
+        return changes
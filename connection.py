@@ -0,0 +1,112 @@
+import random
+import sqlite3
+import time
+
+import metrics
+
+
+class ConnectionProfile:
+    """PRAGMA settings applied to every new SQLite connection.
+
+    ``cache_size`` follows SQLite's convention: negative values are KiB,
+    positive values are pages. ``cached_statements`` is the size of the
+    sqlite3 module's prepared-statement cache, per connection.
+    ``query_only`` refuses every write, e.g. on a replica (replication.py).
+    """
+
+    def __init__(self, name, journal_mode='WAL', synchronous='NORMAL', mmap_size=0,
+                 cache_size=-2000, temp_store='DEFAULT', cached_statements=128,
+                 timeout=5.0, path=None, query_only=False):
+        self.name = name
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.temp_store = temp_store
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self.path = path
+        self.query_only = query_only
+
+    def pragmas(self):
+        return [
+            ('journal_mode', self.journal_mode),
+            ('synchronous', self.synchronous),
+            ('mmap_size', self.mmap_size),
+            ('cache_size', self.cache_size),
+            ('temp_store', self.temp_store),
+            ('query_only', 'ON' if self.query_only else 'OFF'),
+        ]
+
+
+PROFILES = {
+    # Every commit is fsynced before it returns; survives power loss
+    'durable': ConnectionProfile('durable', synchronous='FULL', mmap_size=64 * 1024 * 1024,
+                                 cache_size=-16000, temp_store='MEMORY'),
+    # WAL is only fsynced at checkpoints: an OS crash may lose the last
+    # commits, but the file never corrupts and an app crash loses nothing
+    'fast': ConnectionProfile('fast', synchronous='NORMAL', mmap_size=256 * 1024 * 1024,
+                              cache_size=-64000, temp_store='MEMORY', cached_statements=256),
+    # Readers of a replica kept up to date by replication.py; only the
+    # follower writes to it
+    'replica': ConnectionProfile('replica', synchronous='NORMAL', mmap_size=256 * 1024 * 1024,
+                                 cache_size=-64000, temp_store='MEMORY', cached_statements=256,
+                                 query_only=True),
+    # Private in-memory database for tests and benchmarks
+    'memory': ConnectionProfile('memory', journal_mode='MEMORY', synchronous='OFF',
+                                cache_size=-16000, temp_store='MEMORY', path=':memory:'),
+}
+
+DEFAULT_PROFILE = 'fast'
+
+
+def get_profile(profile):
+    if isinstance(profile, ConnectionProfile):
+        return profile
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"Unknown connection profile {profile!r}; choose from {', '.join(PROFILES)}")
+
+
+def connect(db_name='flights.db', profile=DEFAULT_PROFILE):
+    """Open ``db_name`` with the PRAGMAs of ``profile`` (a name or ConnectionProfile)"""
+    profile = get_profile(profile)
+    conn = sqlite3.connect(profile.path or db_name, timeout=profile.timeout,
+                           cached_statements=profile.cached_statements,
+                           factory=metrics.connection_factory())
+    for pragma, value in profile.pragmas():
+        conn.execute(f'PRAGMA {pragma} = {value}')
+    return conn
+
+
+def is_busy(error):
+    return 'locked' in str(error) or 'busy' in str(error)
+
+
+def write_transaction(conn, work, retries=5, backoff=0.05):
+    """Run ``work()`` in a BEGIN IMMEDIATE transaction on ``conn`` and commit it.
+
+    If another connection holds the write lock past the busy timeout,
+    BEGIN is retried ``retries`` times, sleeping ``backoff`` seconds
+    (doubled, with jitter, each retry). Any exception from ``work`` rolls
+    the transaction back.
+    """
+    delay = backoff
+    for attempt in range(retries + 1):
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            break
+        except sqlite3.OperationalError as e:
+            if not is_busy(e) or attempt == retries:
+                raise
+            metrics.count('flights_sqlite_busy_retries_total')
+            time.sleep(delay * random.uniform(0.5, 1.5))
+            delay *= 2
+    try:
+        result = work()
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return result
@@ -0,0 +1,617 @@
+import sqlite3
+from bookings import MAX_PASSENGERS, new_pnr
+from cache import MISSING, LRUCache
+from connection import DEFAULT_PROFILE, connect, get_profile, write_transaction
+from change_tracker import ChangeTracker
+from holds import SeatHolds
+from migrations import migrate
+from partitions import Partitions
+from routes import RouteIndex
+from search import distinct_values, fts_installed, order_terms, where_clause
+from seats import SeatInventory, capacity_sql, seat_taken_error
+from validation import CITIES, normalize_date, normalize_flight_number, normalize_seat
+
+INSERT_RESERVATION = '''
+    INSERT INTO reservations (name, flight_number, departure, destination, date, seat_number)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+# Flights given only an aircraft keep any schedule they already had
+UPSERT_FLIGHT = '''
+    INSERT INTO flights (flight_number, date, aircraft_type, origin, destination, departs, duration)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (flight_number, date) DO UPDATE SET
+        aircraft_type = excluded.aircraft_type,
+        origin = COALESCE(excluded.origin, origin),
+        destination = COALESCE(excluded.destination, destination),
+        departs = COALESCE(excluded.departs, departs),
+        duration = COALESCE(excluded.duration, duration)
+'''
+
+# Rows per executemany call in the bulk actions, between progress reports
+BULK_CHUNK = 500
+
+RESERVATION_COLUMNS = ('id', 'name', 'flight_number', 'departure', 'destination', 'date',
+                       'seat_number', 'created_at', 'version')
+
+SAMPLE_RESERVATIONS = [
+    ('John Doe', 'AA123', 'New York', 'Los Angeles', '2023-12-15', '15A'),
+    ('Jane Smith', 'DL456', 'Chicago', 'Miami', '2023-12-16', '22B'),
+    ('Robert Johnson', 'UA789', 'San Francisco', 'Seattle', '2023-12-17', '8C')
+]
+
+class ConflictError(ValueError):
+    """The reservation was changed by someone else since it was read"""
+
+class Database:
+    """Data access shared by both UIs (main.py, flight_reservation_app.py) and bulk_io.py.
+
+    Schema, queries, the change tracker and the seat inventory all live
+    here, so the UIs never issue SQL of their own.
+    """
+
+    # BEGIN IMMEDIATE attempts after the connection's busy timeout runs out,
+    # and the first backoff in seconds (doubled, with jitter, each retry)
+    busy_retries = 5
+    busy_backoff = 0.05
+    
+    # Read-through caches for get_reservation and get_flight_reservations
+    reservation_cache_size = 10000
+    flight_cache_size = 500
+    cache_ttl = 300
+
+    def __init__(self, db_name='flights.db', profile=DEFAULT_PROFILE):
+        self.db_name = get_profile(profile).path or db_name
+        self.conn = connect(db_name, profile)
+        self.cursor = self.conn.cursor()
+        self.create_tables()
+        self.changes = ChangeTracker(self.conn)
+        self.seats = SeatInventory(self.conn)
+        self.holds = SeatHolds(self.conn)
+        self.routes = RouteIndex(self.conn)
+        self.partitions = Partitions(self.conn, self.db_name)
+        self.reservation_cache = LRUCache(self.reservation_cache_size, self.cache_ttl)
+        self.flight_cache = LRUCache(self.flight_cache_size, self.cache_ttl)
+        self._data_version = None
+        CITIES.update(self.known_cities())
+        
+    def create_tables(self):
+        # The schema lives in migrations.py; on a current file this only
+        # reads PRAGMA user_version
+        migrate(self.conn, self.write)
+        self.has_fts = fts_installed(self.cursor)
+    
+    def write(self, work):
+        """Run ``work()`` in a BEGIN IMMEDIATE transaction and commit it.
+
+        Taking the write lock up front means the reads inside ``work`` (seat
+        checks, versions) cannot go stale before its writes land. If another
+        connection holds the lock past the busy timeout, BEGIN is retried
+        ``busy_retries`` times with exponential backoff. Any exception
+        from ``work`` rolls the transaction back.
+        """
+        return write_transaction(self.conn, work, self.busy_retries, self.busy_backoff)
+    
+    def known_cities(self):
+        """City spellings already in the file: the airports', then the reservations'"""
+        self.cursor.execute('SELECT city FROM airports')
+        cities = [row[0] for row in self.cursor.fetchall()]
+        cities += distinct_values(self.conn, 'reservations', 'departure')
+        cities += distinct_values(self.conn, 'reservations', 'destination')
+        return cities
+    
+    def seed_sample_reservations(self):
+        """Add a few demo bookings to an empty table"""
+        # Looks at one row instead of counting them all, and only takes
+        # the write lock when the table really is empty
+        if self.has_reservations():
+            return
+        
+        def seed():
+            if not self.has_reservations():
+                self.cursor.executemany(INSERT_RESERVATION, SAMPLE_RESERVATIONS)
+                # The table was empty, so every row is a sample
+                self.cursor.execute('SELECT id FROM reservations ORDER BY id')
+                self.changes.record_many('insert', [row[0] for row in self.cursor.fetchall()])
+        self.write(seed)
+    
+    def has_reservations(self):
+        self.cursor.execute('SELECT EXISTS (SELECT 1 FROM reservations)')
+        return bool(self.cursor.fetchone()[0])
+    
+    def create_reservation(self, data, hold=None):
+        """Book a seat; returns the new reservation's id.
+
+        ``hold`` is the token from ``hold_seat``. The seat must not be held
+        by anyone else, and the booking consumes the hold.
+        """
+        flight_number, date, seat_number = data[1], data[4], data[5]
+        
+        def insert():
+            self.partitions.check_writable(date)
+            self.seats.check(flight_number, date, seat_number)
+            self.holds.claim(flight_number, date, seat_number, hold)
+            try:
+                self.cursor.execute(INSERT_RESERVATION, data)
+            except sqlite3.IntegrityError:
+                raise seat_taken_error(flight_number, date, seat_number)
+            reservation_id = self.cursor.lastrowid
+            self.changes.record('insert', reservation_id)
+            return reservation_id
+        
+        reservation_id = self.write(insert)
+        self._learn_cities([data])
+        self.seats.invalidate(flight_number, date)
+        self._forget(reservation_id, (flight_number, date))
+        return reservation_id
+    
+    def create_booking(self, passengers, contact=None):
+        """Book a group under one new PNR, all or nothing; returns ``(pnr, ids)``.
+
+        ``passengers`` are reservation tuples in ``validation.FIELDS``
+        order; a seat_number of None gets the lowest free seat. Every
+        seat on each flight is checked together (see
+        ``SeatInventory.assign``) before anything is written, then the
+        reservations go in with one ``executemany``. Any error rolls the
+        whole group back. ``ids`` follow the order of ``passengers``.
+        """
+        passengers = [tuple(passenger) for passenger in passengers]
+        if not passengers:
+            raise ValueError("A booking needs at least one passenger")
+        if len(passengers) > MAX_PASSENGERS:
+            raise ValueError(f"A booking takes at most {MAX_PASSENGERS} passengers")
+        flights = {}
+        for i, passenger in enumerate(passengers):
+            flights.setdefault((passenger[1], passenger[4]), []).append(i)
+        
+        def book():
+            rows = list(passengers)
+            for (flight_number, date), members in flights.items():
+                self.partitions.check_writable(date)
+                seats = self.seats.assign(flight_number, date, [rows[i][5] or None for i in members],
+                                          self.holds.held_seats(flight_number, date))
+                for i, seat in zip(members, seats):
+                    rows[i] = rows[i][:5] + (seat,)
+            pnr = new_pnr(self.cursor)
+            self.cursor.execute('INSERT INTO bookings (pnr, contact) VALUES (?, ?)', (pnr, contact))
+            # AUTOINCREMENT ids only grow, and the write lock keeps other
+            # connections out, so every id above this one is the group's
+            self.cursor.execute('SELECT COALESCE(MAX(id), 0) FROM reservations')
+            last = self.cursor.fetchone()[0]
+            try:
+                self.cursor.executemany(INSERT_RESERVATION, rows)
+            except sqlite3.IntegrityError:
+                raise ValueError("Seats changed while the group was being booked; try again")
+            self.cursor.execute('SELECT id FROM reservations WHERE id > ? ORDER BY id', (last,))
+            ids = [row[0] for row in self.cursor.fetchall()]
+            self.cursor.executemany('INSERT INTO booking_passengers (pnr, reservation_id) VALUES (?, ?)',
+                                    [(pnr, i) for i in ids])
+            self.changes.record_many('insert', ids)
+            return pnr, ids
+        
+        pnr, ids = self.write(book)
+        self._learn_cities(passengers)
+        self._forget_bulk(ids, *flights)
+        return pnr, ids
+    
+    def get_booking(self, pnr):
+        """``(pnr, contact, created_at, rows)`` for a locator, or None if there is no such booking.
+
+        ``rows`` are the passengers' reservations, archived ones included,
+        in booking order; passengers deleted since are left out.
+        """
+        self.cursor.execute('SELECT pnr, contact, created_at FROM bookings WHERE pnr = ?', (pnr.strip().upper(),))
+        booking = self.cursor.fetchone()
+        if booking is None:
+            return None
+        self.cursor.execute('SELECT reservation_id FROM booking_passengers WHERE pnr = ?', (booking[0],))
+        ids = [row[0] for row in self.cursor.fetchall()]
+        rows = {row[0]: row for row in self.get_reservations_by_ids(ids)}
+        for reservation_id in ids:
+            if reservation_id not in rows:
+                row = self.partitions.get(reservation_id)
+                if row is not None:
+                    rows[reservation_id] = row
+        return (*booking, [rows[i] for i in sorted(rows)])
+    
+    def hold_seat(self, flight_number, date, seat_number, holder=None, token=None, ttl=None):
+        """Hold a free seat for ``ttl`` seconds (default ``SeatHolds.ttl``); returns ``(token, expires_at)``.
+
+        With the ``token`` of an earlier hold, that hold is extended or moved
+        to this seat. Raises ValueError if the seat is booked, does not
+        exist, or someone else holds it. The key is normalized as in
+        validation.py, so it matches the bookings and their holds.
+        """
+        flight_number, date, seat_number = (normalize_flight_number(flight_number), normalize_date(date),
+                                            normalize_seat(seat_number))
+        
+        def hold():
+            self.partitions.check_writable(date)
+            self.seats.check(flight_number, date, seat_number)
+            return self.holds.place(flight_number, date, seat_number, holder, ttl, token)
+        return self.write(hold)
+    
+    def release_hold(self, token):
+        """Give up a hold before it expires; returns False if it was gone already"""
+        return self.write(lambda: self.holds.release(token))
+    
+    def expire_holds(self):
+        """Delete the expired holds this connection knows of; returns how many"""
+        return self.write(self.holds.sweep)
+    
+    def add_flight(self, flight_number, date, aircraft_type, origin=None, destination=None,
+                   departs=None, duration=None):
+        """Set the aircraft (and so the seat map) used for one flight.
+
+        With ``origin``, ``destination``, ``departs`` and ``duration`` (see
+        routes.py) the flight also becomes part of the searchable schedule;
+        without them an existing schedule entry is left as it was.
+        """
+        self.write(lambda: self.cursor.execute(UPSERT_FLIGHT,
+                                               (flight_number, date, aircraft_type, origin, destination,
+                                                departs, duration)))
+        self.seats.invalidate(flight_number, date)
+    
+    def import_schedule(self, legs, batch_size=10000):
+        """Add or replace many flights; ``legs`` yields add_flight argument tuples"""
+        legs = iter(legs)
+        while True:
+            batch = [leg for _, leg in zip(range(batch_size), legs)]
+            if not batch:
+                break
+            self.write(lambda: self.cursor.executemany(UPSERT_FLIGHT, batch))
+            for leg in batch:
+                self.seats.invalidate(leg[0], leg[1])
+    
+    def add_airports(self, airports):
+        """Add or replace ``(code, city, name)`` rows"""
+        self.write(lambda: self.cursor.executemany(
+            'INSERT OR REPLACE INTO airports (code, city, name) VALUES (?, ?, ?)', list(airports)))
+    
+    def search_routes(self, origin, destination, date, max_connections=2, min_layover=45, max_layover=360,
+                      limit=50):
+        """Itineraries from ``routes.RouteIndex.search``"""
+        return self.routes.search(origin, destination, date, max_connections, min_layover, max_layover, limit)
+    
+    def search_routes_json(self, *args, **kwargs):
+        """``search_routes`` as plain dicts, with city names, for the UIs and the API"""
+        cities = self.routes.cities()
+        return [itinerary.as_dict(cities) for itinerary in self.search_routes(*args, **kwargs)]
+    
+    def next_free_window_seat(self, flight_number, date):
+        return self.seats.next_free_window_seat(normalize_flight_number(flight_number), normalize_date(date))
+    
+    def get_all_reservations(self):
+        # Same order as created_at DESC, but served by the rowid
+        self.cursor.execute('SELECT * FROM reservations ORDER BY id DESC')
+        return self.cursor.fetchall()
+    
+    def _list_source(self, filters):
+        # Date ranges reaching archived months read them too, through a
+        # WITH that stands in for the table; FTS only covers the live rows
+        union = self.partitions.union(filters)
+        return union, self.has_fts and not union
+    
+    def count_reservations(self, filters=None):
+        union, fts = self._list_source(filters)
+        where, params = where_clause(filters, fts)
+        self.cursor.execute(f'{union}SELECT COUNT(*) FROM reservations{where}', params)
+        return self.cursor.fetchone()[0]
+    
+    def get_reservation_ids(self, filters=None):
+        """Ids of every reservation matching ``filters``, for "select all" in the views"""
+        union, fts = self._list_source(filters)
+        where, params = where_clause(filters, fts)
+        self.cursor.execute(f'{union}SELECT id FROM reservations{where} ORDER BY id', params)
+        return [row[0] for row in self.cursor.fetchall()]
+    
+    def get_reservations_page(self, limit, after_id=None, before_id=None, offset=0, filters=None, sort=None):
+        """Return up to ``limit`` reservations, newest first unless ``sort`` says otherwise.
+
+        ``after_id``/``before_id`` continue from a row that is already on
+        screen (keyset pagination), ``offset`` is only used when jumping to
+        an arbitrary position. ``filters`` narrows the result, see
+        ``search.where_clause``. ``sort`` is ``(column, descending)`` with a
+        column from ``search.SORT_KEYS``; the keyset bound compares the whole
+        index key of the anchor row, so paging stays an index range scan.
+        A date range that reaches archived months also reads those
+        (see partitions.py).
+        """
+        keys, descending = order_terms(sort)
+        forward = 'DESC' if descending else 'ASC'
+        backward = 'ASC' if descending else 'DESC'
+        if keys == ('id',):
+            bound = 'id {} ?'
+        else:
+            columns = ', '.join(keys)
+            bound = f'({columns}) {{}} (SELECT {columns} FROM reservations WHERE id = ?)'
+        
+        def order(direction):
+            return ', '.join(f'{key} {direction}' for key in keys)
+        
+        union, fts = self._list_source(filters)
+        if after_id is not None:
+            where, params = where_clause(filters, fts, bound.format('<' if descending else '>'))
+            self.cursor.execute(f'{union}SELECT * FROM reservations{where} ORDER BY {order(forward)} LIMIT ?', (after_id, *params, limit))
+            return self.cursor.fetchall()
+        if before_id is not None:
+            where, params = where_clause(filters, fts, bound.format('>' if descending else '<'))
+            self.cursor.execute(f'{union}SELECT * FROM reservations{where} ORDER BY {order(backward)} LIMIT ?', (before_id, *params, limit))
+            return self.cursor.fetchall()[::-1]
+        where, params = where_clause(filters, fts)
+        self.cursor.execute(f'{union}SELECT * FROM reservations{where} ORDER BY {order(forward)} LIMIT ? OFFSET ?', (*params, limit, offset))
+        return self.cursor.fetchall()
+    
+    def get_summary(self, limit=10):
+        """Booking statistics for the summary panel, all computed with GROUP BY.
+
+        Returns ``{'flights': [(flight_number, date, booked)],
+        'routes': [(departure, destination, booked, seats, load_factor)],
+        'destinations': [(destination, booked)]}``, each the top ``limit``.
+        Every query is answered from a covering index.
+        """
+        self.cursor.execute('''
+            SELECT flight_number, date, COUNT(*) AS booked FROM reservations
+            GROUP BY flight_number, date ORDER BY booked DESC, date LIMIT ?
+        ''', (limit,))
+        flights = self.cursor.fetchall()
+        self.cursor.execute(f'''
+            SELECT r.departure, r.destination, SUM(r.booked), SUM({capacity_sql('f.aircraft_type')}) AS seats,
+                   SUM(r.booked) * 1.0 / SUM({capacity_sql('f.aircraft_type')}) AS load_factor
+            FROM (SELECT departure, destination, date, flight_number, COUNT(*) AS booked FROM reservations
+                  GROUP BY departure, destination, date, flight_number) AS r
+            LEFT JOIN flights AS f ON f.flight_number = r.flight_number AND f.date = r.date
+            GROUP BY r.departure, r.destination ORDER BY load_factor DESC LIMIT ?
+        ''', (limit,))
+        routes = self.cursor.fetchall()
+        self.cursor.execute('''
+            SELECT destination, COUNT(*) AS booked FROM reservations
+            GROUP BY destination ORDER BY booked DESC LIMIT ?
+        ''', (limit,))
+        return {'flights': flights, 'routes': routes, 'destinations': self.cursor.fetchall()}
+    
+    def get_reservations_by_ids(self, ids):
+        ids = list(ids)
+        rows = []
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            self.cursor.execute(f'SELECT * FROM reservations WHERE id IN ({placeholders})', chunk)
+            rows.extend(self.cursor.fetchall())
+        return rows
+    
+    def collect_changes(self):
+        return self.changes.collect()
+    
+    def poll_changes(self):
+        """True if another connection committed reservation changes"""
+        return self.changes.poll()
+    
+    def _check_external_writes(self):
+        # Commits from other connections can't be traced to keys, so they
+        # drop both caches; this connection's writes go through _forget.
+        # Only needed before trusting a hit: a miss reads fresh rows anyway.
+        self.cursor.execute('PRAGMA data_version')
+        version = self.cursor.fetchone()[0]
+        if version != self._data_version:
+            self._data_version = version
+            self.reservation_cache.clear()
+            self.flight_cache.clear()
+    
+    def _check_not_archived(self, reservation_id):
+        row = self.partitions.get(reservation_id)
+        if row is not None:
+            self.partitions.check_writable(row[5])
+    
+    def forget_all(self):
+        """Drop every cached row and seat map, e.g. after a month was archived"""
+        self.reservation_cache.clear()
+        self.flight_cache.clear()
+        self.seats.clear()
+    
+    def _learn_cities(self, rows):
+        # Only stored rows teach CITIES a spelling (see validation.CityTable)
+        CITIES.update(city for row in rows for city in (row[2], row[3]))
+    
+    def _forget(self, reservation_id, *flights):
+        self.reservation_cache.invalidate(reservation_id)
+        for flight in flights:
+            self.flight_cache.invalidate(flight)
+    
+    def cache_stats(self):
+        return {'reservations': self.reservation_cache.stats(), 'flights': self.flight_cache.stats()}
+    
+    def get_reservation(self, reservation_id):
+        if reservation_id in self.reservation_cache:
+            self._check_external_writes()
+        row = self.reservation_cache.get(reservation_id)
+        if row is MISSING:
+            self.cursor.execute('SELECT * FROM reservations WHERE id = ?', (reservation_id,))
+            row = self.cursor.fetchone() or self.partitions.get(reservation_id)
+            self.reservation_cache.put(reservation_id, row)
+        return row
+    
+    def get_flight_reservations(self, flight_number, date):
+        """All reservations on one flight, by seat"""
+        key = (flight_number, date)
+        if key not in self.flight_cache:
+            # Keys are cached in normal form, so only a miss is normalized
+            key = (normalize_flight_number(flight_number), normalize_date(date))
+        if key in self.flight_cache:
+            self._check_external_writes()
+        rows = self.flight_cache.get(key)
+        if rows is MISSING:
+            self.cursor.execute(f'SELECT * FROM {self.partitions.table_for(key[1])} '
+                                'WHERE flight_number = ? AND date = ? ORDER BY seat_number', key)
+            rows = tuple(self.cursor.fetchall())
+            self.flight_cache.put(key, rows)
+        return list(rows)
+    
+    def update_reservation(self, reservation_id, data, version=None):
+        """Overwrite a reservation; returns False if it does not exist.
+
+        With ``version`` (as read from the row) the UPDATE only applies if
+        nobody changed the row in between, otherwise ConflictError is
+        raised. Every update bumps the version.
+        """
+        query = '''
+            UPDATE reservations 
+            SET name = ?, flight_number = ?, departure = ?, destination = ?, date = ?, seat_number = ?,
+                version = version + 1
+            WHERE id = ?
+        '''
+        params = (*data, reservation_id)
+        if version is not None:
+            query += ' AND version = ?'
+            params += (version,)
+        new = (data[1], data[4], data[5])
+        
+        def update():
+            self.cursor.execute('SELECT flight_number, date, seat_number FROM reservations WHERE id = ?', (reservation_id,))
+            old = self.cursor.fetchone()
+            if old is None:
+                return None
+            if old != new:
+                self.partitions.check_writable(new[1])
+                self.seats.check(*new)
+                self.holds.check(*new)
+            try:
+                self.cursor.execute(query, params)
+            except sqlite3.IntegrityError:
+                raise seat_taken_error(*new)
+            if not self.cursor.rowcount:
+                raise ConflictError(f"Reservation {reservation_id} was changed by someone else; "
+                                    "reload it and try again")
+            self.changes.record('update', reservation_id)
+            return old
+        
+        old = self.write(update)
+        if old is None:
+            self._check_not_archived(reservation_id)
+            return False
+        self._learn_cities([data])
+        self.seats.invalidate(old[0], old[1])
+        self.seats.invalidate(new[0], new[1])
+        self._forget(reservation_id, old[:2], new[:2])
+        return True
+    
+    def delete_reservation(self, reservation_id):
+        def delete():
+            self.cursor.execute('SELECT flight_number, date FROM reservations WHERE id = ?', (reservation_id,))
+            old = self.cursor.fetchone()
+            self.cursor.execute('DELETE FROM reservations WHERE id = ?', (reservation_id,))
+            if self.cursor.rowcount:
+                self.changes.record('delete', reservation_id)
+            return old
+        
+        old = self.write(delete)
+        if old is None:
+            self._check_not_archived(reservation_id)
+        else:
+            self.seats.invalidate(*old)
+            self._forget(reservation_id, tuple(old))
+        return old is not None
+    
+    def _flights_of(self, ids):
+        """``{id: (flight_number, date, seat_number)}`` for the ids that exist"""
+        ids = list(ids)
+        rows = {}
+        for start in range(0, len(ids), BULK_CHUNK):
+            chunk = ids[start:start + BULK_CHUNK]
+            placeholders = ', '.join('?' * len(chunk))
+            self.cursor.execute(f'SELECT id, flight_number, date, seat_number FROM reservations '
+                                f'WHERE id IN ({placeholders})', chunk)
+            rows.update((row[0], row[1:]) for row in self.cursor.fetchall())
+        return rows
+    
+    def _run_bulk(self, sql, params, progress):
+        # One executemany per chunk, all inside the caller's transaction
+        for start in range(0, len(params), BULK_CHUNK):
+            self.cursor.executemany(sql, params[start:start + BULK_CHUNK])
+            if progress is not None:
+                progress(min(start + BULK_CHUNK, len(params)), len(params))
+    
+    def _forget_bulk(self, ids, *flights):
+        for flight in flights:
+            self.seats.invalidate(*flight)
+        for reservation_id in ids:
+            self.reservation_cache.invalidate(reservation_id)
+        for flight in flights:
+            self.flight_cache.invalidate(flight)
+    
+    def delete_reservations(self, ids, progress=None):
+        """Delete many reservations in one transaction; returns the ids that existed.
+
+        ``progress(done, total)`` is called after every ``BULK_CHUNK`` rows.
+        """
+        def delete():
+            rows = self._flights_of(set(ids))
+            found = sorted(rows)
+            self._run_bulk('DELETE FROM reservations WHERE id = ?', [(i,) for i in found], progress)
+            self.changes.record_many('delete', found)
+            return rows
+        
+        rows = self.write(delete)
+        self._forget_bulk(rows, *{row[:2] for row in rows.values()})
+        return sorted(rows)
+    
+    def reassign_reservations(self, ids, flight_number, date, progress=None):
+        """Move many reservations onto one flight and day, in one transaction.
+
+        Passengers keep their seat numbers where those are free on the new
+        flight, and get the lowest free seat otherwise (see
+        ``SeatInventory.allocate``). Returns ``{id: seat_number}`` for the
+        reservations that moved; those already on that flight stay put.
+        """
+        flight_number, date = normalize_flight_number(flight_number), normalize_date(date)
+        target = (flight_number, date)
+        
+        def reassign():
+            rows = self._flights_of(set(ids))
+            self.partitions.check_writable(date)
+            moving = sorted(i for i, row in rows.items() if row[:2] != target)
+            seats = self.seats.allocate(flight_number, date, [rows[i][2] for i in moving],
+                                        self.holds.held_seats(flight_number, date))
+            try:
+                self._run_bulk('UPDATE reservations SET flight_number = ?, date = ?, seat_number = ?, '
+                               'version = version + 1 WHERE id = ?',
+                               [(flight_number, date, seat, i) for i, seat in zip(moving, seats)], progress)
+            except sqlite3.IntegrityError:
+                raise ValueError(f"Seats on {flight_number} ({date}) changed during the move; try again")
+            self.changes.record_many('update', moving)
+            return {i: rows[i] for i in moving}, dict(zip(moving, seats))
+        
+        old, seats = self.write(reassign)
+        self._forget_bulk(old, target, *{row[:2] for row in old.values()})
+        return seats
+    
+    def shift_seats(self, ids, rows, progress=None):
+        """Move many passengers ``rows`` rows back (forward if negative), in one transaction.
+
+        Every new seat must exist and be free, apart from seats the same
+        shift vacates; otherwise nothing moves. Returns ``{id: seat_number}``.
+        """
+        def shift():
+            found = self._flights_of(set(ids))
+            by_flight = {}
+            for i, (flight, day, seat) in found.items():
+                by_flight.setdefault((flight, day), {})[seat] = i
+            params = []
+            for (flight, day), passengers in by_flight.items():
+                held = self.holds.held_seats(flight, day)
+                for old, new in self.seats.shifted(flight, day, list(passengers), rows, held):
+                    params.append((new, passengers[old]))
+            try:
+                self._run_bulk('UPDATE reservations SET seat_number = ?, version = version + 1 WHERE id = ?',
+                               params, progress)
+            except sqlite3.IntegrityError:
+                raise ValueError("Seats changed during the shift; try again")
+            self.changes.record_many('update', [i for _, i in params])
+            return found, {i: seat for seat, i in params}
+        
+        found, seats = self.write(shift)
+        self._forget_bulk(found, *{row[:2] for row in found.values()})
+        return seats
+    
+    def __del__(self):
+        self.conn.close()
\ No newline at end of file
@@ -0,0 +1,120 @@
+import queue
+import threading
+
+
+class DbWorker:
+    """Runs every database call on one dedicated thread.
+
+    ``connect()`` is the first job on the worker thread, so the SQLite
+    connection it builds (and ``self.target``, its return value) is only
+    ever touched from that thread. It can also be passed to ``open`` later,
+    e.g. once the window is up. ``submit`` queues a job from the Tk
+    thread. Its result is handed to ``callback`` on the Tk thread by
+    polling a result queue with ``root.after`` while jobs are in flight.
+
+    ``on_busy(True/False)`` drives a busy indicator. It is only switched
+    on once a job has been running for ``BUSY_DELAY_MS``, so fast queries
+    don't make it flicker.
+
+    Long jobs can report progress through ``progress(handler)``, which
+    wraps a Tk-thread handler in a callable that is safe to call from the
+    worker thread.
+    """
+
+    POLL_MS = 10
+    BUSY_DELAY_MS = 150
+
+    def __init__(self, root, connect=None, on_error=None, on_busy=None):
+        self.root = root
+        self.target = None
+        self.on_error = on_error
+        self.on_busy = on_busy
+        self.in_flight = 0
+        self._busy_shown = False
+        self._polling = False
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._progress = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="db-worker", daemon=True)
+        self._thread.start()
+        if connect is not None:
+            self.open(connect)
+
+    def open(self, connect, callback=None):
+        """Queue ``connect()``; jobs submitted after this see its result as ``target``"""
+        self.submit(self._connect, connect, callback=callback)
+
+    def _connect(self, connect):
+        self.target = connect()
+        return self.target
+
+    def method(self, name):
+        """Callable for ``target.<name>``; only call it on the worker thread"""
+        return lambda *args, **kwargs: getattr(self.target, name)(*args, **kwargs)
+
+    def submit(self, fn, *args, callback=None, errback=None, **kwargs):
+        """Queue ``fn(*args, **kwargs)``; ``fn`` may name a method of ``target``"""
+        if isinstance(fn, str):
+            fn = self.method(fn)
+        self.in_flight += 1
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.POLL_MS, self._poll)
+            self.root.after(self.BUSY_DELAY_MS, self._show_busy)
+        self._requests.put((fn, args, kwargs, callback, errback))
+
+    def progress(self, handler):
+        """Callable for a job to pass ``*args`` on to ``handler(*args)`` on the Tk thread"""
+        return lambda *args: self._progress.put((handler, args))
+
+    def close(self):
+        self._requests.put(None)
+
+    def _run(self):
+        while True:
+            job = self._requests.get()
+            if job is None:
+                break
+            fn, args, kwargs, callback, errback = job
+            try:
+                self._results.put((callback, fn(*args, **kwargs), False))
+            except Exception as e:
+                self._results.put((errback or self.on_error, e, True))
+
+    def _poll(self):
+        while True:
+            try:
+                handler, args = self._progress.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                handler(*args)
+            except Exception as e:
+                self.root.report_callback_exception(type(e), e, e.__traceback__)
+        while True:
+            try:
+                handler, value, failed = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self.in_flight -= 1
+            try:
+                if handler is not None:
+                    handler(value)
+                elif failed:
+                    raise value
+            except Exception as e:
+                self.root.report_callback_exception(type(e), e, e.__traceback__)
+        if self.in_flight:
+            self.root.after(self.POLL_MS, self._poll)
+            return
+        self._polling = False
+        if self._busy_shown:
+            self._busy_shown = False
+            if self.on_busy is not None:
+                self.on_busy(False)
+
+    def _show_busy(self):
+        if self.in_flight and not self._busy_shown:
+            self._busy_shown = True
+            if self.on_busy is not None:
+                self.on_busy(True)
@@ -1,11 +1,14 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
+from database import ConflictError
+from validation import validate_reservation
 
 class EditReservationPage(tk.Frame):
     def __init__(self, parent, controller):
         super().__init__(parent)
         self.controller = controller
         self.reservation_id = None
+        self.version = None
         
         fields = [
             ("Name", "name"),
@@ -37,9 +40,12 @@ class EditReservationPage(tk.Frame):
     def load_reservation(self, reservation_id):
         """Load reservation data into form fields"""
         self.reservation_id = reservation_id
-        reservation = self.controller.db.get_reservation(reservation_id)
-        
+        self.controller.db.submit('get_reservation', reservation_id, callback=self.fill_form)
+    
+    def fill_form(self, reservation):
+        """Put a fetched reservation row into the form fields"""
         if reservation:
+            self.version = reservation[8]
             for field, value in zip(['name', 'flight_number', 'departure', 
                                    'destination', 'date', 'seat_number'], 
                                    reservation[1:7]):
@@ -48,26 +54,42 @@ class EditReservationPage(tk.Frame):
     
     def update(self):
         """Update reservation in database"""
+        if not self.reservation_id:
+            messagebox.showerror("Error", "No reservation selected")
+            return
+        
+        data = (
+            self.entries['name'].get(),
+            self.entries['flight_number'].get(),
+            self.entries['departure'].get(),
+            self.entries['destination'].get(),
+            self.entries['date'].get(),
+            self.entries['seat_number'].get()
+        )
+        
         try:
-            if not self.reservation_id:
-                raise ValueError("No reservation selected")
-            
-            data = (
-                self.entries['name'].get(),
-                self.entries['flight_number'].get(),
-                self.entries['departure'].get(),
-                self.entries['destination'].get(),
-                self.entries['date'].get(),
-                self.entries['seat_number'].get()
-            )
-            
-            if not all(data):
-                raise ValueError("All fields are required")
-            
-            self.controller.db.update_reservation(self.reservation_id, data)
+            data = validate_reservation(data)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        
+        self.controller.db.submit('update_reservation', self.reservation_id, data, self.version,
+                                  callback=self.updated, errback=self.update_failed)
+    
+    def update_failed(self, error):
+        """Offer to reload the form when someone else saved the reservation first"""
+        if not isinstance(error, ConflictError):
+            messagebox.showerror("Error", str(error))
+            return
+        if messagebox.askyesno("Conflict", f"{error}\n\nLoad the current version now?"):
+            self.load_reservation(self.reservation_id)
+    
+    def updated(self, result):
+        if not result:
+            # update_reservation finds no row: someone else deleted it
+            messagebox.showerror("Conflict", f"Reservation {self.reservation_id} was deleted by someone "
+                                             "else; nothing was saved")
+        else:
             messagebox.showinfo("Success", "Reservation updated successfully!")
-            
-            self.controller.show_frame("ReservationsPage")
-            
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
\ No newline at end of file
+        
+        self.controller.show_frame("ReservationsPage")
\ No newline at end of file
@@ -1,9 +1,27 @@
+import time
+# Cold start is measured from here, before tkinter and the DB modules load
+STARTED = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox
-import sqlite3
 from datetime import datetime
+import metrics
+from virtual_tree import VirtualTreeview
+from bulk_actions import BulkActions
+from database import ConflictError, Database
+from db_worker import DbWorker
+from group_booking import GroupBookingWindow
+from hold_status import HoldStatus
+from route_panel import RouteSearchWindow
+from search_bar import SearchBar
+from summary_panel import SummaryWindow
+from validation import validate_reservation
 
 class FlightReservationApp:
+    EXTERNAL_POLL_MS = 2000
+    # Warn (see metrics.startup_phase) if the window takes longer to appear
+    STARTUP_BUDGET_MS = 150
+    
     def __init__(self, root):
         self.root = root
         self.root.title("Flight Reservation System")
@@ -17,16 +35,31 @@ class FlightReservationApp:
         y = (screen_height/2) - (window_height/2)
         self.root.geometry('%dx%d+%d+%d' % (window_width, window_height, x, y))
         
-        self.init_db()
+        # The database is opened once the window is up (see window_ready)
+        self.db = DbWorker(self.root, on_error=self.show_db_error, on_busy=self.set_busy)
+        self.reservations_loaded = False
+        self.current_reservation_id = None
+        self.current_version = None
         
         self.create_styles()
         
+        self.status_bar = ttk.Frame(self.root)
+        self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.busy_label = ttk.Label(self.status_bar, style='Normal.TLabel')
+        self.busy_label.pack(side=tk.RIGHT, padx=5)
+        self.busy_bar = ttk.Progressbar(self.status_bar, mode='indeterminate', length=120)
+        
         self.main_container = ttk.Frame(self.root)
         self.main_container.pack(fill=tk.BOTH, expand=True)
         
         self.create_frames()
         
         self.show_frame("Home")
+        self.root.after_idle(self.window_ready)
+    
+    def window_ready(self):
+        metrics.startup_phase('window', STARTED, self.STARTUP_BUDGET_MS)
+        self.db.open(self.open_database, callback=lambda db: metrics.startup_phase('database', STARTED))
     
     def create_styles(self):
         style = ttk.Style()
@@ -48,53 +81,35 @@ class FlightReservationApp:
         style.configure('Treeview.Heading', 
                        font=('Arial', 12, 'bold'))
     
-    def init_db(self):
-        self.conn = sqlite3.connect('flights.db')
-        self.cursor = self.conn.cursor()
-        
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS reservations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                flight_number TEXT NOT NULL,
-                departure TEXT NOT NULL,
-                destination TEXT NOT NULL,
-                date TEXT NOT NULL,
-                seat_number TEXT NOT NULL,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        self.cursor.execute("SELECT COUNT(*) FROM reservations")
-        if self.cursor.fetchone()[0] == 0:
-            sample_reservations = [
-                ('John Doe', 'AA123', 'New York', 'Los Angeles', '2023-12-15', '15A'),
-                ('Jane Smith', 'DL456', 'Chicago', 'Miami', '2023-12-16', '22B'),
-                ('Robert Johnson', 'UA789', 'San Francisco', 'Seattle', '2023-12-17', '8C')
-            ]
-            self.cursor.executemany('''
-                INSERT INTO reservations (name, flight_number, departure, destination, date, seat_number)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', sample_reservations)
-            self.conn.commit()
+    def set_busy(self, busy):
+        if busy:
+            self.busy_label.configure(text="Working...")
+            self.busy_bar.pack(side=tk.RIGHT, padx=5, pady=2)
+            self.busy_bar.start(15)
+        else:
+            self.busy_bar.stop()
+            self.busy_bar.pack_forget()
+            self.busy_label.configure(text="")
+    
+    def show_db_error(self, error):
+        messagebox.showerror("Error", str(error))
     
     def create_frames(self):
+        # Each frame is built the first time it is shown (see get_frame)
         self.frames = {}
-        
-        self.frames["Home"] = ttk.Frame(self.main_container)
-        self.create_home_frame()
-        
-        self.frames["Booking"] = ttk.Frame(self.main_container)
-        self.create_booking_frame()
-        
-        self.frames["Reservations"] = ttk.Frame(self.main_container)
-        self.create_reservations_frame()
-        
-        self.frames["Edit"] = ttk.Frame(self.main_container)
-        self.create_edit_frame()
-        
-        for frame in self.frames.values():
-            frame.grid(row=0, column=0, sticky="nsew")
+        self.frame_builders = {
+            "Home": self.create_home_frame,
+            "Booking": self.create_booking_frame,
+            "Reservations": self.create_reservations_frame,
+            "Edit": self.create_edit_frame,
+        }
+    
+    def get_frame(self, frame_name):
+        if frame_name not in self.frames:
+            self.frames[frame_name] = ttk.Frame(self.main_container)
+            self.frames[frame_name].grid(row=0, column=0, sticky="nsew")
+            self.frame_builders[frame_name]()
+        return self.frames[frame_name]
     
     def create_home_frame(self):
         frame = self.frames["Home"]
@@ -140,14 +155,27 @@ class FlightReservationApp:
             entry.grid(row=i+1, column=1, padx=10, pady=5, sticky="w")
             self.booking_entries[field] = entry
         
+        seat_btn = ttk.Button(frame, text="Window Seat", command=self.suggest_window_seat)
+        seat_btn.grid(row=len(fields), column=2, padx=10, pady=5, sticky="w")
+        
+        route_btn = ttk.Button(frame, text="Find Route",
+                               command=lambda: RouteSearchWindow(self.root, self.db, self.booking_entries))
+        route_btn.grid(row=3, column=2, padx=10, pady=5, sticky="w")
+        
+        group_btn = ttk.Button(frame, text="Group Booking",
+                               command=lambda: GroupBookingWindow(self.root, self.db, self.booking_entries))
+        group_btn.grid(row=2, column=2, padx=10, pady=5, sticky="w")
+        
+        self.booking_hold = HoldStatus(frame, self.db, self.booking_entries, style='Normal.TLabel')
+        self.booking_hold.grid(row=len(fields)+1, column=0, columnspan=3, padx=10, sticky="w")
+        
         btn_frame = ttk.Frame(frame)
         btn_frame.grid(row=len(fields)+2, column=0, columnspan=2, pady=20)
         
         submit_btn = ttk.Button(btn_frame, text="Submit", command=self.submit_booking)
         submit_btn.pack(side=tk.LEFT, padx=10)
         
-        back_btn = ttk.Button(btn_frame, text="Back", 
-                            command=lambda: self.show_frame("Home"))
+        back_btn = ttk.Button(btn_frame, text="Back", command=self.leave_booking)
         back_btn.pack(side=tk.LEFT, padx=10)
     
     def create_reservations_frame(self):
@@ -156,7 +184,16 @@ class FlightReservationApp:
         header = ttk.Label(frame, text="All Reservations", style='Header.TLabel')
         header.pack(pady=20)
         
-        self.reservations_tree = ttk.Treeview(frame, columns=('id', 'name', 'flight', 'departure', 'destination', 'date', 'seat'), show='headings')
+        search_bar = SearchBar(frame, on_search=self.search_reservations)
+        search_bar.pack(fill=tk.X, padx=20)
+        
+        db = self.db
+        self.reservations_tree = VirtualTreeview(frame, db.method('count_reservations'), db.method('get_reservations_page'),
+                                                 fetch_rows=db.method('get_reservations_by_ids'),
+                                                 fetch_ids=db.method('get_reservation_ids'),
+                                                 collect_changes=db.method('collect_changes'),
+                                                 run=db.submit,
+                                                 columns=('id', 'name', 'flight', 'departure', 'destination', 'date', 'seat'), show='headings')
         
         self.reservations_tree.heading('id', text='ID')
         self.reservations_tree.heading('name', text='Passenger Name')
@@ -165,6 +202,9 @@ class FlightReservationApp:
         self.reservations_tree.heading('destination', text='Destination')
         self.reservations_tree.heading('date', text='Date')
         self.reservations_tree.heading('seat', text='Seat Number')
+        self.reservations_tree.make_sortable({'id': 'id', 'name': 'name', 'flight': 'flight_number',
+                                              'departure': 'departure', 'destination': 'destination',
+                                              'date': 'date'})
         
         self.reservations_tree.column('id', width=50, anchor='center')
         self.reservations_tree.column('name', width=150)
@@ -174,12 +214,18 @@ class FlightReservationApp:
         self.reservations_tree.column('date', width=100, anchor='center')
         self.reservations_tree.column('seat', width=80, anchor='center')
         
-        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.reservations_tree.yview)
+        scrollbar = ttk.Scrollbar(frame, orient="vertical")
         scrollbar.pack(side="right", fill="y")
-        self.reservations_tree.configure(yscrollcommand=scrollbar.set)
+        self.reservations_tree.attach_scrollbar(scrollbar)
         
         self.reservations_tree.pack(fill='both', expand=True, padx=20, pady=10)
         
+        footer = ttk.Label(frame, style='Normal.TLabel')
+        footer.pack()
+        self.reservations_tree.attach_footer(footer)
+        
+        self.bulk = BulkActions(self.root, self.db, self.reservations_tree, on_done=self.sync_reservations)
+        
         btn_frame = ttk.Frame(frame)
         btn_frame.pack(pady=10)
         
@@ -189,16 +235,27 @@ class FlightReservationApp:
         delete_btn = ttk.Button(btn_frame, text="Delete", command=self.delete_reservation)
         delete_btn.pack(side=tk.LEFT, padx=5)
         
+        reassign_btn = ttk.Button(btn_frame, text="Reassign", command=self.bulk.reassign)
+        reassign_btn.pack(side=tk.LEFT, padx=5)
+        
+        shift_btn = ttk.Button(btn_frame, text="Shift Seats", command=self.bulk.shift_seats)
+        shift_btn.pack(side=tk.LEFT, padx=5)
+        
+        select_btn = ttk.Button(btn_frame, text="Select All", command=self.reservations_tree.select_all)
+        select_btn.pack(side=tk.LEFT, padx=5)
+        
         refresh_btn = ttk.Button(btn_frame, text="Refresh", command=self.load_reservations)
         refresh_btn.pack(side=tk.LEFT, padx=5)
         
+        summary_btn = ttk.Button(btn_frame, text="Summary", command=lambda: SummaryWindow(self.root, self.db))
+        summary_btn.pack(side=tk.LEFT, padx=5)
+        
         back_btn = ttk.Button(btn_frame, text="Back", 
                             command=lambda: self.show_frame("Home"))
         back_btn.pack(side=tk.LEFT, padx=5)
     
     def create_edit_frame(self):
         frame = self.frames["Edit"]
-        self.current_reservation_id = None
         
         # Header
         header = ttk.Label(frame, text="Edit Reservation", style='Header.TLabel')
@@ -232,51 +289,82 @@ class FlightReservationApp:
         back_btn.pack(side=tk.LEFT, padx=10)
     
     def show_frame(self, frame_name):
-        frame = self.frames[frame_name]
+        frame = self.get_frame(frame_name)
         frame.tkraise()
         
         if frame_name == "Reservations":
-            self.load_reservations()
+            if self.reservations_loaded:
+                self.sync_reservations()
+            else:
+                self.load_reservations()
+                self.root.after(self.EXTERNAL_POLL_MS, self.poll_external_changes)
     
     def submit_booking(self):
+        data = (
+            self.booking_entries['name'].get(),
+            self.booking_entries['flight_number'].get(),
+            self.booking_entries['departure'].get(),
+            self.booking_entries['destination'].get(),
+            self.booking_entries['date'].get(),
+            self.booking_entries['seat_number'].get()
+        )
+        
         try:
-            data = (
-                self.booking_entries['name'].get(),
-                self.booking_entries['flight_number'].get(),
-                self.booking_entries['departure'].get(),
-                self.booking_entries['destination'].get(),
-                self.booking_entries['date'].get(),
-                self.booking_entries['seat_number'].get()
-            )
-            
-            if not all(data):
-                raise ValueError("All fields are required")
-            
-            self.cursor.execute('''
-                INSERT INTO reservations (name, flight_number, departure, destination, date, seat_number)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', data)
-            self.conn.commit()
-            
-            messagebox.showinfo("Success", "Reservation created successfully!")
-            
-            for entry in self.booking_entries.values():
-                entry.delete(0, tk.END)
-            
-            self.show_frame("Home")
-            
-        except Exception as e:
+            data = validate_reservation(data)
+        except ValueError as e:
             messagebox.showerror("Error", str(e))
+            return
+        
+        self.db.submit('create_reservation', data, self.booking_hold.token, callback=self.booking_submitted)
     
-    def load_reservations(self):
-        for item in self.reservations_tree.get_children():
-            self.reservations_tree.delete(item)
+    def leave_booking(self):
+        self.booking_hold.release()
+        self.show_frame("Home")
+    
+    def suggest_window_seat(self):
+        flight_number = self.booking_entries['flight_number'].get()
+        date = self.booking_entries['date'].get()
+        if not flight_number or not date:
+            messagebox.showwarning("Warning", "Enter the flight number and date first")
+            return
+        
+        self.db.submit('next_free_window_seat', flight_number, date, callback=self.window_seat_found)
+    
+    def window_seat_found(self, seat_number):
+        if seat_number is None:
+            messagebox.showinfo("Seats", "No window seats left on this flight")
+            return
+        self.booking_entries['seat_number'].delete(0, tk.END)
+        self.booking_entries['seat_number'].insert(0, seat_number)
+        self.booking_hold.refresh()
+    
+    def booking_submitted(self, reservation_id):
+        self.booking_hold.clear()
+        messagebox.showinfo("Success", "Reservation created successfully!")
         
-        self.cursor.execute("SELECT id, name, flight_number, departure, destination, date, seat_number FROM reservations ORDER BY created_at DESC")
-        reservations = self.cursor.fetchall()
+        for entry in self.booking_entries.values():
+            entry.delete(0, tk.END)
         
-        for res in reservations:
-            self.reservations_tree.insert('', 'end', values=res)
+        self.show_frame("Home")
+    
+    def load_reservations(self):
+        self.reservations_tree.refresh()
+        self.reservations_loaded = True
+    
+    def search_reservations(self, filters):
+        self.reservations_tree.set_filters(filters)
+    
+    def sync_reservations(self):
+        self.reservations_tree.sync()
+    
+    def poll_external_changes(self):
+        self.db.submit('poll_changes', callback=self.external_changes_polled,
+                       errback=lambda e: self.root.after(self.EXTERNAL_POLL_MS, self.poll_external_changes))
+    
+    def external_changes_polled(self, changed):
+        if changed and self.frames["Reservations"].winfo_ismapped():
+            self.sync_reservations()
+        self.root.after(self.EXTERNAL_POLL_MS, self.poll_external_changes)
     
     def edit_reservation(self):
         selected = self.reservations_tree.selection()
@@ -284,69 +372,73 @@ class FlightReservationApp:
             messagebox.showwarning("Warning", "Please select a reservation to edit")
             return
         
-        reservation_id = self.reservations_tree.item(selected[0])['values'][0]
+        reservation_id = int(selected[0])
         self.current_reservation_id = reservation_id
         
-        self.cursor.execute("SELECT name, flight_number, departure, destination, date, seat_number FROM reservations WHERE id = ?", (reservation_id,))
-        reservation = self.cursor.fetchone()
-        
+        self.db.submit('get_reservation', reservation_id, callback=self.show_edit_form)
+    
+    def show_edit_form(self, reservation):
         if reservation:
-            for field, value in zip(['name', 'flight_number', 'departure', 'destination', 'date', 'seat_number'], reservation):
+            self.get_frame("Edit")
+            self.current_version = reservation[8]
+            for field, value in zip(['name', 'flight_number', 'departure', 'destination', 'date', 'seat_number'], reservation[1:7]):
                 self.edit_entries[field].delete(0, tk.END)
                 self.edit_entries[field].insert(0, value)
             
             self.show_frame("Edit")
     
     def update_reservation(self):
+        if not self.current_reservation_id:
+            messagebox.showerror("Error", "No reservation selected")
+            return
+        
+        data = (
+            self.edit_entries['name'].get(),
+            self.edit_entries['flight_number'].get(),
+            self.edit_entries['departure'].get(),
+            self.edit_entries['destination'].get(),
+            self.edit_entries['date'].get(),
+            self.edit_entries['seat_number'].get()
+        )
+        
         try:
-            if not self.current_reservation_id:
-                raise ValueError("No reservation selected")
-            
-            data = (
-                self.edit_entries['name'].get(),
-                self.edit_entries['flight_number'].get(),
-                self.edit_entries['departure'].get(),
-                self.edit_entries['destination'].get(),
-                self.edit_entries['date'].get(),
-                self.edit_entries['seat_number'].get()
-            )
-            
-            if not all(data):
-                raise ValueError("All fields are required")
-            
-            self.cursor.execute('''
-                UPDATE reservations 
-                SET name = ?, flight_number = ?, departure = ?, destination = ?, date = ?, seat_number = ?
-                WHERE id = ?
-            ''', (*data, self.current_reservation_id))
-            self.conn.commit()
-            
-            messagebox.showinfo("Success", "Reservation updated successfully!")
-            
-            self.show_frame("Reservations")
-            
-        except Exception as e:
+            data = validate_reservation(data)
+        except ValueError as e:
             messagebox.showerror("Error", str(e))
-    
-    def delete_reservation(self):
-        selected = self.reservations_tree.selection()
-        if not selected:
-            messagebox.showwarning("Warning", "Please select a reservation to delete")
             return
         
-        if not messagebox.askyesno("Confirm", "Are you sure you want to delete this reservation?"):
+        self.db.submit('update_reservation', self.current_reservation_id, data, self.current_version,
+                       callback=self.reservation_updated, errback=self.update_failed)
+    
+    def update_failed(self, error):
+        if not isinstance(error, ConflictError):
+            self.show_db_error(error)
             return
+        if messagebox.askyesno("Conflict", f"{error}\n\nLoad the current version now?"):
+            self.db.submit('get_reservation', self.current_reservation_id, callback=self.show_edit_form)
+    
+    def reservation_updated(self, result):
+        if not result:
+            # update_reservation finds no row: someone else deleted it
+            messagebox.showerror("Conflict", f"Reservation {self.current_reservation_id} was deleted by "
+                                             "someone else; nothing was saved")
+        else:
+            messagebox.showinfo("Success", "Reservation updated successfully!")
         
-        reservation_id = self.reservations_tree.item(selected[0])['values'][0]
-        
-        self.cursor.execute("DELETE FROM reservations WHERE id = ?", (reservation_id,))
-        self.conn.commit()
-        
-        messagebox.showinfo("Success", "Reservation deleted successfully!")
-        
-        self.load_reservations()
+        self.show_frame("Reservations")
+    
+    def delete_reservation(self):
+        self.bulk.delete()
+    
+    # Runs on the DbWorker thread, which owns the connection
+    
+    def open_database(self):
+        db = Database()
+        db.seed_sample_reservations()
+        return db
 
 if __name__ == "__main__":
+    metrics.configure_from_env([('db', Database), ('ui', FlightReservationApp)])
     root = tk.Tk()
     app = FlightReservationApp(root)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,125 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+from validation import validate_passenger
+
+
+class GroupBookingWindow(tk.Toplevel):
+    """Entry form for several passengers on one flight, booked under one PNR.
+
+    ``entries`` is the booking form's ``{field: ttk.Entry}``; its flight,
+    route and date are copied in as the starting point. The whole list
+    goes to ``Database.create_booking`` in one DbWorker job, so the group
+    is one transaction and one round-trip. A blank seat gets the lowest
+    free one. ``on_done(pnr, ids)`` runs after the group is booked.
+    """
+
+    FLIGHT_FIELDS = [("Flight Number", 'flight_number'), ("Departure", 'departure'),
+                     ("Destination", 'destination'), ("Date (YYYY-MM-DD)", 'date')]
+
+    def __init__(self, parent, db, entries, on_done=None):
+        super().__init__(parent)
+        self.title("Group Booking")
+        self.db = db
+        self.on_done = on_done
+
+        form = ttk.Frame(self)
+        form.pack(fill='x', padx=10, pady=10)
+        self.fields = {}
+        for row, (label, field) in enumerate(self.FLIGHT_FIELDS + [("Contact", 'contact')]):
+            ttk.Label(form, text=label).grid(row=row, column=0, padx=(0, 5), pady=2, sticky='e')
+            entry = ttk.Entry(form, width=25)
+            if field in entries:
+                entry.insert(0, entries[field].get())
+            entry.grid(row=row, column=1, pady=2, sticky='w')
+            self.fields[field] = entry
+
+        add = ttk.Frame(self)
+        add.pack(fill='x', padx=10)
+        ttk.Label(add, text="Passenger").pack(side=tk.LEFT)
+        self.name = ttk.Entry(add, width=25)
+        self.name.pack(side=tk.LEFT, padx=5)
+        self.name.bind('<Return>', lambda event: self.add())
+        ttk.Label(add, text="Seat (blank for any)").pack(side=tk.LEFT)
+        self.seat = ttk.Entry(add, width=6)
+        self.seat.pack(side=tk.LEFT, padx=5)
+        self.seat.bind('<Return>', lambda event: self.add())
+        ttk.Button(add, text="Add", command=self.add).pack(side=tk.LEFT, padx=5)
+
+        self.tree = ttk.Treeview(self, columns=('name', 'seat'), show='headings', height=12)
+        self.tree.heading('name', text="Passenger")
+        self.tree.heading('seat', text="Seat")
+        self.tree.column('name', width=250)
+        self.tree.column('seat', width=80, anchor='center')
+        self.tree.pack(fill='both', expand=True, padx=10, pady=10)
+        self.tree.bind('<Delete>', lambda event: self.remove())
+
+        btn_frame = ttk.Frame(self)
+        btn_frame.pack(fill='x', padx=10, pady=(0, 10))
+        self.status = ttk.Label(btn_frame, text="No passengers yet")
+        self.status.pack(side=tk.LEFT)
+        ttk.Button(btn_frame, text="Cancel", command=self.destroy).pack(side=tk.RIGHT, padx=5)
+        self.book_btn = ttk.Button(btn_frame, text="Book Group", command=self.book)
+        self.book_btn.pack(side=tk.RIGHT, padx=5)
+        ttk.Button(btn_frame, text="Remove", command=self.remove).pack(side=tk.RIGHT, padx=5)
+        self.name.focus_set()
+
+    def add(self):
+        name, seat = self.name.get().strip(), self.seat.get().strip().upper()
+        if not name:
+            return
+        self.tree.insert('', tk.END, values=(name, seat))
+        self.name.delete(0, tk.END)
+        self.seat.delete(0, tk.END)
+        self.name.focus_set()
+        self.count_changed()
+
+    def remove(self):
+        selection = self.tree.selection()
+        if selection:
+            self.tree.delete(*selection)
+            self.count_changed()
+
+    def count_changed(self):
+        count = len(self.tree.get_children())
+        self.status.configure(text=f"{count} passenger(s)" if count else "No passengers yet")
+
+    def passengers(self):
+        """Reservation tuples for the list, seat None where it was left blank"""
+        flight = [self.fields[field].get() for _, field in self.FLIGHT_FIELDS]
+        passengers = []
+        for number, item in enumerate(self.tree.get_children(), 1):
+            name, seat = self.tree.item(item, 'values')
+            try:
+                passengers.append(validate_passenger((name, *flight, seat)))
+            except ValueError as e:
+                raise ValueError(f"Passenger {number} ({name}): {e}")
+        return passengers
+
+    def book(self):
+        self.add()
+        try:
+            passengers = self.passengers()
+        except ValueError as e:
+            messagebox.showerror("Error", str(e), parent=self)
+            return
+        if not passengers:
+            messagebox.showwarning("Warning", "Add the passengers first", parent=self)
+            return
+        self.book_btn.state(['disabled'])
+        self.status.configure(text=f"Booking {len(passengers)} passenger(s)...")
+        self.db.submit('create_booking', passengers, self.fields['contact'].get().strip() or None,
+                       callback=self.booked, errback=self.failed)
+
+    def booked(self, result):
+        pnr, ids = result
+        messagebox.showinfo("Success", f"Booked {len(ids)} passenger(s) under PNR {pnr}")
+        if self.on_done is not None:
+            self.on_done(pnr, ids)
+        if self.winfo_exists():
+            self.destroy()
+
+    def failed(self, error):
+        if self.winfo_exists():
+            self.book_btn.state(['!disabled'])
+            self.count_changed()
+            messagebox.showerror("Error", f"Nothing was booked: {error}", parent=self)
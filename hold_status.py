@@ -0,0 +1,88 @@
+import getpass
+import time
+from tkinter import ttk
+from validation import normalize_date, normalize_flight_number, normalize_seat
+
+
+class HoldStatus(ttk.Label):
+    """Holds the seat typed into a booking form and shows how long the hold lasts.
+
+    ``entries`` is the form's ``{field: ttk.Entry}``. Whenever the flight
+    number, date or seat entry loses focus with all three filled in, the
+    seat is held through ``Database.hold_seat`` on the DbWorker ``db``.
+    A later seat moves the same hold. Submit passes ``token`` to
+    ``create_reservation``, then calls ``clear``.
+    """
+
+    TICK_MS = 1000
+    FIELDS = ('flight_number', 'date', 'seat_number')
+    NORMALIZERS = (normalize_flight_number, normalize_date, normalize_seat)
+
+    def __init__(self, parent, db, entries, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.db = db
+        self.entries = entries
+        self.holder = getpass.getuser()
+        self.token = None
+        self.key = None
+        self.expires_at = None
+        self._ticking = False
+        for field in self.FIELDS:
+            entries[field].bind('<FocusOut>', lambda event: self.refresh(), add='+')
+
+    def refresh(self):
+        key = tuple(self.entries[field].get().strip() for field in self.FIELDS)
+        if not all(key):
+            self.release()
+            return
+        # In normal form, so '15a' and '15A' are the same hold
+        try:
+            key = tuple(normalize(value) for normalize, value in zip(self.NORMALIZERS, key))
+        except ValueError as e:
+            self.release()
+            self.failed(e)
+            return
+        if key == self.key and self.expires_at - time.time() > 0:
+            return
+        self.db.submit('hold_seat', *key, self.holder, self.token,
+                       callback=lambda hold: self.held(key, hold), errback=self.failed)
+
+    def held(self, key, hold):
+        self.token, self.expires_at = hold
+        self.key = key
+        if self.winfo_exists():
+            self.tick()
+
+    def failed(self, error):
+        if self.winfo_exists():
+            self.configure(text=str(error))
+
+    def tick(self):
+        if self.key is None or not self.winfo_exists():
+            self._ticking = False
+            return
+        left = int(self.expires_at - time.time())
+        if left <= 0:
+            self.configure(text=f"The hold on seat {self.key[2]} has expired")
+            self._ticking = False
+            return
+        self.configure(text=f"Seat {self.key[2]} held for {left // 60}:{left % 60:02d}")
+        if not self._ticking:
+            self._ticking = True
+            self.after(self.TICK_MS, self._next_tick)
+
+    def _next_tick(self):
+        self._ticking = False
+        self.tick()
+
+    def release(self):
+        """Give the seat back, e.g. when the form is abandoned"""
+        if self.token is not None:
+            self.db.submit('release_hold', self.token, errback=lambda error: None)
+        self.clear()
+
+    def clear(self):
+        """Forget the hold, once a booking has consumed it"""
+        self.token = self.key = self.expires_at = None
+        if self.winfo_exists():
+            self.configure(text="")
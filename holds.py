@@ -0,0 +1,142 @@
+"""Short-lived seat holds, so two operators cannot book the same seat at once.
+
+An operator who types a seat into a booking form places a hold on
+``(flight_number, date, seat_number)``. Until the hold expires, nobody
+else can book that seat or move a passenger into it.
+``Database.create_reservation`` with the hold's token turns the hold
+into the booking.
+
+Holds are rows of ``seat_holds``, so every process on the file sees them
+and they survive a restart. Each SeatHolds also keeps a heap of the
+expiry times it knows of, loaded from the table on first use. A sweep
+pops just the holds that have run out, O(log n) each, and deletes their
+rows by token; it never scans the table. Holds placed by another process
+are not in this heap. Every check compares ``expires_at`` with the
+clock, though, so an expired hold stops blocking the seat at once, and
+its row is swept by the process that placed it or the next one to start.
+"""
+import heapq
+import secrets
+import time
+
+HOLDS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS seat_holds (
+        flight_number TEXT NOT NULL,
+        date TEXT NOT NULL,
+        seat_number TEXT NOT NULL,
+        token TEXT NOT NULL UNIQUE,
+        holder TEXT,
+        expires_at REAL NOT NULL,
+        PRIMARY KEY (flight_number, date, seat_number)
+    ) WITHOUT ROWID
+'''
+
+
+def install_holds(cursor):
+    cursor.execute(HOLDS_TABLE)
+
+
+def seat_held_error(flight_number, date, seat_number, holder, seconds):
+    return ValueError(f"Seat {seat_number} on {flight_number} ({date}) is held by "
+                      f"{holder or 'another operator'} for {max(1, round(seconds))} more second(s)")
+
+
+class SeatHolds:
+    """The holds on one connection's file.
+
+    ``place``, ``release``, ``claim`` and ``sweep`` write, so call them
+    inside a write transaction (``Database.write``); ``check`` and
+    ``held_seats`` only read. ``clock`` returns seconds since the epoch,
+    which stay comparable across processes and restarts.
+    """
+
+    # Seconds a hold lasts unless the caller asks otherwise
+    ttl = 120
+
+    def __init__(self, conn, clock=time.time):
+        self.conn = conn
+        self.clock = clock
+        self._heap = None
+
+    def _expiries(self):
+        # (expires_at, token), built once; refreshed holds leave their old
+        # entry behind, and sweep skips it because the row has moved on
+        if self._heap is None:
+            self._heap = self.conn.execute('SELECT expires_at, token FROM seat_holds').fetchall()
+            heapq.heapify(self._heap)
+        return self._heap
+
+    def sweep(self):
+        """Delete the holds in the heap that have expired; returns how many rows went"""
+        heap = self._expiries()
+        now = self.clock()
+        expired = []
+        while heap and heap[0][0] <= now:
+            expired.append(heapq.heappop(heap))
+        if not expired:
+            return 0
+        cursor = self.conn.cursor()
+        cursor.executemany('DELETE FROM seat_holds WHERE token = ? AND expires_at = ?',
+                           [(token, expires_at) for expires_at, token in expired])
+        return cursor.rowcount
+
+    def _current(self, flight_number, date, seat_number):
+        """``(token, holder, seconds left)`` of the live hold on a seat, or None"""
+        row = self.conn.execute('SELECT token, holder, expires_at FROM seat_holds '
+                                'WHERE flight_number = ? AND date = ? AND seat_number = ?',
+                                (flight_number, date, seat_number)).fetchone()
+        if row is None:
+            return None
+        left = row[2] - self.clock()
+        return (row[0], row[1], left) if left > 0 else None
+
+    def check(self, flight_number, date, seat_number, token=None):
+        """Raise ValueError if someone other than ``token`` holds the seat"""
+        current = self._current(flight_number, date, seat_number)
+        if current is not None and current[0] != token:
+            raise seat_held_error(flight_number, date, seat_number, current[1], current[2])
+
+    def place(self, flight_number, date, seat_number, holder=None, ttl=None, token=None):
+        """Hold a seat; returns ``(token, expires_at)``.
+
+        Passing the token of an earlier hold extends it, or moves it here
+        if it was on another seat. The seat itself is not checked against
+        bookings; ``Database.hold_seat`` does that.
+        """
+        self.sweep()
+        self.check(flight_number, date, seat_number, token)
+        token = token or secrets.token_hex(8)
+        expires_at = self.clock() + (self.ttl if ttl is None else ttl)
+        # REPLACE also drops this token's hold on another seat, and an
+        # expired hold on this one that was not swept yet
+        self.conn.execute('INSERT OR REPLACE INTO seat_holds '
+                          '(flight_number, date, seat_number, token, holder, expires_at) '
+                          'VALUES (?, ?, ?, ?, ?, ?)', (flight_number, date, seat_number, token, holder, expires_at))
+        heapq.heappush(self._expiries(), (expires_at, token))
+        return token, expires_at
+
+    def release(self, token):
+        """Drop a hold early; returns False if it had already gone"""
+        cursor = self.conn.execute('DELETE FROM seat_holds WHERE token = ?', (token,))
+        return cursor.rowcount > 0
+
+    def claim(self, flight_number, date, seat_number, token=None):
+        """Clear the way to book a seat, consuming the hold ``token`` if it has one.
+
+        Raises ValueError if someone else holds the seat. An expired or
+        missing ``token`` is no error while the seat is still free, and a
+        token held on a different seat is released.
+        """
+        self.sweep()
+        self.check(flight_number, date, seat_number, token)
+        self.conn.execute('DELETE FROM seat_holds WHERE flight_number = ? AND date = ? AND seat_number = ?',
+                          (flight_number, date, seat_number))
+        if token is not None:
+            self.release(token)
+
+    def held_seats(self, flight_number, date):
+        """Seats of one flight under a live hold"""
+        rows = self.conn.execute('SELECT seat_number FROM seat_holds '
+                                 'WHERE flight_number = ? AND date = ? AND expires_at > ?',
+                                 (flight_number, date, self.clock()))
+        return {seat for (seat,) in rows}
@@ -1,17 +1,36 @@
+import time
+# Cold start is measured from here, before tkinter and the pages load
+STARTED = time.perf_counter()
+
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, messagebox
 from home import HomePage
+from booking import BookingPage
+from Reservations import ReservationsPage
+from edit_reservation import EditReservationPage
 from database import Database
+from db_worker import DbWorker
+import metrics
 
 class FlightReservationApp(tk.Tk):
+    PAGES = (HomePage, BookingPage, ReservationsPage, EditReservationPage)
+    # Warn (see metrics.startup_phase) if the window takes longer to appear
+    STARTUP_BUDGET_MS = 150
+    
     def __init__(self):
         super().__init__()
         self.title("Flight Reservation System")
         self.geometry("800x600")
         self.resizable(False, False)
         
-        # Initialize database
-        self.db = Database()
+        # Database calls run on a worker thread that owns the connection,
+        # opened once the window is up (see window_ready)
+        self.db = DbWorker(self, on_error=self.show_db_error, on_busy=self.set_busy)
+        
+        # Busy indicator shown while queries are in flight
+        self.status_bar = ttk.Frame(self)
+        self.status_bar.pack(side="bottom", fill="x")
+        self.busy_bar = ttk.Progressbar(self.status_bar, mode="indeterminate", length=120)
         
         # Container for all frames
         self.container = tk.Frame(self)
@@ -19,23 +38,45 @@ class FlightReservationApp(tk.Tk):
         self.container.grid_rowconfigure(0, weight=1)
         self.container.grid_columnconfigure(0, weight=1)
         
-        # Dictionary to hold all frames
+        # Pages are built the first time they are shown (see get_frame)
         self.frames = {}
         
-        # Initialize all pages
-        for F in (HomePage, BookingPage, ReservationsPage, EditReservationPage):
-            frame = F(self.container, self)
-            self.frames[F] = frame
-            frame.grid(row=0, column=0, sticky="nsew")
-        
         self.show_frame(HomePage)
+        self.after_idle(self.window_ready)
+    
+    def window_ready(self):
+        metrics.startup_phase('window', STARTED, self.STARTUP_BUDGET_MS)
+        self.db.open(Database, callback=lambda db: metrics.startup_phase('database', STARTED))
+    
+    def set_busy(self, busy):
+        if busy:
+            self.busy_bar.pack(side="right", padx=5, pady=2)
+            self.busy_bar.start(15)
+        else:
+            self.busy_bar.stop()
+            self.busy_bar.pack_forget()
+    
+    def show_db_error(self, error):
+        messagebox.showerror("Error", str(error))
+    
+    def get_frame(self, cont):
+        # Pages refer to each other by class or by class name
+        if isinstance(cont, str):
+            cont = next(F for F in self.PAGES if F.__name__ == cont)
+        if cont not in self.frames:
+            frame = cont(self.container, self)
+            self.frames[cont] = frame
+            frame.grid(row=0, column=0, sticky="nsew")
+        return self.frames[cont]
     
     def show_frame(self, cont):
-        frame = self.frames[cont]
+        frame = self.get_frame(cont)
         frame.tkraise()
         if hasattr(frame, 'on_show'):
             frame.on_show()
 
 if __name__ == "__main__":
+    metrics.configure_from_env([('db', Database), ('ui', BookingPage), ('ui', ReservationsPage),
+                                ('ui', EditReservationPage)])
     app = FlightReservationApp()
     app.mainloop()
\ No newline at end of file
@@ -0,0 +1,337 @@
+"""Opt-in instrumentation: latency histograms, row counts, SQLite busy
+retries and a slow-query log, exported in the Prometheus text format.
+
+Nothing is wrapped until ``enable()`` is called. A process that never
+enables metrics runs the plain methods and a plain ``sqlite3.Connection``;
+the only cost left is a flag check on the rare BEGIN IMMEDIATE retry.
+
+Once enabled:
+
+- ``instrument(cls, layer)`` wraps the public methods of a class, so every
+  call records its latency, errors and, for list results, rows returned.
+- Connections opened by ``connection.connect`` time every statement. A
+  statement slower than ``slow_query_ms`` is logged on the
+  ``flights.slow_query`` logger together with its ``EXPLAIN QUERY PLAN``.
+  Statement time is measured up to the first row; rows fetched later are
+  counted in the calling method's latency instead.
+
+``configure_from_env`` turns all of this on from environment variables,
+for the Tk apps which have no command line:
+
+    FLIGHTS_METRICS_PORT=9464     serve /metrics on 127.0.0.1:9464
+    FLIGHTS_METRICS_FILE=app.prom rewrite this file every 15 s and at exit
+                                  (node_exporter textfile collector format)
+    FLIGHTS_SLOW_QUERY_MS=50      slow-query threshold (default 100)
+
+``startup_phase`` times the apps' cold start. It is recorded whether or
+not metrics are enabled, and logged on ``flights.startup`` (as a warning
+if it went over budget).
+"""
+import atexit
+import bisect
+import functools
+import inspect
+import logging
+import os
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds in seconds, as in the Prometheus client defaults plus a
+# few sub-millisecond steps: most reads here finish well under 1 ms
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+           0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+slow_query_log = logging.getLogger('flights.slow_query')
+startup_log = logging.getLogger('flights.startup')
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(BUCKETS + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+
+class Registry:
+    """Counters and histograms keyed by ``(name, labels)``; safe across threads"""
+
+    def __init__(self):
+        self.enabled = False
+        self.slow_query_ms = 100
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def observe(self, name, labels, seconds):
+        with self._lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                histogram = self.histograms[name, labels] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name, labels=(), amount=1):
+        with self._lock:
+            self.counters[name, labels] = self.counters.get((name, labels), 0) + amount
+
+    def set(self, name, labels, value):
+        with self._lock:
+            self.gauges[name, labels] = value
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+
+REGISTRY = Registry()
+
+HELP = {
+    'flights_operation_seconds': ('histogram', "Latency of instrumented method calls"),
+    'flights_operation_errors_total': ('counter', "Instrumented calls that raised"),
+    'flights_operation_rows_total': ('counter', "Rows returned by instrumented calls"),
+    'flights_statement_seconds': ('histogram', "Latency of SQLite statements up to the first row"),
+    'flights_slow_queries_total': ('counter', "Statements over the slow-query threshold"),
+    'flights_sqlite_busy_retries_total': ('counter', "BEGIN IMMEDIATE retries after SQLITE_BUSY"),
+    'flights_startup_seconds': ('gauge', "Time from process start until each startup phase finished"),
+}
+
+
+def count(name, labels=(), amount=1):
+    """Bump a counter; a no-op while metrics are disabled"""
+    if REGISTRY.enabled:
+        REGISTRY.count(name, labels, amount)
+
+
+def startup_phase(phase, started, budget_ms=None):
+    """Record the time from ``started`` (a perf_counter value) until now as ``phase``"""
+    seconds = time.perf_counter() - started
+    REGISTRY.set('flights_startup_seconds', (('phase', phase),), seconds)
+    over = budget_ms is not None and seconds * 1000 > budget_ms
+    startup_log.log(logging.WARNING if over else logging.INFO, "%s ready after %.0f ms%s", phase,
+                    seconds * 1000, f" (budget {budget_ms} ms)" if over else "")
+    return seconds
+
+
+def _record(layer, operation, started, result=None, failed=False):
+    labels = (('layer', layer), ('operation', operation))
+    REGISTRY.observe('flights_operation_seconds', labels, time.perf_counter() - started)
+    if failed:
+        REGISTRY.count('flights_operation_errors_total', labels)
+    elif isinstance(result, list):
+        REGISTRY.count('flights_operation_rows_total', labels, len(result))
+
+
+def timed(fn, layer, operation):
+    """Wrap ``fn`` (plain or async) to record its calls under ``operation``"""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = await fn(*args, **kwargs)
+            except BaseException:
+                _record(layer, operation, started, failed=True)
+                raise
+            _record(layer, operation, started, result)
+            return result
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                _record(layer, operation, started, failed=True)
+                raise
+            _record(layer, operation, started, result)
+            return result
+    wrapper.__wrapped_by_metrics__ = True
+    return wrapper
+
+
+def instrument(cls, layer, names=None):
+    """Time the public methods of ``cls`` (or just ``names``), in place.
+
+    Methods are wrapped on the class, so do this before building the
+    objects whose bound methods get handed out (Tk ``command=`` callbacks
+    are bound when the widget is created).
+    """
+    if names is None:
+        names = [name for name, value in vars(cls).items()
+                 if not name.startswith('_') and inspect.isfunction(value)]
+    for name in names:
+        fn = getattr(cls, name)
+        if not getattr(fn, '__wrapped_by_metrics__', False):
+            setattr(cls, name, timed(fn, layer, f'{cls.__name__}.{name}'))
+    return cls
+
+
+class TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _statement_done(self.connection, sql, parameters, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _statement_done(self.connection, sql, None, time.perf_counter() - started)
+
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3 connection whose statements all go through TimedCursor"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+
+def _statement_done(conn, sql, parameters, seconds):
+    verb = sql.lstrip()[:12].split(None, 1)[0].upper()
+    REGISTRY.observe('flights_statement_seconds', (('statement', verb),), seconds)
+    if seconds * 1000 < REGISTRY.slow_query_ms:
+        return
+    statement = ' '.join(sql.split())
+    REGISTRY.count('flights_slow_queries_total', (('statement', verb),))
+    plan = ''
+    if parameters is not None and verb in EXPLAINABLE:
+        try:
+            # A plain cursor, so the EXPLAIN itself is not timed
+            rows = sqlite3.Cursor(conn).execute(f'EXPLAIN QUERY PLAN {sql}', parameters).fetchall()
+            plan = ''.join(f'\n    {row[-1]}' for row in rows)
+        except sqlite3.Error as e:
+            plan = f'\n    (no plan: {e})'
+    slow_query_log.warning("%.1f ms: %s%s", seconds * 1000, statement, plan)
+
+
+def connection_factory():
+    """Class for ``sqlite3.connect(factory=...)``: timed only while enabled"""
+    return TimedConnection if REGISTRY.enabled else sqlite3.Connection
+
+
+def enable(slow_query_ms=None):
+    """Start collecting; connections opened from now on are timed"""
+    if slow_query_ms is not None:
+        REGISTRY.slow_query_ms = slow_query_ms
+    REGISTRY.enabled = True
+
+
+def _labels(labels, extra=()):
+    pairs = [f'{key}="{value}"' for key, value in labels + extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def export_text(registry=REGISTRY):
+    """All metrics in the Prometheus text exposition format"""
+    with registry._lock:
+        histograms = {key: (list(h.cumulative()), h.sum, h.count) for key, h in registry.histograms.items()}
+        counters = dict(registry.counters)
+        counters.update(registry.gauges)
+    lines = []
+    for name, (kind, help_text) in HELP.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'histogram':
+            for (metric, labels), (buckets, total, calls) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, cumulative in buckets:
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{name}_bucket{_labels(labels, (("le", le),))} {cumulative}')
+                lines.append(f'{name}_sum{_labels(labels)} {total}')
+                lines.append(f'{name}_count{_labels(labels)} {calls}')
+        else:
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_textfile(path, registry=REGISTRY):
+    # Written aside and renamed, so a collector never reads half a file
+    with open(path + '.tmp', 'w') as f:
+        f.write(export_text(registry))
+    os.replace(path + '.tmp', path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = export_text().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, host='127.0.0.1'):
+    """Serve ``GET /metrics`` from a daemon thread; returns the server"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+def write_periodically(path, interval=15.0):
+    def run():
+        while True:
+            time.sleep(interval)
+            write_textfile(path)
+    threading.Thread(target=run, name='metrics-textfile', daemon=True).start()
+    atexit.register(write_textfile, path)
+
+
+def configure_from_env(targets=(), environ=os.environ):
+    """Enable metrics if any FLIGHTS_METRICS_* / FLIGHTS_SLOW_QUERY_MS is set.
+
+    ``targets`` is a list of ``(layer, cls)`` to ``instrument``. Returns
+    True if metrics were enabled.
+    """
+    port = environ.get('FLIGHTS_METRICS_PORT')
+    path = environ.get('FLIGHTS_METRICS_FILE')
+    slow_ms = environ.get('FLIGHTS_SLOW_QUERY_MS')
+    if not (port or path or slow_ms):
+        return False
+    enable(float(slow_ms) if slow_ms else None)
+    for layer, cls in targets:
+        instrument(cls, layer)
+    if port:
+        serve(int(port))
+    if path:
+        write_periodically(path)
+    return True
@@ -0,0 +1,307 @@
+"""Versioned schema migrations, keyed on PRAGMA user_version.
+
+    python migrations.py flights.db --status
+    python migrations.py flights.db --batch-size 2000 --pause 0.05
+
+``Database`` calls ``migrate`` each time it opens a file. On a current
+file that is a single PRAGMA read. For a large production file, run the
+command line first, or alongside the app: it upgrades in short
+transactions while the app keeps booking.
+
+A Migration is a list of steps, and no step holds the write lock for
+long:
+
+- ``Statements`` runs a few DDL statements (or callables taking the
+  cursor) in one transaction.
+- ``Backfill`` runs one statement over the table ``batch_size`` rows at
+  a time, in id order. Each batch is a transaction of its own, with a
+  ``pause`` between batches so that other writers get the lock.
+
+SQLite builds an index in one statement, so a CREATE INDEX cannot be
+split into batches. Under WAL, readers carry on while the index is
+built. Writers wait on the busy timeout and the retries in
+``connection.write_transaction``. For a build longer than that, ship the
+index in a migration of its own and run it at a quiet time.
+
+Progress is checkpointed in ``schema_migrations`` inside the same
+transaction as the work. An interrupted upgrade therefore resumes where
+it stopped, and two processes upgrading the same file just share the
+batches. ``user_version`` is only bumped once every step of a migration
+has finished. Until then, code must cope with the migration being
+partly applied: add columns with a default, and make readers tolerate
+rows the backfill has not reached yet.
+"""
+import argparse
+import time
+
+from bookings import install_bookings
+from change_tracker import install_change_log, install_change_payloads
+from connection import DEFAULT_PROFILE, PROFILES, connect, write_transaction
+from holds import install_holds
+from partitions import install_partitions
+from routes import install_routes
+from search import install_search
+from seats import install_seat_inventory
+from validation import normalize_date, normalize_flight_number, normalize_seat
+
+PROGRESS_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER NOT NULL,
+        step INTEGER NOT NULL,
+        position INTEGER,
+        until INTEGER,
+        done INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (version, step)
+    )
+'''
+
+
+class Statements:
+    """DDL applied together in one transaction"""
+
+    def __init__(self, *statements):
+        self.statements = statements
+
+    def until(self, cursor):
+        return None
+
+    def apply(self, cursor, position, until, batch_size):
+        for statement in self.statements:
+            if callable(statement):
+                statement(cursor)
+            else:
+                cursor.execute(statement)
+        return None
+
+    def describe(self):
+        return f"{len(self.statements)} statement(s)"
+
+
+class Backfill:
+    """``sql`` applied to ``table`` in id-ordered batches.
+
+    ``sql`` is run once per batch with ``:start`` and ``:end`` bound; it
+    should touch only rows with ``start < id <= end``. Only rows that
+    existed when the backfill began are visited. Rows inserted later come
+    from code that already knows the new schema, and chasing them would
+    never finish while bookings keep arriving. ``prepare(cursor)`` runs
+    before each batch, e.g. to register SQL functions ``sql`` calls on a
+    connection that resumed the backfill.
+    """
+
+    def __init__(self, table, sql, key='id', prepare=None):
+        self.table = table
+        self.sql = sql
+        self.key = key
+        self.prepare = prepare
+
+    def until(self, cursor):
+        cursor.execute(f'SELECT COALESCE(MAX({self.key}), 0) FROM {self.table}')
+        return cursor.fetchone()[0]
+
+    def apply(self, cursor, position, until, batch_size):
+        start = position or 0
+        cursor.execute(f'SELECT MAX({self.key}) FROM (SELECT {self.key} FROM {self.table} '
+                       f'WHERE {self.key} > ? AND {self.key} <= ? ORDER BY {self.key} LIMIT ?)',
+                       (start, until, batch_size))
+        end = cursor.fetchone()[0]
+        if end is None:
+            return None
+        if self.prepare is not None:
+            self.prepare(cursor)
+        cursor.execute(self.sql, {'start': start, 'end': end})
+        return end
+
+    def describe(self):
+        return f"backfill {self.table}"
+
+
+class Migration:
+    def __init__(self, version, description, steps):
+        self.version = version
+        self.description = description
+        self.steps = steps
+
+
+RESERVATIONS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS reservations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        flight_number TEXT NOT NULL,
+        departure TEXT NOT NULL,
+        destination TEXT NOT NULL,
+        date TEXT NOT NULL,
+        seat_number TEXT NOT NULL,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        version INTEGER NOT NULL DEFAULT 1
+    )
+'''
+
+
+def _lenient(normalize):
+    # A value that does not parse is left for the operator to fix
+    def apply(value):
+        try:
+            return normalize(value)
+        except ValueError:
+            return value
+    return apply
+
+
+def register_normalizers(cursor):
+    """validation.py's normalizers as SQL functions on the cursor's connection"""
+    for normalize in (normalize_flight_number, normalize_date, normalize_seat):
+        cursor.connection.create_function(normalize.__name__, 1, _lenient(normalize), deterministic=True)
+
+
+# Rows stored before validation.py normalized every write. OR IGNORE
+# leaves a row as it was if its normal form would take a seat that is
+# already booked ("1a" beside "1A"), and a date is not moved into an
+# archived month, whose rows live in another file
+NORMALIZE_RESERVATIONS = '''
+    UPDATE OR IGNORE reservations SET
+        flight_number = normalize_flight_number(flight_number),
+        date = CASE WHEN substr(normalize_date(date), 1, 7) IN (SELECT month FROM reservation_partitions)
+                    THEN date ELSE normalize_date(date) END,
+        seat_number = normalize_seat(seat_number),
+        version = version + 1
+    WHERE id > :start AND id <= :end
+      AND (flight_number <> normalize_flight_number(flight_number) OR date <> normalize_date(date)
+           OR seat_number <> normalize_seat(seat_number))
+'''
+
+
+def add_version_column(cursor):
+    # Files created before optimistic locking have no version column
+    cursor.execute('PRAGMA table_info(reservations)')
+    if 'version' not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE reservations ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+
+
+# Append only: a released migration must never change, since files in
+# the field have already recorded it as applied
+MIGRATIONS = [
+    # Every statement is idempotent, so this also adopts files made before
+    # migrations existed (user_version 0, tables already there)
+    Migration(1, "Reservations, change log, search indexes and seat inventory", [
+        Statements(RESERVATIONS_TABLE, add_version_column, install_change_log,
+                   install_search, install_seat_inventory),
+    ]),
+    Migration(2, "Airports and the flight schedule", [
+        Statements(install_routes),
+    ]),
+    Migration(3, "Row payloads in the change log, for replicas", [
+        Statements(install_change_payloads),
+    ]),
+    Migration(4, "Catalogue of archived months", [
+        Statements(install_partitions),
+    ]),
+    Migration(5, "Seat holds", [
+        Statements(install_holds),
+    ]),
+    Migration(6, "Group bookings (PNRs)", [
+        Statements(install_bookings),
+    ]),
+    Migration(7, "Normal forms for flight numbers, dates and seats stored before validation.py", [
+        Backfill('reservations', NORMALIZE_RESERVATIONS, prepare=register_normalizers),
+    ]),
+]
+
+LATEST = MIGRATIONS[-1].version
+
+
+def current_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def pending(conn, migrations=MIGRATIONS):
+    version = current_version(conn)
+    return [migration for migration in migrations if migration.version > version]
+
+
+def _run_step(conn, write, version, index, step, batch_size, pause, progress):
+    def batch():
+        cursor = conn.cursor()
+        # Read inside the transaction, so concurrent runners never redo a batch
+        cursor.execute('SELECT position, until, done FROM schema_migrations WHERE version = ? AND step = ?',
+                       (version, index))
+        position, until, done = cursor.fetchone() or (None, None, 0)
+        if done:
+            return True, position
+        if position is None:
+            until = step.until(cursor)
+        position = step.apply(cursor, position, until, batch_size)
+        finished = position is None
+        cursor.execute('INSERT OR REPLACE INTO schema_migrations (version, step, position, until, done) '
+                       'VALUES (?, ?, ?, ?, ?)', (version, index, position, until, finished))
+        return finished, position
+
+    while True:
+        finished, position = write(batch)
+        if finished:
+            return
+        if progress is not None:
+            progress(version, index, position)
+        if pause:
+            time.sleep(pause)
+
+
+def migrate(conn, write=None, target=None, batch_size=5000, pause=0.01, migrations=MIGRATIONS,
+            progress=None):
+    """Apply pending migrations up to ``target`` (default: all); returns the new version.
+
+    ``write(work)`` runs ``work`` in a write transaction, by default
+    ``connection.write_transaction``. ``progress(version, step, position)``
+    is called after every backfill batch.
+    """
+    if write is None:
+        write = lambda work: write_transaction(conn, work)
+    todo = [migration for migration in pending(conn, migrations)
+            if target is None or migration.version <= target]
+    if not todo:
+        return current_version(conn)
+    write(lambda: conn.execute(PROGRESS_SCHEMA))
+    for migration in todo:
+        for index, step in enumerate(migration.steps):
+            _run_step(conn, write, migration.version, index, step, batch_size, pause, progress)
+
+        def finish(version=migration.version):
+            if current_version(conn) < version:
+                conn.execute(f'PRAGMA user_version = {version}')
+        write(finish)
+    return current_version(conn)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Upgrade a flights database to the latest schema")
+    parser.add_argument('db', nargs='?', default='flights.db')
+    parser.add_argument('--status', action='store_true', help="list pending migrations and exit")
+    parser.add_argument('--target', type=int, help="stop after this version")
+    parser.add_argument('--batch-size', type=int, default=5000, help="rows per backfill transaction")
+    parser.add_argument('--pause', type=float, default=0.05, help="seconds to yield between batches")
+    parser.add_argument('--profile', choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help="connection profile (see connection.py)")
+    args = parser.parse_args(argv)
+
+    conn = connect(args.db, args.profile)
+    print(f"{args.db}: schema version {current_version(conn)}, latest {LATEST}")
+    for migration in pending(conn):
+        steps = ', '.join(step.describe() for step in migration.steps)
+        print(f"  pending {migration.version}: {migration.description} ({steps})")
+    if args.status:
+        conn.close()
+        return
+
+    started = time.perf_counter()
+
+    def report(version, step, position):
+        print(f"  {version}.{step}: up to id {position}", end='\r', flush=True)
+
+    version = migrate(conn, target=args.target, batch_size=args.batch_size, pause=args.pause,
+                      progress=report)
+    print(f"Now at schema version {version} ({time.perf_counter() - started:.1f}s)")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
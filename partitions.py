@@ -0,0 +1,359 @@
+"""Monthly archive partitions of the reservations table, by travel date.
+
+    python partitions.py list flights.db
+    python partitions.py archive flights.db --before 2024-01 [--vacuum]
+    python partitions.py restore flights.db 2023-12
+
+``reservations`` in flights.db holds the live months. ``archive`` moves
+each past month into a file of its own, next to the database
+(flights-2023-12.db), and records it in ``reservation_partitions``. The
+archive file has the same columns and indexes, and is only ever attached
+read-only. A month lives in exactly one place, so Database routes each
+call by travel date:
+
+- bookings, updates and deletes for an archived month are refused;
+  ``restore`` moves a month back if it has to change;
+- ``get_reservation`` falls back to the archives whose id range covers
+  the id;
+- ``get_flight_reservations`` reads the month's partition;
+- list and count queries with ``date_from``/``date_to`` add a UNION ALL
+  arm only for the archived months in that range. SQLite merges the arms
+  along their indexes, so keyset paging stays a range scan. Without a
+  date range they read the live table alone.
+
+An archive is moved in two steps, so a crash in between leaves the
+rows live and the file is rebuilt on the next run:
+
+1. The month is copied into a new file, from a connection of its own
+   that reads the live file without taking its write lock.
+2. One transaction on flights.db deletes the rows the copy holds, at the
+   version copied, and records the partition. If a row of that month
+   was booked or changed between the two steps, it rolls back and starts
+   over.
+
+The deletes go through the change log like any other, so open views and
+replicas drop the rows. Step 2 holds the write lock while the month's
+rows and their FTS entries are deleted, so archive at a quiet time.
+"""
+import argparse
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from datetime import date as Date
+from urllib.parse import quote
+
+from search import SEARCH_INDEXES
+from seats import SEAT_UNIQUE_INDEX
+
+PARTITIONS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS reservation_partitions (
+        month TEXT PRIMARY KEY,
+        path TEXT NOT NULL,
+        rows INTEGER NOT NULL,
+        min_id INTEGER,
+        max_id INTEGER,
+        archived_at TEXT DEFAULT CURRENT_TIMESTAMP
+    ) WITHOUT ROWID
+'''
+
+# Same columns, in the same order, as the live table, so SELECT * lines up
+ARCHIVE_TABLE = '''
+    CREATE TABLE reservations (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        flight_number TEXT NOT NULL,
+        departure TEXT NOT NULL,
+        destination TEXT NOT NULL,
+        date TEXT NOT NULL,
+        seat_number TEXT NOT NULL,
+        created_at TEXT,
+        version INTEGER NOT NULL DEFAULT 1
+    )
+'''
+
+
+def install_partitions(cursor):
+    cursor.execute(PARTITIONS_TABLE)
+
+
+def month_range(month):
+    """``(first day, first day of the next month)`` as ISO dates"""
+    year, number = map(int, month.split('-'))
+    following = (year + 1, 1) if number == 12 else (year, number + 1)
+    return f'{year:04d}-{number:02d}-01', f'{following[0]:04d}-{following[1]:02d}-01'
+
+
+def check_month(month):
+    try:
+        month_range(month)
+        Date.fromisoformat(f'{month}-01')
+    except ValueError:
+        raise ValueError(f"Month must look like YYYY-MM, not {month!r}")
+    return month
+
+
+def archived_error(date):
+    return ValueError(f"Reservations for {date[:7]} are archived and read-only; "
+                      f"restore the month with partitions.py first")
+
+
+def _uri(path, mode):
+    return f"file:{quote(os.path.abspath(path))}?mode={mode}"
+
+
+class Partitions:
+    """The archived months of one Database, attached to its connection on demand.
+
+    SQLite allows ten attached files per connection, so at most
+    ``max_attached`` archives are kept attached and the least recently
+    used is detached first. Attaching is not allowed inside a
+    transaction, so the routing reads (``get``, ``table_for``,
+    ``union``) must run outside one.
+    """
+
+    max_attached = 8
+
+    def __init__(self, conn, db_name):
+        self.conn = conn
+        self.db_name = db_name
+        self._attached = OrderedDict()
+
+    def months(self):
+        """``{month: (path, rows, min_id, max_id)}`` for every archived month"""
+        rows = self.conn.execute('SELECT month, path, rows, min_id, max_id FROM reservation_partitions')
+        return {month: rest for month, *rest in rows}
+
+    def path(self, stored):
+        # Stored relative to the database, so the files can move together
+        return os.path.join(os.path.dirname(os.path.abspath(self.db_name)), stored)
+
+    def connect(self, stored):
+        """A read-only connection of its own to an archive, for streaming a whole month"""
+        return sqlite3.connect(_uri(self.path(stored), 'ro'), uri=True)
+
+    def is_archived(self, date):
+        return self.conn.execute('SELECT 1 FROM reservation_partitions WHERE month = ?',
+                                 (date[:7],)).fetchone() is not None
+
+    def check_writable(self, date):
+        """Raise ValueError if ``date`` falls in an archived month"""
+        if self.is_archived(date):
+            raise archived_error(date)
+
+    def attach(self, month, stored):
+        """Schema name of the month's archive, attaching it read-only if needed"""
+        schema = self._attached.get(month)
+        if schema is not None:
+            self._attached.move_to_end(month)
+            return schema
+        while len(self._attached) >= self.max_attached:
+            _, oldest = self._attached.popitem(last=False)
+            self.conn.execute(f'DETACH DATABASE {oldest}')
+        schema = f"archive_{month.replace('-', '_')}"
+        self.conn.execute('ATTACH DATABASE ? AS ' + schema, (_uri(self.path(stored), 'ro'),))
+        self._attached[month] = schema
+        return schema
+
+    def detach_all(self):
+        while self._attached:
+            _, schema = self._attached.popitem()
+            self.conn.execute(f'DETACH DATABASE {schema}')
+
+    def get(self, reservation_id):
+        """An archived reservation, looked up in the archives whose id range covers it"""
+        for month, (stored, _, min_id, max_id) in self.months().items():
+            if min_id is not None and min_id <= reservation_id <= max_id:
+                schema = self.attach(month, stored)
+                row = self.conn.execute(f'SELECT * FROM {schema}.reservations WHERE id = ?',
+                                        (reservation_id,)).fetchone()
+                if row is not None:
+                    return row
+        return None
+
+    def table_for(self, date):
+        """The table holding reservations travelling on ``date``"""
+        partition = self.months().get(date[:7])
+        if partition is None:
+            return 'reservations'
+        return f'{self.attach(date[:7], partition[0])}.reservations'
+
+    def union(self, filters):
+        """``WITH`` prefix making ``reservations`` span the archives in the filters' date range.
+
+        Returns '' when the range touches no archived month (or there is
+        no range), so the query reads the live table as before.
+        """
+        filters = filters or {}
+        date_from, date_to = filters.get('date_from'), filters.get('date_to')
+        if not date_from and not date_to:
+            return ''
+        months = self.months()
+        wanted = sorted(month for month in months
+                        if (not date_from or month >= date_from[:7]) and (not date_to or month <= date_to[:7]))
+        if not wanted:
+            return ''
+        if len(wanted) > self.max_attached:
+            raise ValueError(f"A date range can span at most {self.max_attached} archived months")
+        arms = [f'SELECT * FROM {self.attach(month, months[month][0])}.reservations' for month in wanted]
+        if not (date_from and date_to and self._all_archived(date_from[:7], date_to[:7], months)):
+            arms.insert(0, 'SELECT * FROM main.reservations')
+        # NOT MATERIALIZED lets the filters and ORDER BY reach every arm's indexes
+        return f"WITH reservations AS NOT MATERIALIZED ({' UNION ALL '.join(arms)}) "
+
+    @staticmethod
+    def _all_archived(first, last, months):
+        month = first
+        while month <= last:
+            if month not in months:
+                return False
+            month = month_range(month)[1][:7]
+        return True
+
+
+def _build_archive(db_name, month, path):
+    """Step 1: copy the month into a fresh file; returns ``{id: version}`` copied"""
+    if os.path.exists(path):
+        # Left by a run that did not finish; the rows are still live
+        os.remove(path)
+    start, end = month_range(month)
+    conn = sqlite3.connect(path)
+    try:
+        # A rollback journal, so the file opens read-only without -wal/-shm
+        conn.execute('PRAGMA journal_mode = DELETE')
+        conn.execute(ARCHIVE_TABLE)
+        conn.execute('ATTACH DATABASE ? AS live', (_uri(db_name, 'ro'),))
+        conn.execute('INSERT INTO reservations SELECT * FROM live.reservations '
+                     'WHERE date >= ? AND date < ? ORDER BY id', (start, end))
+        for statement in SEARCH_INDEXES + [SEAT_UNIQUE_INDEX]:
+            conn.execute(statement)
+        conn.commit()
+        conn.execute('DETACH DATABASE live')
+        return dict(conn.execute('SELECT id, version FROM reservations'))
+    finally:
+        conn.close()
+
+
+def archive_month(db, month, retries=3):
+    """Move every reservation travelling in ``month`` out of ``db`` (a Database) into an archive file.
+
+    Returns the number of rows moved. Only months before the current one
+    can be archived.
+    """
+    check_month(month)
+    if month >= Date.today().isoformat()[:7]:
+        raise ValueError(f"Only past months can be archived, not {month}")
+    if db.db_name == ':memory:':
+        raise ValueError("An in-memory database cannot have archive files")
+    if db.partitions.is_archived(month):
+        raise ValueError(f"{month} is already archived")
+    stem = os.path.splitext(os.path.basename(db.db_name))[0]
+    stored = f'{stem}-{month}.db'
+    path = db.partitions.path(stored)
+    start, end = month_range(month)
+    for attempt in range(retries + 1):
+        copied = _build_archive(db.db_name, month, path)
+
+        def move():
+            cursor = db.conn.cursor()
+            cursor.execute('DELETE FROM main.reservations WHERE (id, version) IN '
+                           '(SELECT id, version FROM archive_new.reservations)')
+            deleted = cursor.rowcount
+            cursor.execute('SELECT EXISTS (SELECT 1 FROM main.reservations WHERE date >= ? AND date < ?)',
+                           (start, end))
+            if deleted != len(copied) or cursor.fetchone()[0]:
+                raise _Stale()
+            cursor.execute('INSERT INTO reservation_partitions (month, path, rows, min_id, max_id) '
+                           'VALUES (?, ?, ?, ?, ?)',
+                           (month, stored, len(copied), min(copied, default=None), max(copied, default=None)))
+            db.changes.record_many('delete', copied)
+
+        db.conn.execute('ATTACH DATABASE ? AS archive_new', (_uri(path, 'ro'),))
+        try:
+            db.write(move)
+        except _Stale:
+            continue
+        finally:
+            db.conn.execute('DETACH DATABASE archive_new')
+        db.forget_all()
+        return len(copied)
+    os.remove(path)
+    raise ValueError(f"{month} kept changing while it was archived; try again later")
+
+
+class _Stale(Exception):
+    """Rows of the month changed between copying and deleting them"""
+
+
+def restore_month(db, month):
+    """Move an archived month back into the live table; returns the rows restored"""
+    check_month(month)
+    partition = db.partitions.months().get(month)
+    if partition is None:
+        raise ValueError(f"{month} is not archived")
+    path = db.partitions.path(partition[0])
+    db.partitions.detach_all()
+    db.conn.execute('ATTACH DATABASE ? AS archive_old', (_uri(path, 'ro'),))
+    try:
+        def restore():
+            cursor = db.conn.cursor()
+            cursor.execute('INSERT INTO main.reservations SELECT * FROM archive_old.reservations ORDER BY id')
+            cursor.execute('SELECT id FROM archive_old.reservations')
+            ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute('DELETE FROM reservation_partitions WHERE month = ?', (month,))
+            db.changes.record_many('insert', ids)
+            return len(ids)
+        restored = db.write(restore)
+    finally:
+        db.conn.execute('DETACH DATABASE archive_old')
+    os.remove(path)
+    db.forget_all()
+    return restored
+
+
+def main(argv=None):
+    from connection import DEFAULT_PROFILE, PROFILES
+    from database import Database
+
+    parser = argparse.ArgumentParser(description="Archive reservations by month of travel")
+    parser.add_argument('--profile', choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help="connection profile (see connection.py)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    listing = commands.add_parser('list', help="show live and archived months")
+    listing.add_argument('db')
+    archive = commands.add_parser('archive', help="move past months into archive files")
+    archive.add_argument('db')
+    archive.add_argument('months', nargs='*', help="YYYY-MM")
+    archive.add_argument('--before', help="every live month before this YYYY-MM")
+    archive.add_argument('--vacuum', action='store_true', help="compact the live file afterwards")
+    restore = commands.add_parser('restore', help="move an archived month back into the live table")
+    restore.add_argument('db')
+    restore.add_argument('month')
+    args = parser.parse_args(argv)
+
+    db = Database(args.db, args.profile)
+    if args.command == 'list':
+        for month, (stored, rows, _, _) in sorted(db.partitions.months().items()):
+            print(f"{month}  archived  {rows:>9} rows  {stored}")
+        for month, rows in db.conn.execute('SELECT substr(date, 1, 7) AS month, COUNT(*) FROM reservations '
+                                           'GROUP BY month ORDER BY month'):
+            print(f"{month}  live      {rows:>9} rows")
+        return
+    if args.command == 'restore':
+        print(f"Restored {restore_month(db, check_month(args.month))} rows of {args.month}")
+        return
+    months = [check_month(month) for month in args.months]
+    if args.before:
+        months += [month for (month,) in db.conn.execute(
+            'SELECT DISTINCT substr(date, 1, 7) FROM reservations WHERE date < ? ORDER BY 1',
+            (f'{check_month(args.before)}-01',))]
+    for month in sorted(set(months)):
+        started = time.perf_counter()
+        rows = archive_month(db, month)
+        print(f"Archived {rows} rows of {month} in {time.perf_counter() - started:.1f}s")
+    if args.vacuum:
+        db.conn.execute('VACUUM')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+"""Compact in-memory forms of reservation rows.
+
+``Reservation`` is a ``__slots__`` record for code that handles rows one
+at a time. ``ReservationSnapshot`` holds a large result set column by
+column, for read-only list, sort and aggregate views:
+
+- ids are kept in an ``array('q')``
+- names are kept in one UTF-8 buffer with an offset array
+- flight numbers, cities and seats are dictionary-encoded: each distinct
+  string is stored once and interned, and rows hold a 4-byte code
+- dates are kept as 4-byte day ordinals
+
+Measured with tracemalloc on 1M synthetic rows (the benchmarks/harness.py
+data; CPython 3.11, 64-bit). The first figure covers the seven list-view
+columns, the second the full ``SELECT *`` row:
+
+- ``fetchall()`` tuples take about 480 or 560 bytes per row.
+- ``Reservation`` records take about 550 bytes per row, no better than
+  tuples. The fields are separate str objects either way; slots only
+  save over a per-instance dict.
+- ``ReservationSnapshot`` takes about 46 bytes per row, including
+  the distinct strings. That is roughly a tenth of the tuples.
+"""
+import sys
+from array import array
+from collections import Counter
+from datetime import date
+
+from search import where_clause
+
+SNAPSHOT_COLUMNS = ('id', 'name', 'flight_number', 'departure', 'destination', 'date', 'seat_number')
+
+_SELECT = f"SELECT {', '.join(SNAPSHOT_COLUMNS)} FROM reservations"
+
+
+class Reservation:
+    __slots__ = ('id', 'name', 'flight_number', 'departure', 'destination', 'date', 'seat_number',
+                 'created_at', 'version')
+
+    def __init__(self, id, name, flight_number, departure, destination, date, seat_number,
+                 created_at=None, version=1):
+        self.id = id
+        self.name = name
+        self.flight_number = flight_number
+        self.departure = departure
+        self.destination = destination
+        self.date = date
+        self.seat_number = seat_number
+        self.created_at = created_at
+        self.version = version
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row)
+
+    def as_row(self):
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    def __repr__(self):
+        return f"Reservation({self.id}, {self.name!r}, {self.flight_number!r}, {self.date!r}, {self.seat_number!r})"
+
+
+class StringTable:
+    """Dictionary encoding: every distinct string is stored once"""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(sys.intern(value))
+        return code
+
+    def ranks(self):
+        """``ranks[code]`` is the position of that string in sorted order"""
+        ranks = array('I', bytes(4 * len(self.values)))
+        for rank, code in enumerate(sorted(range(len(self.values)), key=self.values.__getitem__)):
+            ranks[code] = rank
+        return ranks
+
+
+class ReservationSnapshot:
+    """Read-only columnar copy of the reservations table (or a filtered part).
+
+    Rows are kept newest first (``id DESC``). ``sort`` reorders the rows by
+    any column without copying them. ``count_rows`` and ``fetch_page``
+    follow the VirtualTreeview protocol, so a snapshot can back a view
+    directly. Filters are not applied at fetch time; load a filtered
+    snapshot instead.
+    """
+
+    _encoded = ('flight_number', 'departure', 'destination', 'seat_number')
+
+    def __init__(self):
+        self.ids = array('q')
+        self._names = bytearray()
+        self._name_ends = array('I')
+        self.tables = {column: StringTable() for column in self._encoded}
+        self.codes = {column: array('I') for column in self._encoded}
+        self.dates = array('i')
+        self._odd_dates = {}
+        self._ordinals = {}
+        self._order = None
+        self._positions = None
+
+    @classmethod
+    def load(cls, db, filters=None, batch_size=10000):
+        """Stream ``reservations`` (narrowed by ``filters``) from a Database"""
+        snapshot = cls()
+        where, params = where_clause(filters, db.has_fts)
+        cursor = db.conn.execute(f'{_SELECT}{where} ORDER BY id DESC', params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                snapshot.append(row)
+        return snapshot
+
+    def append(self, row):
+        """Add one row; rows must arrive in descending id order"""
+        reservation_id, name, flight_number, departure, destination, day, seat_number = row
+        index = len(self.ids)
+        self.ids.append(reservation_id)
+        self._names += name.encode()
+        self._name_ends.append(len(self._names))
+        for column, value in zip(self._encoded, (flight_number, departure, destination, seat_number)):
+            self.codes[column].append(self.tables[column].encode(value))
+        ordinal = self._ordinals.get(day)
+        if ordinal is None:
+            try:
+                ordinal = date.fromisoformat(day).toordinal()
+            except ValueError:
+                ordinal = 0
+            self._ordinals[day] = ordinal
+        self.dates.append(ordinal)
+        if not ordinal:
+            self._odd_dates[index] = day
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nbytes(self):
+        """Approximate bytes held per row, not counting the distinct strings"""
+        arrays = [self.ids, self._name_ends, self.dates, *self.codes.values()]
+        return sum(a.itemsize * len(a) for a in arrays) + len(self._names)
+
+    def _name(self, index):
+        start = self._name_ends[index - 1] if index else 0
+        return self._names[start:self._name_ends[index]].decode()
+
+    def _date(self, index):
+        ordinal = self.dates[index]
+        return date.fromordinal(ordinal).isoformat() if ordinal else self._odd_dates[index]
+
+    def value(self, index, column):
+        if column == 'id':
+            return self.ids[index]
+        if column == 'name':
+            return self._name(index)
+        if column == 'date':
+            return self._date(index)
+        return self.tables[column].values[self.codes[column][index]]
+
+    def row(self, index):
+        return tuple(self.value(index, column) for column in SNAPSHOT_COLUMNS)
+
+    def record(self, index):
+        return Reservation(*self.row(index))
+
+    def sort(self, column=None, descending=False):
+        """Order rows by ``column`` (ties stay newest first); None restores id order"""
+        if column is None or (column == 'id' and descending):
+            self._order = self._positions = None
+            return
+        rows = range(len(self.ids))
+        if column == 'id':
+            order = reversed(rows)
+        elif column == 'name':
+            order = sorted(rows, key=self._name, reverse=descending)
+        elif column == 'date':
+            order = sorted(rows, key=self.dates.__getitem__, reverse=descending)
+        elif column in self.tables:
+            ranks, codes = self.tables[column].ranks(), self.codes[column]
+            order = sorted(rows, key=lambda i: ranks[codes[i]], reverse=descending)
+        else:
+            raise ValueError(f"Unknown column {column!r}")
+        self._order = array('I', order)
+        self._positions = array('I', bytes(4 * len(self._order)))
+        for position, index in enumerate(self._order):
+            self._positions[index] = position
+
+    def _index(self, position):
+        return self._order[position] if self._order is not None else position
+
+    def _position_of(self, reservation_id):
+        # Binary search; ids are stored in descending order
+        lo, hi = 0, len(self.ids)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.ids[mid] > reservation_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(self.ids) or self.ids[lo] != reservation_id:
+            raise KeyError(reservation_id)
+        return self._positions[lo] if self._positions is not None else lo
+
+    def count_rows(self, filters=None):
+        return len(self.ids)
+
+    def fetch_page(self, limit, after_id=None, before_id=None, offset=0, filters=None):
+        if after_id is not None:
+            start = self._position_of(after_id) + 1
+        elif before_id is not None:
+            end = self._position_of(before_id)
+            start = max(0, end - limit)
+            limit = end - start
+        else:
+            start = offset
+        end = min(len(self.ids), start + limit)
+        return [self.row(self._index(position)) for position in range(start, end)]
+
+    def count_by(self, *columns):
+        """``Counter`` of rows per distinct value (tuple) of ``columns``"""
+        counts = Counter(zip(*(self._column_keys(column) for column in columns)))
+        return Counter({tuple(self._decode(column, key) for column, key in zip(columns, keys)): n
+                        for keys, n in counts.items()})
+
+    def _column_keys(self, column):
+        if column in self.codes:
+            return self.codes[column]
+        if column == 'date':
+            return self.dates
+        raise ValueError(f"Can only group by {', '.join(self._encoded + ('date',))}")
+
+    def _decode(self, column, key):
+        if column in self.tables:
+            return self.tables[column].values[key]
+        # Unparseable dates all count under None
+        return date.fromordinal(key).isoformat() if key else None
@@ -0,0 +1,268 @@
+"""Read replicas that follow a primary flights.db through its change log.
+
+    python replication.py follow flights.db replica.db --interval 1
+    python replication.py status replica.db
+    python replication.py prune flights.db --replica replica.db
+    python api_server.py --db replica.db --profile replica --port 8081
+
+Every insert, update and delete on ``reservations`` is appended to
+``reservation_changes`` by triggers (see change_tracker.py). The triggers
+cover every writer: both UIs, the API, bulk_io.py and the bulk actions.
+The log is append-only and numbered by ``seq``, and inserts and updates
+carry the new row as JSON. A follower:
+
+- starts the replica as a consistent copy of the primary, made with the
+  SQLite backup API, and remembers the last ``seq`` that copy contains;
+- then polls for ``seq > last``, and replays each batch on the replica
+  in one transaction. It updates its position in the same transaction,
+  so a follower that is killed resumes without skipping or repeating
+  changes;
+- copies ``flights`` and ``airports`` whole when the primary's
+  ``schedule_version`` moves, since the schedule changes rarely;
+- starts over from a fresh copy when the primary's schema version
+  changes, when its log is behind the replica's position (the file was
+  replaced or restored), or when the entries after that position have
+  been pruned.
+
+The follower only reads the primary, from a WAL read transaction, so it
+never takes the primary's write lock. Replica readers open the file with
+the ``replica`` connection profile (``PRAGMA query_only``) and see each
+batch at its commit. Their ChangeTrackers pick replayed rows up from the
+replica's own log, so open views sync as they would on the primary.
+
+Inserts and updates log a full copy of the row, so the log grows with
+every write. ``prune`` deletes the entries below the lowest position of
+the replicas it is given (or below ``--before``). A follower that was
+not listed, and is further behind, takes a fresh copy on its next poll.
+"""
+import argparse
+import itertools
+import json
+import sqlite3
+import threading
+import time
+
+from change_tracker import prune_changes
+from connection import DEFAULT_PROFILE, PROFILES, connect, write_transaction
+from database import RESERVATION_COLUMNS
+
+REPLICATION_STATE = '''
+    CREATE TABLE IF NOT EXISTS replication_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        source TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        schema_version INTEGER NOT NULL,
+        schedule_version INTEGER NOT NULL,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+UPSERT_RESERVATION = f'''
+    INSERT INTO reservations ({', '.join(RESERVATION_COLUMNS)})
+    VALUES ({', '.join('?' * len(RESERVATION_COLUMNS))})
+    ON CONFLICT (id) DO UPDATE SET
+        {', '.join(f'{column} = excluded.{column}' for column in RESERVATION_COLUMNS[1:])}
+'''
+
+SCHEDULE_TABLES = ('flights', 'airports')
+
+
+class FileSource:
+    """A primary database file on this machine, read through its own connection"""
+
+    def __init__(self, path, profile=DEFAULT_PROFILE):
+        self.path = path
+        self.conn = connect(path, profile)
+
+    def schema_version(self):
+        return self.conn.execute('PRAGMA user_version').fetchone()[0]
+
+    def schedule_version(self):
+        return self.conn.execute('SELECT version FROM schedule_version').fetchone()[0]
+
+    def last_seq(self):
+        return self.conn.execute('SELECT COALESCE(MAX(seq), 0) FROM reservation_changes').fetchone()[0]
+
+    def first_seq(self):
+        """Oldest entry still in the log (see change_tracker.prune_changes), or None"""
+        return self.conn.execute('SELECT MIN(seq) FROM reservation_changes').fetchone()[0]
+
+    def changes_after(self, seq, limit):
+        """``[(seq, reservation_id, op, data), ...]`` in log order"""
+        return self.conn.execute('SELECT seq, reservation_id, op, data FROM reservation_changes '
+                                 'WHERE seq > ? ORDER BY seq LIMIT ?', (seq, limit)).fetchall()
+
+    def rows(self, table):
+        return self.conn.execute(f'SELECT * FROM {table}').fetchall()
+
+    def copy_to(self, conn):
+        """Overwrite ``conn``'s database with a snapshot of this one"""
+        self.conn.backup(conn)
+
+    def close(self):
+        self.conn.close()
+
+
+class Follower:
+    """Keeps ``replica_path`` up to date with ``source`` (a FileSource or a path)"""
+
+    batch_size = 1000
+
+    def __init__(self, source, replica_path, profile=DEFAULT_PROFILE):
+        self.source = FileSource(source) if isinstance(source, str) else source
+        self.replica_path = replica_path
+        self.conn = connect(replica_path, profile)
+        self.copies = 0
+
+    def state(self):
+        """``(seq, schema_version, schedule_version)`` the replica is at, or None"""
+        try:
+            return self.conn.execute('SELECT seq, schema_version, schedule_version '
+                                     'FROM replication_state').fetchone()
+        except sqlite3.OperationalError:
+            return None
+
+    def copy(self):
+        """Start over from a snapshot of the primary"""
+        self.source.copy_to(self.conn)
+
+        def stamp():
+            # Read from the copy itself, which is exactly what it contains
+            seq = self.conn.execute('SELECT COALESCE(MAX(seq), 0) FROM reservation_changes').fetchone()[0]
+            schema_version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+            schedule_version = self.conn.execute('SELECT version FROM schedule_version').fetchone()[0]
+            self.conn.execute(REPLICATION_STATE)
+            self.conn.execute('INSERT OR REPLACE INTO replication_state '
+                              '(id, source, seq, schema_version, schedule_version) VALUES (1, ?, ?, ?, ?)',
+                              (self.source.path, seq, schema_version, schedule_version))
+        write_transaction(self.conn, stamp)
+        self.copies += 1
+
+    def poll(self):
+        """Apply whatever the primary logged since the last poll; returns the changes applied"""
+        state = self.state()
+        first = None if state is None else self.source.first_seq()
+        if (state is None or self.source.schema_version() != state[1]
+                or self.source.last_seq() < state[0] or (first is not None and first > state[0] + 1)):
+            self.copy()
+            return 0
+        seq, _, schedule_version = state
+        applied = 0
+        while True:
+            changes = self.source.changes_after(seq, self.batch_size)
+            if not changes:
+                break
+            write_transaction(self.conn, lambda: self._apply(changes))
+            seq = changes[-1][0]
+            applied += len(changes)
+        version = self.source.schedule_version()
+        if version != schedule_version:
+            write_transaction(self.conn, lambda: self._copy_schedule(version))
+        return applied
+
+    def _apply(self, changes):
+        cursor = self.conn.cursor()
+        # Replayed in log order, the replica passes through the primary's
+        # states, so the seat index never sees a clash. Runs of deletes or
+        # upserts each go through one executemany
+        for deletes, run in itertools.groupby(changes, key=lambda change: change[2] == 'delete'):
+            if deletes:
+                cursor.executemany('DELETE FROM reservations WHERE id = ?', [(change[1],) for change in run])
+            else:
+                cursor.executemany(UPSERT_RESERVATION, [self._row(*change) for change in run])
+        cursor.execute('UPDATE replication_state SET seq = ?, updated_at = CURRENT_TIMESTAMP',
+                       (changes[-1][0],))
+
+    def _row(self, seq, reservation_id, op, data):
+        if data is None:
+            # Logged before the log carried rows; only a fresh copy has it
+            raise ValueError(f"Change {seq} has no row data; remove {self.replica_path} to copy afresh")
+        return json.loads(data)
+
+    def _copy_schedule(self, version):
+        cursor = self.conn.cursor()
+        for table in SCHEDULE_TABLES:
+            rows = self.source.rows(table)
+            cursor.execute(f'DELETE FROM {table}')
+            if rows:
+                cursor.executemany(f"INSERT INTO {table} VALUES ({', '.join('?' * len(rows[0]))})", rows)
+        cursor.execute('UPDATE replication_state SET schedule_version = ?, updated_at = CURRENT_TIMESTAMP',
+                       (version,))
+
+    def follow(self, interval=1.0, stop=None):
+        """Poll every ``interval`` seconds until ``stop`` (a threading.Event) is set"""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            self.poll()
+            stop.wait(interval)
+
+    def close(self):
+        self.conn.close()
+        self.source.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Follow a primary flights database into a read replica")
+    commands = parser.add_subparsers(dest='command', required=True)
+    follow = commands.add_parser('follow', help="copy the primary, then replay its change log")
+    follow.add_argument('primary')
+    follow.add_argument('replica')
+    follow.add_argument('--interval', type=float, default=1.0, help="seconds between polls")
+    follow.add_argument('--once', action='store_true', help="catch up once and exit")
+    follow.add_argument('--profile', choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help="connection profile for both files (see connection.py)")
+    status = commands.add_parser('status', help="show where a replica is")
+    status.add_argument('replica')
+    prune = commands.add_parser('prune', help="delete change log entries the replicas have applied")
+    prune.add_argument('primary')
+    prune.add_argument('--replica', action='append', default=[],
+                       help="replica whose position must be kept; repeat for each follower")
+    prune.add_argument('--before', type=int, help="delete the entries below this seq")
+    args = parser.parse_args(argv)
+
+    if args.command == 'prune':
+        if not args.replica and args.before is None:
+            parser.error("prune needs --replica or --before")
+        positions = [] if args.before is None else [args.before]
+        for path in args.replica:
+            conn = connect(path, 'replica')
+            positions.append(conn.execute('SELECT seq FROM replication_state').fetchone()[0])
+            conn.close()
+        conn = connect(args.primary)
+        deleted = prune_changes(conn, min(positions))
+        conn.close()
+        print(f"Deleted {deleted} change(s) below seq {min(positions)}")
+        return
+
+    if args.command == 'status':
+        conn = connect(args.replica, 'replica')
+        row = conn.execute('SELECT source, seq, schema_version, schedule_version, updated_at '
+                           'FROM replication_state').fetchone()
+        print(f"{args.replica}: following {row[0]} at seq {row[1]} "
+              f"(schema {row[2]}, schedule {row[3]}), last updated {row[4]}")
+        conn.close()
+        return
+
+    follower = Follower(FileSource(args.primary, args.profile), args.replica, args.profile)
+    try:
+        while True:
+            started = time.perf_counter()
+            copies = follower.copies
+            applied = follower.poll()
+            if follower.copies != copies:
+                print(f"Copied {args.primary} in {time.perf_counter() - started:.1f}s")
+            elif applied:
+                print(f"Applied {applied} change(s) in {(time.perf_counter() - started) * 1000:.0f} ms")
+            if args.once:
+                if follower.copies != copies:
+                    follower.poll()
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        follower.close()
+
+
+if __name__ == '__main__':
+    main()
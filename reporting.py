@@ -0,0 +1,285 @@
+"""Month-end reports over reservations, computed in parallel worker processes.
+
+    python reporting.py manifests flights.db manifests.csv --from 2024-01-01 --to 2024-01-31
+    python reporting.py load-factors flights.db routes.csv --from 2024-01-01 --to 2024-12-31
+    python reporting.py passenger-counts flights.db counts.csv --workers 8
+
+Each report is cut into tasks for a ProcessPoolExecutor, and a task
+reads a single table (the live one or one archive, see partitions.py).
+Every worker process opens one connection with ``PRAGMA query_only``,
+and reads under WAL never wait for the booking writer or hold it up.
+
+- ``manifests`` lists every passenger by date, flight and seat. It is cut
+  into chunks of whole days that never cross a month. Workers write their
+  chunk to a part file, and the parent appends the parts to the output in
+  date order as they finish, so no process holds the whole report.
+- ``load-factors`` (per route: flights, passengers, seats, load) and
+  ``passenger-counts`` (per date and destination) are cut by ranges of
+  departure or destination instead. Each range is one stretch of
+  idx_reservations_route or idx_reservations_destination, which hold
+  every column the sums need. Chunks of days would go through
+  idx_reservations_date and fetch each row from the table. Workers return
+  partial sums, which the parent adds up and writes out.
+
+Processes rather than threads: SQLite itself runs without the GIL, but
+every row becomes Python objects under it, so threads would take turns.
+"""
+import argparse
+import csv
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date as Date, timedelta
+
+from connection import ConnectionProfile, connect
+from partitions import Partitions, month_range
+from search import distinct_values
+from seats import capacity_sql
+
+# Large page cache and mmap for scans; writes are refused outright
+REPORT_PROFILE = ConnectionProfile('report', mmap_size=256 * 1024 * 1024, cache_size=-64000,
+                                   temp_store='MEMORY', query_only=True)
+
+MANIFEST_COLUMNS = ('date', 'flight_number', 'seat_number', 'name', 'departure', 'destination', 'id')
+
+# The leading column of the covering index each aggregate is split on
+AGGREGATE_SPLIT = {'load-factors': 'departure', 'passenger-counts': 'destination'}
+
+# One connection per worker process, opened by the pool initializer
+_worker = None
+
+
+class _Worker:
+    def __init__(self, db_name):
+        self.conn = connect(db_name, REPORT_PROFILE)
+        self.partitions = Partitions(self.conn, db_name)
+
+    def table(self, month):
+        """The live table for None, else the archive of ``month``"""
+        return 'reservations' if month is None else self.partitions.table_for(f'{month}-01')
+
+
+def _open_worker(db_name):
+    global _worker
+    _worker = _Worker(db_name)
+
+
+def _manifest_part(chunk, directory):
+    first, last = chunk
+    path = os.path.join(directory, f'{first}.csv')
+    cursor = _worker.conn.execute(
+        f"SELECT {', '.join(MANIFEST_COLUMNS)} FROM {_worker.partitions.table_for(first)} "
+        # Seats by row number, then letter: 2A before 16B, as on the aircraft
+        'WHERE date >= ? AND date <= ? ORDER BY date, flight_number, CAST(seat_number AS INTEGER), seat_number',
+        chunk)
+    rows = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        while True:
+            batch = cursor.fetchmany(5000)
+            if not batch:
+                break
+            writer.writerows(batch)
+            rows += len(batch)
+    return path, rows
+
+
+def _load_factor_part(task):
+    """``{(departure, destination): [flights, passengers, seats]}`` for one task"""
+    month, *bounds = task
+    totals = {}
+    rows = _worker.conn.execute(f'''
+        SELECT r.departure, r.destination, COUNT(*), SUM(r.booked), SUM({capacity_sql('f.aircraft_type')})
+        FROM (SELECT departure, destination, date, flight_number, COUNT(*) AS booked
+              FROM {_worker.table(month)}
+              WHERE departure >= ? AND departure <= ? AND date >= ? AND date <= ?
+              GROUP BY departure, destination, date, flight_number) AS r
+        LEFT JOIN main.flights AS f ON f.flight_number = r.flight_number AND f.date = r.date
+        GROUP BY r.departure, r.destination
+    ''', bounds)
+    for departure, destination, flights, booked, seats in rows:
+        totals[departure, destination] = [flights, booked, seats]
+    return totals
+
+
+def _passenger_count_part(task):
+    """``{(date, destination): passengers}`` for one task"""
+    month, *bounds = task
+    rows = _worker.conn.execute(f'SELECT date, destination, COUNT(*) FROM {_worker.table(month)} '
+                                'WHERE destination >= ? AND destination <= ? AND date >= ? AND date <= ? '
+                                'GROUP BY destination, date', bounds)
+    return {(day, destination): count for day, destination, count in rows}
+
+
+def split_range(date_from, date_to, days_per_chunk=1):
+    """``[(first, last), ...]`` covering the range, in order, never crossing a month"""
+    if days_per_chunk < 1:
+        raise ValueError(f"days_per_chunk must be at least 1, not {days_per_chunk}")
+    day, end = Date.fromisoformat(date_from), Date.fromisoformat(date_to)
+    if day > end:
+        raise ValueError("The report starts after it ends")
+    chunks = []
+    while day <= end:
+        last = min(day + timedelta(days=days_per_chunk - 1), end)
+        if last.month != day.month:
+            last = Date(last.year, last.month, 1) - timedelta(days=1)
+        chunks.append((day.isoformat(), last.isoformat()))
+        day = last + timedelta(days=1)
+    return chunks
+
+
+def _date_bounds(db_name):
+    conn = connect(db_name, REPORT_PROFILE)
+    try:
+        first, last = conn.execute('SELECT MIN(date), MAX(date) FROM reservations').fetchone()
+        for month in Partitions(conn, db_name).months():
+            start, following = month_range(month)
+            end = (Date.fromisoformat(following) - timedelta(days=1)).isoformat()
+            first, last = min(first or start, start), max(last or end, end)
+        return first, last
+    finally:
+        conn.close()
+
+
+def split_keys(db_name, column, date_from, date_to, parts):
+    """``[(month, low, high, first, last), ...]``: about ``parts`` ranges of ``column`` per table.
+
+    ``month`` is None for the live table, else the archived month, and
+    ``first``/``last`` the part of the date range that table can hold.
+    """
+    conn = connect(db_name, REPORT_PROFILE)
+    try:
+        partitions = Partitions(conn, db_name)
+        sources = [(None, 'reservations', date_from, date_to)]
+        for month in sorted(partitions.months()):
+            start, following = month_range(month)
+            end = (Date.fromisoformat(following) - timedelta(days=1)).isoformat()
+            if start <= date_to and end >= date_from:
+                sources.append((month, partitions.table_for(start), max(start, date_from), min(end, date_to)))
+        tasks = []
+        for month, table, first, last in sources:
+            keys = distinct_values(conn, table, column)
+            if not keys:
+                # An empty table (e.g. every live month archived) has nothing to split
+                continue
+            size = -(-len(keys) // parts)
+            for i in range(0, len(keys), size):
+                group = keys[i:i + size]
+                tasks.append((month, group[0], group[-1], first, last))
+        return tasks
+    finally:
+        conn.close()
+
+
+def _merge(total, part):
+    for key, values in part.items():
+        if key not in total:
+            total[key] = values
+        elif isinstance(values, list):
+            total[key] = [a + b for a, b in zip(total[key], values)]
+        else:
+            total[key] += values
+
+
+def run_report(report, db_name, output, date_from=None, date_to=None, workers=None, days_per_chunk=1):
+    """Write ``report`` for ``[date_from, date_to]`` (default: every date) to the CSV ``output``.
+
+    ``workers`` defaults to the number of CPUs; ``days_per_chunk`` sizes
+    the manifest tasks. Returns the number of data rows written.
+    """
+    if report not in REPORTS:
+        raise ValueError(f"Unknown report {report!r}; choose from {', '.join(REPORTS)}")
+    if not date_from or not date_to:
+        first, last = _date_bounds(db_name)
+        if first is None:
+            first = last = Date.today().isoformat()
+        date_from, date_to = date_from or first, date_to or last
+    if date_from > date_to:
+        raise ValueError("The report starts after it ends")
+    workers = workers or os.cpu_count() or 1
+    if report == 'manifests':
+        tasks = split_range(date_from, date_to, days_per_chunk)
+    else:
+        # A few tasks per worker, so one slow range does not hold up the rest
+        tasks = split_keys(db_name, AGGREGATE_SPLIT[report], date_from, date_to, workers * 4)
+    with ProcessPoolExecutor(max(1, min(workers, len(tasks))), initializer=_open_worker,
+                             initargs=(db_name,)) as pool:
+        return REPORTS[report](pool, tasks, output)
+
+
+def _write_manifests(pool, chunks, output):
+    rows = 0
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output))) as directory:
+        with open(output, 'w', newline='', encoding='utf-8') as out:
+            csv.writer(out).writerow(MANIFEST_COLUMNS)
+            # map hands results back in chunk order, while later chunks run
+            for path, count in pool.map(_manifest_part, chunks, [directory] * len(chunks)):
+                with open(path, newline='', encoding='utf-8') as part:
+                    shutil.copyfileobj(part, out)
+                os.remove(path)
+                rows += count
+    return rows
+
+
+def _write_load_factors(pool, tasks, output):
+    totals = {}
+    for part in pool.map(_load_factor_part, tasks):
+        _merge(totals, part)
+    with open(output, 'w', newline='', encoding='utf-8') as out:
+        writer = csv.writer(out)
+        writer.writerow(('departure', 'destination', 'flights', 'passengers', 'seats', 'load_factor'))
+        # Fullest routes first, ties by route, so the output does not depend on the tasks
+        for (departure, destination), (flights, booked, seats) in sorted(
+                totals.items(), key=lambda item: (-(item[1][1] / item[1][2] if item[1][2] else 0), item[0])):
+            writer.writerow((departure, destination, flights, booked, seats,
+                             f'{booked / seats:.4f}' if seats else ''))
+    return len(totals)
+
+
+def _write_passenger_counts(pool, tasks, output):
+    totals = {}
+    for part in pool.map(_passenger_count_part, tasks):
+        _merge(totals, part)
+    with open(output, 'w', newline='', encoding='utf-8') as out:
+        writer = csv.writer(out)
+        writer.writerow(('date', 'destination', 'passengers'))
+        for (day, destination), count in sorted(totals.items()):
+            writer.writerow((day, destination, count))
+    return len(totals)
+
+
+REPORTS = {
+    'manifests': _write_manifests,
+    'load-factors': _write_load_factors,
+    'passenger-counts': _write_passenger_counts,
+}
+
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {value}")
+    return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reservation reports, computed in parallel")
+    parser.add_argument('report', choices=sorted(REPORTS))
+    parser.add_argument('db')
+    parser.add_argument('output', help="CSV file to write")
+    parser.add_argument('--from', dest='date_from', help="first travel date (default: the earliest)")
+    parser.add_argument('--to', dest='date_to', help="last travel date (default: the latest)")
+    parser.add_argument('--workers', type=positive_int, help="worker processes (default: one per CPU)")
+    parser.add_argument('--days-per-chunk', type=positive_int, default=1, help="days of travel per manifest task")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    rows = run_report(args.report, args.db, args.output, args.date_from, args.date_to, args.workers,
+                      args.days_per_chunk)
+    print(f"Wrote {rows} rows to {args.output} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
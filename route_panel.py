@@ -0,0 +1,108 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+class RouteSearchWindow(tk.Toplevel):
+    """Itinerary search from ``Database.search_routes_json``, run on the DB worker.
+
+    ``entries`` is the booking form's ``{field: ttk.Entry}``. The search
+    starts from its departure, destination and date. "Use" copies the
+    selected leg (or an itinerary's first leg) back into the form.
+    """
+
+    COLUMNS = [("Flight", 90), ("From", 120), ("To", 120), ("Departs", 130), ("Arrives", 130), ("Info", 150)]
+
+    def __init__(self, parent, db, entries):
+        super().__init__(parent)
+        self.title("Find a Route")
+        self.db = db
+        self.entries = entries
+        self.legs = {}
+
+        form = ttk.Frame(self)
+        form.pack(fill='x', padx=10, pady=10)
+        self.fields = {}
+        for column, (label, field, width) in enumerate([("From", 'departure', 14), ("To", 'destination', 14),
+                                                        ("Date", 'date', 11)]):
+            ttk.Label(form, text=label).grid(row=0, column=2 * column, padx=(0, 4))
+            entry = ttk.Entry(form, width=width)
+            entry.insert(0, entries[field].get())
+            entry.grid(row=0, column=2 * column + 1, padx=(0, 10))
+            self.fields[field] = entry
+        ttk.Label(form, text="Max connections").grid(row=1, column=0, columnspan=2, sticky='e', padx=(0, 4))
+        self.max_connections = tk.Spinbox(form, from_=0, to=2, width=3)
+        self.max_connections.delete(0, tk.END)
+        self.max_connections.insert(0, '2')
+        self.max_connections.grid(row=1, column=2, sticky='w', pady=5)
+        ttk.Label(form, text="Min layover (min)").grid(row=1, column=3, sticky='e', padx=(0, 4))
+        self.min_layover = ttk.Entry(form, width=5)
+        self.min_layover.insert(0, '45')
+        self.min_layover.grid(row=1, column=4, sticky='w')
+        ttk.Button(form, text="Search", command=self.search).grid(row=1, column=5, padx=5)
+
+        self.tree = ttk.Treeview(self, columns=[name for name, _ in self.COLUMNS], show='tree headings', height=15)
+        self.tree.column('#0', width=30, stretch=False)
+        for name, width in self.COLUMNS:
+            self.tree.heading(name, text=name)
+            self.tree.column(name, width=width)
+        self.tree.pack(fill='both', expand=True, padx=10)
+        self.tree.bind('<Double-1>', lambda event: self.use())
+
+        btn_frame = ttk.Frame(self)
+        btn_frame.pack(fill='x', padx=10, pady=10)
+        self.status = ttk.Label(btn_frame)
+        self.status.pack(side=tk.LEFT)
+        ttk.Button(btn_frame, text="Close", command=self.destroy).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(btn_frame, text="Use", command=self.use).pack(side=tk.RIGHT, padx=5)
+
+        if all(entry.get().strip() for entry in self.fields.values()):
+            self.search()
+
+    def search(self):
+        try:
+            max_connections = int(self.max_connections.get())
+            min_layover = int(self.min_layover.get())
+        except ValueError:
+            self.status.configure(text="Connections and layover must be whole numbers")
+            return
+        self.status.configure(text="Searching...")
+        self.db.submit('search_routes_json', self.fields['departure'].get(), self.fields['destination'].get(),
+                       self.fields['date'].get().strip(), max_connections, min_layover,
+                       callback=self.show, errback=self.failed)
+
+    def show(self, itineraries):
+        if not self.winfo_exists():
+            return
+        self.tree.delete(*self.tree.get_children())
+        self.legs.clear()
+        for itinerary in itineraries:
+            hours, minutes = divmod(itinerary['duration'], 60)
+            legs = itinerary['legs']
+            stops = itinerary['connections']
+            info = f"{hours}h{minutes:02d}, " + ("direct" if not stops else f"{stops} connection(s)")
+            parent = self.tree.insert('', tk.END, open=False, values=(
+                ' / '.join(leg['flight_number'] for leg in legs), legs[0]['departure'], legs[-1]['arrival'],
+                itinerary['departs'], itinerary['arrives'], info))
+            self.legs[parent] = legs[0]
+            for leg, layover in zip(legs, itinerary['layovers'] + [None]):
+                item = self.tree.insert(parent, tk.END, values=(
+                    leg['flight_number'], leg['departure'], leg['arrival'], leg['departs'], leg['arrives'],
+                    f"{layover} min layover" if layover is not None else ""))
+                self.legs[item] = leg
+        self.status.configure(text=f"{len(itineraries)} itineraries" if itineraries else "No itineraries found")
+
+    def failed(self, error):
+        if self.winfo_exists():
+            self.status.configure(text=f"Search failed: {error}")
+
+    def use(self):
+        selection = self.tree.selection()
+        if not selection:
+            self.status.configure(text="Select an itinerary or a leg first")
+            return
+        leg = self.legs[selection[0]]
+        for field, value in (('flight_number', leg['flight_number']), ('departure', leg['departure']),
+                             ('destination', leg['arrival']), ('date', leg['date'])):
+            self.entries[field].delete(0, tk.END)
+            self.entries[field].insert(0, value)
+        self.destroy()
@@ -0,0 +1,456 @@
+"""Airports, the flight schedule and itinerary search over it.
+
+    python routes.py search JFK LAX 2024-05-01 --max-connections 2 --min-layover 60
+    python routes.py import-airports airports.csv   (code,city,name)
+    python routes.py import-schedule legs.csv       (flight_number,date,aircraft_type,
+                                                     origin,destination,departs,duration)
+
+The schedule is the ``flights`` table from seats.py, one row per flight
+and day, plus the leg's origin and destination airport codes. It also
+holds ``departs`` (UTC, minutes after midnight of ``date``) and
+``duration`` in minutes. Rows without an origin, such as those only
+given an aircraft type, are not part of the schedule.
+
+RouteIndex builds an adjacency index of each day's legs the first time
+the day is searched. It keeps legs by origin, by destination and by
+(origin, destination) pair, each sorted by departure. A search is a
+best-first (A*) walk over these legs, ordered by the earliest arrival
+still reachable. A bisect finds the departures inside the layover
+window. Before the last leg, a hop is only followed if it lands on the
+destination or on an airport with a leg into it. The walk stops once
+``limit`` itineraries have been found.
+"""
+import argparse
+import bisect
+import csv
+import heapq
+import itertools
+from datetime import date as Date, timedelta
+
+from cache import MISSING, LRUCache
+
+AIRPORTS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS airports (
+        code TEXT PRIMARY KEY,
+        city TEXT NOT NULL,
+        name TEXT
+    ) WITHOUT ROWID
+'''
+
+SCHEDULE_COLUMNS = (('origin', 'TEXT'), ('destination', 'TEXT'), ('departs', 'INTEGER'), ('duration', 'INTEGER'))
+
+ROUTES_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_airports_city ON airports (city COLLATE NOCASE)',
+    'CREATE INDEX IF NOT EXISTS idx_flights_schedule ON flights (date, origin, departs)',
+]
+
+# Bumped by triggers on every schedule or airport change, so cached days
+# survive the bookings that PRAGMA data_version would also report
+SCHEDULE_VERSION_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS schedule_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    ''',
+    'INSERT OR IGNORE INTO schedule_version (id, version) VALUES (1, 0)',
+] + [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {table}_schedule_{event.lower()} AFTER {event} ON {table}
+    BEGIN
+        UPDATE schedule_version SET version = version + 1;
+    END
+    ''' for table in ('flights', 'airports') for event in ('INSERT', 'UPDATE', 'DELETE')
+]
+
+SCHEDULE_QUERY = '''
+    SELECT flight_number, origin, destination, departs, duration FROM flights
+    WHERE date = ? AND origin IS NOT NULL AND destination IS NOT NULL
+    ORDER BY departs
+'''
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def install_routes(cursor):
+    """Create the airports table and add the schedule columns to flights"""
+    cursor.execute(AIRPORTS_TABLE)
+    cursor.execute('PRAGMA table_info(flights)')
+    existing = {column[1] for column in cursor.fetchall()}
+    for column, kind in SCHEDULE_COLUMNS:
+        if column not in existing:
+            cursor.execute(f'ALTER TABLE flights ADD COLUMN {column} {kind}')
+    for statement in ROUTES_INDEXES + SCHEDULE_VERSION_SCHEMA:
+        cursor.execute(statement)
+
+
+def parse_time(value):
+    """Minutes after midnight from ``HH:MM`` (or an int already in minutes)"""
+    if isinstance(value, int):
+        return value
+    hours, _, minutes = str(value).strip().partition(':')
+    return int(hours) * 60 + int(minutes or 0)
+
+
+def format_minutes(minutes):
+    """``YYYY-MM-DD HH:MM`` for an absolute time in minutes (see Leg)"""
+    day, minute = divmod(minutes, MINUTES_PER_DAY)
+    return f"{Date.fromordinal(day).isoformat()} {minute // 60:02d}:{minute % 60:02d}"
+
+
+class Leg:
+    """One scheduled flight on one day.
+
+    ``departs`` and ``arrives`` are absolute UTC minutes (date ordinal *
+    1440 + minute of day), so overnight legs and connections compare
+    directly.
+    """
+
+    __slots__ = ('flight_number', 'date', 'origin', 'destination', 'departs', 'arrives')
+
+    def __init__(self, flight_number, date, origin, destination, departs, arrives):
+        self.flight_number = flight_number
+        self.date = date
+        self.origin = origin
+        self.destination = destination
+        self.departs = departs
+        self.arrives = arrives
+
+    def __repr__(self):
+        return f"Leg({self.flight_number} {self.origin}-{self.destination} {format_minutes(self.departs)})"
+
+
+class Itinerary:
+    def __init__(self, legs):
+        self.legs = legs
+
+    @property
+    def departs(self):
+        return self.legs[0].departs
+
+    @property
+    def arrives(self):
+        return self.legs[-1].arrives
+
+    @property
+    def duration(self):
+        return self.arrives - self.departs
+
+    @property
+    def connections(self):
+        return len(self.legs) - 1
+
+    def layovers(self):
+        return [after.departs - before.arrives for before, after in zip(self.legs, self.legs[1:])]
+
+    def as_dict(self, cities=None):
+        cities = cities or {}
+        return {
+            'departs': format_minutes(self.departs),
+            'arrives': format_minutes(self.arrives),
+            'duration': self.duration,
+            'connections': self.connections,
+            'layovers': self.layovers(),
+            'legs': [{
+                'flight_number': leg.flight_number,
+                'date': leg.date,
+                'origin': leg.origin,
+                'destination': leg.destination,
+                'departure': cities.get(leg.origin, leg.origin),
+                'arrival': cities.get(leg.destination, leg.destination),
+                'departs': format_minutes(leg.departs),
+                'arrives': format_minutes(leg.arrives),
+            } for leg in self.legs],
+        }
+
+    def __repr__(self):
+        return f"Itinerary({' / '.join(map(repr, self.legs))})"
+
+
+class _Departures:
+    """Legs sorted by departure, with a parallel list of times to bisect"""
+
+    __slots__ = ('times', 'legs')
+
+    def __init__(self):
+        self.times = []
+        self.legs = []
+
+    def bounds(self, earliest, latest):
+        start = bisect.bisect_left(self.times, earliest)
+        return start, bisect.bisect_right(self.times, latest, start)
+
+    def between(self, earliest, latest):
+        start, end = self.bounds(earliest, latest)
+        return self.legs[start:end]
+
+
+_NO_DEPARTURES = _Departures()
+
+
+def _earliest_landing(legs):
+    """``result[i]`` is the earliest arrival among ``legs[i:]``"""
+    result = [0] * len(legs)
+    landing = float('inf')
+    for i in range(len(legs) - 1, -1, -1):
+        landing = min(landing, legs[i].arrives)
+        result[i] = landing
+    return result
+
+
+class DaySchedule:
+    """Adjacency index of the legs departing on one day"""
+
+    def __init__(self, date, rows):
+        self.date = date
+        midnight = Date.fromisoformat(date).toordinal() * MINUTES_PER_DAY
+        self.by_origin = {}
+        self.by_destination = {}
+        self.by_pair = {}
+        self.legs = 0
+        # Rows arrive ordered by departure, so every list is already sorted
+        for flight_number, origin, destination, departs, duration in rows:
+            departs += midnight
+            leg = Leg(flight_number, date, origin, destination, departs, departs + duration)
+            for index, key in ((self.by_origin, origin), (self.by_destination, destination),
+                               (self.by_pair, (origin, destination))):
+                departures = index.get(key)
+                if departures is None:
+                    departures = index[key] = _Departures()
+                departures.times.append(departs)
+                departures.legs.append(leg)
+            self.legs += 1
+
+
+class RouteIndex:
+    """Cached DaySchedules and airport lookups for one connection.
+
+    Days are kept in an LRU cache and all dropped when ``schedule_version``
+    moves, whichever connection changed the schedule. Bookings leave it
+    alone, so they never cost a rebuild.
+    """
+
+    def __init__(self, conn, days=31):
+        self.conn = conn
+        self.days = LRUCache(days)
+        self._airports = None
+        self._schedule_version = None
+
+    def _check_schedule_changes(self):
+        version = self.conn.execute('SELECT version FROM schedule_version').fetchone()[0]
+        if version != self._schedule_version:
+            self._schedule_version = version
+            self.invalidate()
+
+    def invalidate(self, date=None):
+        if date is None:
+            self.days.clear()
+        else:
+            self.days.invalidate(date)
+        self._airports = None
+
+    def day(self, date):
+        schedule = self.days.get(date)
+        if schedule is MISSING:
+            schedule = DaySchedule(date, self.conn.execute(SCHEDULE_QUERY, (date,)))
+            self.days.put(date, schedule)
+        return schedule
+
+    def cities(self):
+        """``{code: city}`` for every airport"""
+        if self._airports is None:
+            self._airports = dict(self.conn.execute('SELECT code, city FROM airports'))
+        return self._airports
+
+    def resolve(self, place):
+        """Airport codes for an airport code or a city name"""
+        place = place.strip()
+        airports = self.cities()
+        if place.upper() in airports:
+            return {place.upper()}
+        codes = {code for code, city in airports.items() if city.lower() == place.lower()}
+        if not codes:
+            raise ValueError(f"Unknown airport or city {place!r}")
+        return codes
+
+    def search(self, origin, destination, date, max_connections=2, min_layover=45, max_layover=360,
+               limit=50):
+        """Itineraries leaving ``origin`` on ``date`` and reaching ``destination``.
+
+        ``origin``/``destination`` are airport codes or city names.
+        Connections must leave between ``min_layover`` and ``max_layover``
+        minutes after the previous leg lands, and no airport is visited
+        twice. Results are ordered by arrival, then fewest connections,
+        then latest departure; at most ``limit`` are returned.
+        """
+        self._check_schedule_changes()
+        origins, targets = self.resolve(origin), self.resolve(destination)
+        if origins & targets:
+            raise ValueError("Origin and destination are the same")
+        if min_layover > max_layover:
+            raise ValueError("Minimum layover is longer than the maximum")
+        first = Date.fromisoformat(date)
+        # Later legs may leave on the following days; a 3-leg trip with
+        # long layovers can end two days after it starts
+        span = [self.day(date)] + [self.day((first + timedelta(days=n)).isoformat())
+                                   for n in range(1, max_connections + 1)]
+        # Every trip ends on one of these legs, so only the airports they
+        # leave from are useful last connections. A trip standing anywhere
+        # at time t cannot land before the earliest arrival among final
+        # legs leaving after t + min_layover
+        final = sorted((leg for schedule in span for target in targets
+                        for leg in schedule.by_destination.get(target, _NO_DEPARTURES).legs),
+                       key=lambda leg: leg.departs)
+        final_from = {}
+        for leg in final:
+            departures = final_from.get(leg.origin)
+            if departures is None:
+                departures = final_from[leg.origin] = _Departures()
+            departures.times.append(leg.departs)
+            departures.legs.append(leg)
+        landings = set(final_from) | targets
+        final_times, earliest_landing = [leg.departs for leg in final], _earliest_landing(final)
+        feeder_landing = {stop: _earliest_landing(departures.legs) for stop, departures in final_from.items()}
+
+        # Best-first on that bound, i.e. A* over the time-expanded graph.
+        # The bound never overestimates and only grows as a trip is
+        # extended, so complete itineraries leave the heap in arrival
+        # order and the search stops after ``limit`` of them. As in
+        # k-shortest-path search, no leg is expanded more than ``limit``
+        # times, however many trips reach it.
+        heap = []
+        tiebreak = itertools.count()
+        expanded = {}
+
+        def bound(stop, arrives, legs_left):
+            """Earliest possible landing for a trip at ``stop``; None if it cannot finish"""
+            if stop in targets:
+                return arrives
+            if legs_left == 1:
+                # Only a feeder can finish, on a final leg after the layover
+                departures = final_from.get(stop)
+                if departures is None:
+                    return None
+                i = bisect.bisect_left(departures.times, arrives + min_layover)
+                return feeder_landing[stop][i] if i < len(departures.times) else None
+            i = bisect.bisect_left(final_times, arrives + min_layover)
+            return earliest_landing[i] if i < len(final) else None
+
+        def push(path, legs_left, group=None):
+            # A group stands for ``path`` extended by each of its legs, all
+            # to the same stop; they are only pushed one by one once the
+            # group's bound (that of its earliest landing) comes up
+            last = group[0] if group else path[-1]
+            arrives = min(leg.arrives for leg in group) if group else last.arrives
+            key = bound(last.destination, arrives, legs_left)
+            if key is None:
+                return
+            if legs_left == 1 and not group and last.destination not in targets:
+                departures = final_from[last.destination]
+                i = bisect.bisect_left(departures.times, arrives + min_layover)
+                if departures.times[i] > arrives + max_layover:
+                    return
+            heapq.heappush(heap, (key, len(path) + bool(group), -path[0].departs, next(tiebreak),
+                                  path, legs_left, group))
+
+        for code in origins:
+            departures = span[0].by_origin.get(code)
+            if departures is None:
+                continue
+            for leg in departures.legs:
+                if leg.destination in targets:
+                    push([leg], 0)
+                elif leg.destination not in origins and max_connections >= 1:
+                    push([leg], max_connections)
+
+        found = []
+        while heap and len(found) < limit:
+            *_, path, legs_left, group = heapq.heappop(heap)
+            if group:
+                for leg in group:
+                    push(path + [leg], legs_left)
+                continue
+            last = path[-1]
+            if last.destination in targets:
+                found.append(Itinerary(path))
+                continue
+            times = expanded.get(last, 0)
+            if times == limit:
+                continue
+            expanded[last] = times + 1
+            earliest, latest = last.arrives + min_layover, last.arrives + max_layover
+            if legs_left == 1:
+                for leg in final_from[last.destination].between(earliest, latest):
+                    push(path + [leg], 0)
+                continue
+            visited = {leg.origin for leg in path}
+            for schedule in span:
+                departures = schedule.by_origin.get(last.destination)
+                if departures is None:
+                    continue
+                start, end = departures.bounds(earliest, latest)
+                if legs_left == 2 and len(landings) < end - start:
+                    # A busy hub: look up the few useful next stops directly
+                    # instead of scanning every departure in the window
+                    for stop in landings:
+                        if stop in visited:
+                            continue
+                        legs = schedule.by_pair.get((last.destination, stop), _NO_DEPARTURES).between(earliest, latest)
+                        if legs:
+                            push(path, 0 if stop in targets else 1, legs)
+                    continue
+                for leg in departures.legs[start:end]:
+                    if leg.destination in targets or leg.destination not in visited:
+                        push(path + [leg], legs_left - 1)
+        return found
+
+
+def main(argv=None):
+    from connection import DEFAULT_PROFILE, PROFILES
+    from database import Database
+
+    parser = argparse.ArgumentParser(description="Flight schedule and itinerary search")
+    parser.add_argument('--db', default='flights.db')
+    parser.add_argument('--profile', choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help="connection profile (see connection.py)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    search = commands.add_parser('search', help="list itineraries")
+    search.add_argument('origin')
+    search.add_argument('destination')
+    search.add_argument('date')
+    search.add_argument('--max-connections', type=int, default=2)
+    search.add_argument('--min-layover', type=int, default=45, help="minutes")
+    search.add_argument('--max-layover', type=int, default=360, help="minutes")
+    search.add_argument('--limit', type=int, default=20)
+    airports = commands.add_parser('import-airports', help="load code,city,name rows from a CSV")
+    airports.add_argument('path')
+    schedule = commands.add_parser('import-schedule', help="load legs from a CSV")
+    schedule.add_argument('path')
+    args = parser.parse_args(argv)
+
+    db = Database(args.db, args.profile)
+    if args.command == 'search':
+        cities = db.routes.cities()
+        for itinerary in db.search_routes(args.origin, args.destination, args.date, args.max_connections,
+                                          args.min_layover, args.max_layover, args.limit):
+            hours, minutes = divmod(itinerary.duration, 60)
+            print(f"{format_minutes(itinerary.departs)} -> {format_minutes(itinerary.arrives)} "
+                  f"({hours}h{minutes:02d}, {itinerary.connections} connection(s))")
+            for leg in itinerary.legs:
+                print(f"    {leg.flight_number:<8} {cities.get(leg.origin, leg.origin)} -> "
+                      f"{cities.get(leg.destination, leg.destination)}  "
+                      f"{format_minutes(leg.departs)} - {format_minutes(leg.arrives)}")
+        return
+    with open(args.path, newline='', encoding='utf-8') as f:
+        rows = [row for row in csv.DictReader(f)]
+    if args.command == 'import-airports':
+        db.add_airports((row['code'], row['city'], row.get('name')) for row in rows)
+    else:
+        db.import_schedule((row['flight_number'], row['date'], row['aircraft_type'], row['origin'],
+                            row['destination'], parse_time(row['departs']), int(row['duration']))
+                           for row in rows)
+    print(f"Imported {len(rows)} rows")
+
+
+if __name__ == '__main__':
+    main()
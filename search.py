@@ -0,0 +1,130 @@
+import re
+import sqlite3
+
+# Flight number lookups use the (flight_number, date, seat_number) index from seats.py.
+# The route index carries flight_number so per-flight route summaries are covered.
+SEARCH_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_reservations_route ON reservations (departure, destination, date, flight_number)',
+    'CREATE INDEX IF NOT EXISTS idx_reservations_date ON reservations (date)',
+    'CREATE INDEX IF NOT EXISTS idx_reservations_destination ON reservations (destination, date)',
+    'CREATE INDEX IF NOT EXISTS idx_reservations_name ON reservations (name)',
+    'DROP INDEX IF EXISTS idx_reservations_route_date',
+]
+
+# Sort orders offered by the views, each spelled as the full column order of
+# an index (every index ends in the rowid), so ORDER BY and keyset bounds on
+# these tuples walk the index with no sort step
+SORT_KEYS = {
+    'id': ('id',),
+    'name': ('name', 'id'),
+    'flight_number': ('flight_number', 'date', 'seat_number', 'id'),
+    'departure': ('departure', 'destination', 'date', 'flight_number', 'id'),
+    'destination': ('destination', 'date', 'id'),
+    'date': ('date', 'id'),
+}
+
+# External-content FTS5 table over reservations.name, kept in sync by triggers.
+# The prefix indexes keep the first few keystrokes of a name search cheap.
+NAME_INDEX_SCHEMA = [
+    '''
+    CREATE VIRTUAL TABLE reservations_fts USING fts5(
+        name, content='reservations', content_rowid='id', prefix='2 3'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS reservations_fts_insert AFTER INSERT ON reservations
+    BEGIN
+        INSERT INTO reservations_fts (rowid, name) VALUES (new.id, new.name);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS reservations_fts_delete AFTER DELETE ON reservations
+    BEGIN
+        INSERT INTO reservations_fts (reservations_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS reservations_fts_update AFTER UPDATE OF name ON reservations
+    BEGIN
+        INSERT INTO reservations_fts (reservations_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO reservations_fts (rowid, name) VALUES (new.id, new.name);
+    END
+    ''',
+    "INSERT INTO reservations_fts (reservations_fts) VALUES ('rebuild')",
+]
+
+_TOKEN = re.compile(r'\w+')
+
+
+def distinct_values(conn, table, column):
+    """Every value of an indexed ``column``, one index seek each rather than a scan"""
+    values = []
+    value = conn.execute(f'SELECT MIN({column}) FROM {table}').fetchone()[0]
+    while value is not None:
+        values.append(value)
+        value = conn.execute(f'SELECT MIN({column}) FROM {table} WHERE {column} > ?', (value,)).fetchone()[0]
+    return values
+
+
+def fts_installed(cursor):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'reservations_fts'")
+    return cursor.fetchone() is not None
+
+
+def install_search(cursor):
+    """Create the search indexes; returns False if FTS5 is not compiled in"""
+    for statement in SEARCH_INDEXES:
+        cursor.execute(statement)
+    if fts_installed(cursor):
+        return True
+    try:
+        for statement in NAME_INDEX_SCHEMA:
+            cursor.execute(statement)
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def order_terms(sort=None):
+    """``(keys, descending)`` for a ``(column, descending)`` sort; None is newest first"""
+    column, descending = sort or ('id', True)
+    if column not in SORT_KEYS:
+        raise ValueError(f"Cannot sort by {column!r}")
+    return SORT_KEYS[column], descending
+
+
+def where_clause(filters, fts=True, *conditions):
+    """Turn search filters into ``(" WHERE ...", params)``.
+
+    Recognised keys are ``name`` (word prefixes, through the FTS index),
+    ``flight_number``, ``departure``, ``destination``, ``date_from`` and
+    ``date_to``. Each one maps onto an index (SEARCH_INDEXES, or the seat
+    index for flight numbers).
+    ``conditions`` are extra SQL terms (e.g. a keyset bound) placed first;
+    their parameters go in front of the returned ones.
+    """
+    sql = list(conditions)
+    params = []
+    filters = filters or {}
+    name = filters.get('name')
+    if name:
+        tokens = _TOKEN.findall(name)
+        if fts and tokens:
+            sql.append('id IN (SELECT rowid FROM reservations_fts WHERE reservations_fts MATCH ?)')
+            params.append(' '.join('"%s"*' % token for token in tokens))
+        else:
+            sql.append('name LIKE ?')
+            params.append(name + '%')
+    for column in ('flight_number', 'departure', 'destination'):
+        if filters.get(column):
+            sql.append(f'{column} = ?')
+            params.append(filters[column])
+    if filters.get('date_from'):
+        sql.append('date >= ?')
+        params.append(filters['date_from'])
+    if filters.get('date_to'):
+        sql.append('date <= ?')
+        params.append(filters['date_to'])
+    if not sql:
+        return '', params
+    return ' WHERE ' + ' AND '.join(sql), params
@@ -0,0 +1,60 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+class SearchBar(ttk.Frame):
+    """Row of search fields that calls ``on_search(filters)`` once typing pauses.
+
+    Every keystroke restarts a DEBOUNCE_MS timer, so a burst of typing
+    results in a single query. The filters dict uses the keys understood
+    by ``search.where_clause``.
+    """
+
+    DEBOUNCE_MS = 250
+
+    FIELDS = [
+        ("Name", "name", 14),
+        ("Flight", "flight_number", 8),
+        ("From", "departure", 12),
+        ("To", "destination", 12),
+        ("Date from", "date_from", 10),
+        ("Date to", "date_to", 10)
+    ]
+
+    def __init__(self, parent, on_search, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.on_search = on_search
+        self.entries = {}
+        self._after_id = None
+        self._last = {}
+
+        for label, field, width in self.FIELDS:
+            ttk.Label(self, text=label).pack(side=tk.LEFT, padx=(8, 2))
+            entry = ttk.Entry(self, width=width)
+            entry.pack(side=tk.LEFT)
+            entry.bind('<KeyRelease>', self._schedule)
+            self.entries[field] = entry
+
+        clear_btn = ttk.Button(self, text="Clear", command=self.clear)
+        clear_btn.pack(side=tk.LEFT, padx=8)
+
+    def filters(self):
+        values = {field: entry.get().strip() for field, entry in self.entries.items()}
+        return {field: value for field, value in values.items() if value}
+
+    def clear(self):
+        for entry in self.entries.values():
+            entry.delete(0, tk.END)
+        self._search()
+
+    def _schedule(self, event=None):
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+        self._after_id = self.after(self.DEBOUNCE_MS, self._search)
+
+    def _search(self):
+        self._after_id = None
+        filters = self.filters()
+        if filters != self._last:
+            self._last = filters
+            self.on_search(filters)
@@ -0,0 +1,260 @@
+import sqlite3
+import warnings
+
+SEAT_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS flights (
+        flight_number TEXT NOT NULL,
+        date TEXT NOT NULL,
+        aircraft_type TEXT NOT NULL,
+        PRIMARY KEY (flight_number, date)
+    ) WITHOUT ROWID
+    ''',
+]
+
+# Also serves every (flight_number, date) lookup, so no separate index is kept
+SEAT_UNIQUE_INDEX = '''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_reservations_seat
+    ON reservations (flight_number, date, seat_number)
+'''
+
+SEAT_FALLBACK_INDEX = '''
+    CREATE INDEX IF NOT EXISTS idx_reservations_seat_dup
+    ON reservations (flight_number, date, seat_number)
+'''
+
+
+def install_seat_inventory(cursor):
+    """Create the flights table and the one-passenger-per-seat constraint.
+
+    If the table already holds double bookings the UNIQUE index cannot be
+    built. A plain index is created instead and a warning is issued, and
+    SeatInventory still refuses any new double booking.
+    """
+    for statement in SEAT_SCHEMA:
+        cursor.execute(statement)
+    try:
+        cursor.execute(SEAT_UNIQUE_INDEX)
+    except sqlite3.IntegrityError:
+        cursor.execute(SEAT_FALLBACK_INDEX)
+        warnings.warn("reservations contains double-booked seats; "
+                      "seat uniqueness is only enforced for new bookings")
+    cursor.execute('DROP INDEX IF EXISTS idx_reservations_flight_date')
+
+
+def seat_taken_error(flight_number, date, seat_number):
+    return ValueError(f"Seat {seat_number} on {flight_number} ({date}) is already taken")
+
+
+class SeatMap:
+    """Seat layout of one aircraft type; seat codes look like ``15A``"""
+
+    def __init__(self, aircraft_type, rows, letters, window):
+        self.aircraft_type = aircraft_type
+        self.seats = [f"{row}{letter}" for row in range(1, rows + 1) for letter in letters]
+        self.index = {seat: i for i, seat in enumerate(self.seats)}
+        self.window_mask = 0
+        for i, seat in enumerate(self.seats):
+            if seat[-1] in window:
+                self.window_mask |= 1 << i
+        self.all_mask = (1 << len(self.seats)) - 1
+
+
+SEAT_MAPS = {
+    'A320': SeatMap('A320', 30, 'ABCDEF', 'AF'),
+    'B737': SeatMap('B737', 32, 'ABCDEF', 'AF'),
+    'B777': SeatMap('B777', 42, 'ABCDEFGHJK', 'AK'),
+    'E190': SeatMap('E190', 25, 'ACDF', 'AF'),
+}
+
+DEFAULT_AIRCRAFT = 'A320'
+
+
+def capacity_sql(aircraft_column):
+    """SQL expression for the seat count of the aircraft type in ``aircraft_column``"""
+    cases = ' '.join(f"WHEN '{name}' THEN {len(seat_map.seats)}" for name, seat_map in SEAT_MAPS.items())
+    return f"CASE {aircraft_column} {cases} ELSE {len(SEAT_MAPS[DEFAULT_AIRCRAFT].seats)} END"
+
+
+def _lowest_bit(mask):
+    return (mask & -mask).bit_length() - 1
+
+
+class SeatInventory:
+    """Per-flight bitmaps of occupied seats.
+
+    A flight's bitmap is built lazily with one indexed query the first time
+    the flight is asked about. After that, "is 22B free" and "next free
+    window seat" are bit operations on a Python int. Writers call
+    ``invalidate`` for the flights they touched. A change of
+    ``PRAGMA data_version`` (a commit from another connection) drops every
+    bitmap.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._flights = {}
+        self._data_version = None
+
+    def _check_external_writes(self):
+        version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+        if version != self._data_version:
+            self._data_version = version
+            self._flights.clear()
+
+    def _load(self, flight_number, date):
+        self._check_external_writes()
+        key = (flight_number, date)
+        if key not in self._flights:
+            row = self.conn.execute(
+                'SELECT aircraft_type FROM flights WHERE flight_number = ? AND date = ?', key
+            ).fetchone()
+            seat_map = SEAT_MAPS.get(row[0] if row else DEFAULT_AIRCRAFT, SEAT_MAPS[DEFAULT_AIRCRAFT])
+            occupied = 0
+            for (seat,) in self.conn.execute(
+                    'SELECT seat_number FROM reservations WHERE flight_number = ? AND date = ?', key):
+                if seat in seat_map.index:
+                    occupied |= 1 << seat_map.index[seat]
+            self._flights[key] = (seat_map, occupied)
+        return self._flights[key]
+
+    def invalidate(self, flight_number, date):
+        self._flights.pop((flight_number, date), None)
+
+    def clear(self):
+        self._flights.clear()
+
+    def is_free(self, flight_number, date, seat_number):
+        seat_map, occupied = self._load(flight_number, date)
+        index = seat_map.index.get(seat_number)
+        return index is not None and not (occupied >> index) & 1
+
+    def next_free_window_seat(self, flight_number, date):
+        seat_map, occupied = self._load(flight_number, date)
+        free = seat_map.window_mask & ~occupied
+        if not free:
+            return None
+        return seat_map.seats[_lowest_bit(free)]
+
+    def next_free_seat(self, flight_number, date):
+        seat_map, occupied = self._load(flight_number, date)
+        free = seat_map.all_mask & ~occupied
+        if not free:
+            return None
+        return seat_map.seats[_lowest_bit(free)]
+
+    def check(self, flight_number, date, seat_number):
+        """Raise ValueError unless the seat exists and nobody holds it"""
+        seat_map, occupied = self._load(flight_number, date)
+        index = seat_map.index.get(seat_number)
+        if index is None:
+            raise ValueError(f"Seat {seat_number} does not exist on {seat_map.aircraft_type} ({flight_number})")
+        if (occupied >> index) & 1:
+            raise seat_taken_error(flight_number, date, seat_number)
+
+    def _with_held(self, seat_map, occupied, held):
+        for seat in held:
+            if seat in seat_map.index:
+                occupied |= 1 << seat_map.index[seat]
+        return occupied
+
+    def allocate(self, flight_number, date, wanted, held=()):
+        """Seats for passengers moving onto a flight, in the order of ``wanted``.
+
+        Each passenger keeps the seat in ``wanted`` if it is free there, and
+        otherwise gets the lowest free seat. Seats in ``held`` (see
+        holds.py) count as taken. Raises ValueError if the flight cannot
+        take them all.
+        """
+        seat_map, occupied = self._load(flight_number, date)
+        occupied = self._with_held(seat_map, occupied, held)
+        free = bin(seat_map.all_mask & ~occupied).count('1')
+        if len(wanted) > free:
+            raise ValueError(f"{flight_number} ({date}) has only {free} free seat(s) "
+                             f"for {len(wanted)} passenger(s)")
+        seats = [None] * len(wanted)
+        # Grant the seats people asked for first, so a fallback handed out
+        # earlier in the list cannot take one of them
+        for i, seat in enumerate(wanted):
+            index = seat_map.index.get(seat)
+            if index is not None and not (occupied >> index) & 1:
+                occupied |= 1 << index
+                seats[i] = seat
+        for i, seat in enumerate(seats):
+            if seat is None:
+                index = _lowest_bit(seat_map.all_mask & ~occupied)
+                occupied |= 1 << index
+                seats[i] = seat_map.seats[index]
+        return seats
+
+    def assign(self, flight_number, date, wanted, held=()):
+        """Seats for new passengers on one flight, in the order of ``wanted``.
+
+        A seat named in ``wanted`` must exist, be free, not be in ``held``
+        and not be named twice; None gets the lowest seat left over.
+        Raises ValueError for the first seat that fails, or if the flight
+        cannot take them all.
+        """
+        seat_map, occupied = self._load(flight_number, date)
+        held = self._with_held(seat_map, 0, held)
+        named = 0
+        for seat in wanted:
+            if seat is None:
+                continue
+            index = seat_map.index.get(seat)
+            if index is None:
+                raise ValueError(f"Seat {seat} does not exist on {seat_map.aircraft_type} ({flight_number})")
+            if (occupied >> index) & 1:
+                raise seat_taken_error(flight_number, date, seat)
+            if (held >> index) & 1:
+                raise ValueError(f"Seat {seat} on {flight_number} ({date}) is held for another booking")
+            if (named >> index) & 1:
+                raise ValueError(f"Seat {seat} on {flight_number} ({date}) is given to two passengers")
+            named |= 1 << index
+        taken = occupied | held | named
+        unseated = sum(seat is None for seat in wanted)
+        free = bin(seat_map.all_mask & ~taken).count('1')
+        if unseated > free:
+            raise ValueError(f"{flight_number} ({date}) has only {free} more free seat(s) "
+                             f"for {unseated} passenger(s)")
+        seats = list(wanted)
+        for i, seat in enumerate(seats):
+            if seat is None:
+                index = _lowest_bit(seat_map.all_mask & ~taken)
+                taken |= 1 << index
+                seats[i] = seat_map.seats[index]
+        return seats
+
+    def shifted(self, flight_number, date, seats, rows, held=()):
+        """New seats for ``seats`` moved ``rows`` rows back (or forward if negative).
+
+        The new seats must exist and be free, except for those the same
+        move vacates, and not in ``held``. Returns ``[(old, new), ...]`` in an order in which
+        they can be updated one by one without two passengers ever
+        sharing a seat.
+        """
+        seat_map, occupied = self._load(flight_number, date)
+        blocked = self._with_held(seat_map, 0, held)
+        moving = 0
+        for seat in seats:
+            if seat in seat_map.index:
+                moving |= 1 << seat_map.index[seat]
+        moves = []
+        for seat in seats:
+            if seat not in seat_map.index:
+                raise ValueError(f"Seat {seat} does not exist on {seat_map.aircraft_type} ({flight_number})")
+            row, letter = int(seat[:-1]), seat[-1]
+            new = f"{row + rows}{letter}"
+            index = seat_map.index.get(new)
+            if index is None:
+                raise ValueError(f"Seat {seat} moved {rows:+d} row(s) would be {new}, "
+                                 f"which does not exist on {seat_map.aircraft_type} ({flight_number})")
+            if (occupied & ~moving) >> index & 1:
+                raise seat_taken_error(flight_number, date, new)
+            if blocked >> index & 1:
+                raise ValueError(f"Seat {new} on {flight_number} ({date}) is held for a booking")
+            moves.append((row, seat, new))
+        # Moving back, the rearmost passenger goes first and frees the seat
+        # the next one needs; moving forward, the frontmost
+        moves.sort(key=lambda move: move[0], reverse=rows > 0)
+        return [(old, new) for _, old, new in moves]
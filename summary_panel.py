@@ -0,0 +1,62 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+class SummaryWindow(tk.Toplevel):
+    """Booking statistics from ``Database.get_summary``, loaded on the DB worker.
+
+    ``db`` is the app's DbWorker. The GROUP BY queries scan whole indexes,
+    so they run off the Tk thread and the window fills in when they are
+    done.
+    """
+
+    TABLES = [
+        ("Busiest flights", 'flights', [("Flight", 100), ("Date", 100), ("Booked", 70)]),
+        ("Load factor by route", 'routes', [("From", 120), ("To", 120), ("Booked", 70),
+                                            ("Seats", 70), ("Load", 60)]),
+        ("Busiest destinations", 'destinations', [("Destination", 150), ("Booked", 70)]),
+    ]
+
+    def __init__(self, parent, db, limit=10):
+        super().__init__(parent)
+        self.title("Booking Summary")
+        self.db = db
+        self.limit = limit
+        self.trees = {}
+
+        for title, key, columns in self.TABLES:
+            ttk.Label(self, text=title, font=('Arial', 12, 'bold')).pack(anchor='w', padx=10, pady=(10, 2))
+            tree = ttk.Treeview(self, columns=[name for name, _ in columns], show='headings', height=min(limit, 8))
+            for name, width in columns:
+                tree.heading(name, text=name)
+                tree.column(name, width=width)
+            tree.pack(fill='x', padx=10)
+            self.trees[key] = tree
+
+        btn_frame = ttk.Frame(self)
+        btn_frame.pack(fill='x', padx=10, pady=10)
+        self.status = ttk.Label(btn_frame)
+        self.status.pack(side=tk.LEFT)
+        ttk.Button(btn_frame, text="Close", command=self.destroy).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(btn_frame, text="Refresh", command=self.refresh).pack(side=tk.RIGHT, padx=5)
+
+        self.refresh()
+
+    def refresh(self):
+        self.status.configure(text="Loading...")
+        self.db.submit('get_summary', self.limit, callback=self.show, errback=self.failed)
+
+    def show(self, summary):
+        if not self.winfo_exists():
+            return
+        for key, tree in self.trees.items():
+            tree.delete(*tree.get_children())
+            for row in summary[key]:
+                if key == 'routes':
+                    row = (*row[:4], f"{row[4]:.0%}")
+                tree.insert('', tk.END, values=row)
+        self.status.configure(text="")
+
+    def failed(self, error):
+        if self.winfo_exists():
+            self.status.configure(text=f"Failed to load summary: {error}")
@@ -0,0 +1,228 @@
+"""Checks and normal forms for reservation fields, shared by the UIs, the API and Database.
+
+Each field is brought to one spelling before it is stored, so equal
+values compare equal and the indexes on them stay useful:
+
+- flight numbers are upper-cased without spaces or dashes (``aa 123`` is
+  ``AA123``);
+- seats lose leading zeros and are upper-cased (``07c`` is ``7C``);
+- dates become ISO ``YYYY-MM-DD``, from ISO or ``YYYY/MM/DD`` input, or
+  from ``DD/MM/YYYY`` and ``DD.MM.YYYY`` (day first, as on tickets);
+- cities take their canonical spelling from ``CITIES`` (see CityTable).
+
+``validate_reservation`` checks one row for the forms. Database also
+normalizes the keys it is given directly (the seat holds, flight
+lookups and bulk reassigns), so raw text from a form cannot miss them.
+``validate_many``
+is the batch mode for bulk paths. It works column by column and
+normalizes each distinct value once. Imports repeat a handful of flights,
+dates and cities over thousands of rows, so most rows cost only a few
+dict lookups.
+"""
+import re
+import sys
+from datetime import date as Date
+
+FIELDS = ('name', 'flight_number', 'departure', 'destination', 'date', 'seat_number')
+
+LABELS = {'name': "Name", 'flight_number': "Flight number", 'departure': "Departure",
+          'destination': "Destination", 'date': "Date", 'seat_number': "Seat number"}
+
+# Two-character airline designator (one may be a digit) or three-letter
+# ICAO code, then the number and an optional operational suffix
+FLIGHT_NUMBER = re.compile(r'(?:[A-Z]{2,3}|[A-Z][0-9]|[0-9][A-Z])[0-9]{1,6}[A-Z]?')
+FLIGHT_SEPARATORS = re.compile(r'[\s-]+')
+SEAT = re.compile(r'0*([1-9][0-9]{0,2})\s*([A-Z])')
+ISO_DATE = re.compile(r'([0-9]{4})[-/]([0-9]{1,2})[-/]([0-9]{1,2})')
+DAY_FIRST_DATE = re.compile(r'([0-9]{1,2})[/.]([0-9]{1,2})[/.]([0-9]{4})')
+WORD = re.compile(r'[^\W\d_]+')
+SPACES = re.compile(r'\s+')
+
+
+def _text(value):
+    return str(value).strip() if value is not None else ''
+
+
+def _required(field, value):
+    if not value:
+        raise ValueError(f"{LABELS[field]} is required")
+    return value
+
+
+def normalize_name(value):
+    return SPACES.sub(' ', _required('name', _text(value)))
+
+
+def normalize_flight_number(value):
+    code = FLIGHT_SEPARATORS.sub('', _required('flight_number', _text(value))).upper()
+    if not FLIGHT_NUMBER.fullmatch(code):
+        raise ValueError(f"Flight number {value!r} should look like AA123")
+    return code
+
+
+def normalize_seat(value):
+    match = SEAT.fullmatch(_required('seat_number', _text(value)).upper())
+    if match is None:
+        raise ValueError(f"Seat number {value!r} should look like 15A")
+    return f'{match.group(1)}{match.group(2)}'
+
+
+def normalize_date(value):
+    text = _required('date', _text(value))
+    match = ISO_DATE.fullmatch(text)
+    if match is not None:
+        year, month, day = match.groups()
+    else:
+        match = DAY_FIRST_DATE.fullmatch(text)
+        if match is None:
+            raise ValueError(f"Date {value!r} should be YYYY-MM-DD")
+        day, month, year = match.groups()
+    try:
+        return Date(int(year), int(month), int(day)).isoformat()
+    except ValueError:
+        raise ValueError(f"Date {value!r} is not a real date")
+
+
+class CityTable:
+    """Canonical spelling of each city, found by a folded key.
+
+    The key ignores case, dots, dashes and runs of spaces, so
+    ``new york``, ``NEW  YORK`` and ``New-York`` are one city. The names
+    are interned, so every row that names a city shares one string. The
+    table is seeded with the cities a database already knows (see
+    ``Database.known_cities``), and learns the cities of rows once they
+    are stored (``update``). ``canonical`` only reads it: a city it has not
+    seen keeps the spelling it was typed in, capitalized if it was typed
+    all in one case, so rejected rows and typos never become canonical.
+    """
+
+    def __init__(self, names=()):
+        self._canonical = {}
+        self.update(names)
+
+    @staticmethod
+    def key(name):
+        return ' '.join(name.casefold().replace('.', ' ').replace('-', ' ').split())
+
+    @staticmethod
+    def _one_case(name):
+        return name.isupper() or name.islower()
+
+    def update(self, names):
+        """Learn spellings; a mixed-case one replaces an all-upper or all-lower one"""
+        for name in names:
+            name = SPACES.sub(' ', _text(name))
+            key = self.key(name)
+            if not key:
+                continue
+            known = self._canonical.get(key)
+            if known is None or (self._one_case(known) and not self._one_case(name)):
+                self._canonical[key] = sys.intern(name)
+
+    def canonical(self, name, field='departure'):
+        name = SPACES.sub(' ', _required(field, _text(name)))
+        key = self.key(name)
+        city = self._canonical.get(key)
+        if city is None:
+            if self._one_case(name):
+                name = WORD.sub(lambda match: match.group().capitalize(), name.lower())
+            city = sys.intern(name)
+        return city
+
+    def __len__(self):
+        return len(self._canonical)
+
+
+CITIES = CityTable()
+
+
+def normalize_departure(value):
+    return CITIES.canonical(value, 'departure')
+
+
+def normalize_destination(value):
+    return CITIES.canonical(value, 'destination')
+
+
+def _optional_seat(value):
+    return normalize_seat(value) if _text(value) else None
+
+
+NORMALIZERS = (normalize_name, normalize_flight_number, normalize_departure, normalize_destination,
+               normalize_date, normalize_seat)
+
+# Group bookings may leave the seat for Database.create_booking to choose
+PASSENGER_NORMALIZERS = NORMALIZERS[:5] + (_optional_seat,)
+
+
+def _check_route(data):
+    if data[2] == data[3]:
+        raise ValueError("Departure and destination must be different")
+    return data
+
+
+def _check_length(data):
+    if len(data) != len(FIELDS):
+        raise ValueError(f"Expected {len(FIELDS)} fields, got {len(data)}")
+
+
+def validate_reservation(data):
+    """Check one reservation tuple (in FIELDS order) before it is written.
+
+    Returns the tuple in normal form, or raises ValueError with a message
+    fit for a message box.
+    """
+    _check_length(data)
+    return _check_route(tuple(normalize(value) for normalize, value in zip(NORMALIZERS, data)))
+
+
+def validate_passenger(data):
+    """``validate_reservation`` for one passenger of a group booking.
+
+    The seat may be left blank, and comes back as None for
+    ``Database.create_booking`` to fill in.
+    """
+    _check_length(data)
+    return _check_route(tuple(normalize(value) for normalize, value in zip(PASSENGER_NORMALIZERS, data)))
+
+
+def validate_many(rows, seat_required=True):
+    """Batch ``validate_reservation``: one result per row, in order.
+
+    Each result is the normalized tuple, or the ValueError for that row;
+    nothing is raised, so one bad row does not stop the rest. With
+    ``seat_required=False`` rows are checked as in ``validate_passenger``.
+    """
+    rows = [tuple(row) for row in rows]
+    shaped = [row for row in rows if len(row) == len(FIELDS)]
+    columns = []
+    # Columns holding at least one bad value; only those are looked at per row
+    failing = []
+    for index, (normalize, values) in enumerate(zip(NORMALIZERS if seat_required else PASSENGER_NORMALIZERS,
+                                                    zip(*shaped))):
+        try:
+            distinct = set(values)
+        except TypeError:
+            values = [_text(value) for value in values]
+            distinct = set(values)
+        done = {}
+        for value in distinct:
+            try:
+                done[value] = normalize(value)
+            except ValueError as e:
+                done[value] = e
+                if not failing or failing[-1] != index:
+                    failing.append(index)
+        columns.append(list(map(done.__getitem__, values)))
+    normalized = iter(zip(*columns))
+    results = []
+    for row in rows:
+        if len(row) != len(FIELDS):
+            results.append(ValueError(f"Expected {len(FIELDS)} fields, got {len(row)}"))
+            continue
+        data = next(normalized)
+        error = next((data[i] for i in failing if isinstance(data[i], ValueError)), None)
+        if error is None and data[2] == data[3]:
+            error = ValueError("Departure and destination must be different")
+        results.append(error or data)
+    return results
@@ -0,0 +1,433 @@
+from tkinter import ttk
+
+
+def run_inline(fn, callback=None, errback=None):
+    """Default ``run`` for VirtualTreeview: call ``fn`` right away"""
+    try:
+        result = fn()
+    except Exception as e:
+        if errback is None:
+            raise
+        errback(e)
+        return
+    if callback is not None:
+        callback(result)
+
+
+class VirtualTreeview(ttk.Treeview):
+    """Treeview that only materializes the rows currently on screen.
+
+    Rows come from ``fetch_page(limit, after_id=None, before_id=None, offset=0)``
+    in pages, and the total from ``count_rows()``. Scrolling one row or one
+    page at a time continues from the first/last cached id (keyset
+    pagination). Only long jumps from dragging the scrollbar fall back to
+    an OFFSET query. At most ``visible_rows`` Treeview items exist at any
+    time, backed by a cache of roughly ``visible_rows + 2 * buffer_rows`` rows.
+
+    With ``fetch_rows(ids)`` and ``collect_changes()`` (see ``ChangeTracker``)
+    the view can be patched in place with ``sync`` instead of reloaded.
+    Pending changes are also applied before every page fetch, so pages read
+    from the live table never mix with a stale cache.
+
+    ``set_filters`` narrows the view. The filters are passed on as
+    ``filters=`` to ``count_rows`` and ``fetch_page``. ``set_sort`` passes
+    ``sort=(column, descending)`` to ``fetch_page``, and ``make_sortable``
+    wires it to heading clicks. While a filter or sort is active, ``sync``
+    re-queries the window instead of patching it, because a changed row
+    may have moved in or out of the result set, or to another position.
+
+    Most rows have no Treeview item, so the selection is kept by id in
+    ``selected_ids`` and re-applied on every render; it survives scrolling
+    and syncs, and a plain click starts it afresh. With ``fetch_ids(filters=...)``
+    ``select_all`` (Ctrl+A) selects every row matching the filters, on
+    screen or not.
+
+    Data access goes through ``run(fn, callback=..., errback=...)``. Pass
+    ``DbWorker.submit`` to keep the queries off the Tk thread. While a
+    request is in flight, scrolling only moves the target offset, and the
+    view catches up when the answer arrives.
+    """
+
+    # More changes than this (or a tracker overflow) are cheaper to reload
+    patch_limit = 1000
+
+    def __init__(self, parent, count_rows, fetch_page, fetch_rows=None, collect_changes=None,
+                 run=run_inline, buffer_rows=50, fetch_ids=None, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.count_rows = count_rows
+        self.fetch_page = fetch_page
+        self.fetch_rows = fetch_rows
+        self.collect_changes = collect_changes
+        self.fetch_ids = fetch_ids
+        self.run = run
+        self.buffer_rows = buffer_rows
+        self.visible_rows = int(kwargs.get('height', 10))
+        self.total = 0
+        self.offset = 0
+        self.selected_ids = set()
+        self.loaded = False
+        self.filters = None
+        self.sort = None
+        self._sort_columns = {}
+        self._headings = {}
+        self._cache = []
+        self._cache_start = 0
+        self._changed = set()
+        self._generation = 0
+        self._pending = False
+        self._pulled = False
+        self._sync_requested = False
+        self._scrollbar = None
+        self._footer = None
+
+        self.bind('<Configure>', self._on_configure)
+        self.bind('<MouseWheel>', self._on_mousewheel)
+        self.bind('<Button-4>', lambda e: self._scroll_by(-3))
+        self.bind('<Button-5>', lambda e: self._scroll_by(3))
+        self.bind('<Prior>', lambda e: self._scroll_by(-self.visible_rows))
+        self.bind('<Next>', lambda e: self._scroll_by(self.visible_rows))
+        self.bind('<ButtonPress-1>', self._on_click)
+        self.bind('<<TreeviewSelect>>', self._on_select)
+        self.bind('<Control-a>', lambda e: self.select_all() or 'break')
+
+    def attach_scrollbar(self, scrollbar):
+        self._scrollbar = scrollbar
+        scrollbar.configure(command=self.yview)
+        self._update_scrollbar()
+
+    def attach_footer(self, label):
+        self._footer = label
+        self._update_footer()
+
+    def refresh(self):
+        """Re-count the rows and re-fetch the window at the current offset"""
+        self._generation += 1
+        self._pending = False
+        self._sync_requested = False
+        filters = self.filters
+        self._request(lambda: self._count(filters), self._on_count)
+
+    def set_filters(self, filters):
+        """Show only rows matching ``filters`` (None or {} shows everything)"""
+        self.filters = filters or None
+        self.offset = 0
+        # Rows the new filter hides must not stay selected out of sight
+        self.selected_ids.clear()
+        self.refresh()
+
+    def set_sort(self, sort):
+        """Order rows by ``(column, descending)``; None restores newest first"""
+        self.sort = sort
+        self.offset = 0
+        self.refresh()
+
+    def make_sortable(self, columns):
+        """Sort on heading clicks; ``columns`` maps Treeview columns to sort columns.
+
+        The first click sorts ascending, the next one descending, and so on.
+        The active heading shows an arrow.
+        """
+        self._sort_columns = dict(columns)
+        for column in self._sort_columns:
+            self._headings[column] = self.heading(column, 'text')
+            self.heading(column, command=lambda c=column: self._on_heading(c))
+
+    def _on_heading(self, column):
+        key = self._sort_columns[column]
+        descending = bool(self.sort and self.sort[0] == key and not self.sort[1])
+        for other, text in self._headings.items():
+            arrow = (' \u25bc' if descending else ' \u25b2') if other == column else ''
+            self.heading(other, text=text + arrow)
+        self.set_sort((key, descending))
+
+    def select_all(self):
+        """Select every row matching the current filters, through ``fetch_ids``"""
+        if self.fetch_ids is None or not self.loaded:
+            return
+        filters = self.filters
+        self._request(lambda: self.fetch_ids(filters=filters) if filters else self.fetch_ids(),
+                      self._on_ids)
+
+    def _on_ids(self, ids):
+        self.selected_ids = set(ids)
+
+    def _on_click(self, event):
+        # Without Ctrl or Shift a click selects one row; drop the rows
+        # selected off screen too, or they would ride along unseen
+        if not event.state & 0x0005 and self.identify_region(event.x, event.y) in ('cell', 'tree'):
+            self.selected_ids.clear()
+
+    def _on_select(self, event=None):
+        self.selected_ids.difference_update(int(iid) for iid in self.get_children())
+        self.selected_ids.update(int(iid) for iid in self.selection())
+        self._update_footer()
+
+    def sync(self):
+        """Apply whatever ``collect_changes`` reports since the last sync"""
+        if not self.loaded or self.filters or self.sort:
+            self.refresh()
+            return
+        self._sync_requested = True
+        self._show()
+
+    def _count(self, filters):
+        if self.collect_changes is not None:
+            self.collect_changes()
+        if filters:
+            return self.count_rows(filters=filters)
+        return self.count_rows()
+
+    def _on_count(self, total):
+        self.total = total
+        self.loaded = True
+        self._cache = []
+        self._cache_start = 0
+        self._pulled = True
+
+    def _request(self, fn, on_result):
+        generation = self._generation
+        self._pending = True
+
+        def done(result):
+            if generation != self._generation:
+                return
+            self._pending = False
+            on_result(result)
+            self._show()
+
+        def failed(error):
+            if generation != self._generation:
+                return
+            self._pending = False
+            if self._footer is not None:
+                self._footer.configure(text=f"Failed to load reservations: {error}")
+
+        self.run(fn, callback=done, errback=failed)
+
+    def _pull(self):
+        """Worker side of a sync: collect changed ids and read those rows"""
+        changes = self.collect_changes()
+        if changes is None or len(changes) > self.patch_limit:
+            return None
+        ids = [rid for rid, op in changes.items() if op != 'delete']
+        return changes, self.fetch_rows(ids) if ids else []
+
+    def _on_pulled(self, result):
+        if result is None:
+            self.refresh()
+            return
+        changes, rows = result
+        self._pulled = True
+        self._patch(changes, {row[0]: row for row in rows})
+
+    def _patch(self, changes, rows):
+        """Patch the cache with ``{id: 'insert'|'update'|'delete'}`` changes.
+
+        Only the matching Treeview items end up inserted, updated or deleted
+        on the next render. Rows that land above the window shift the
+        offset so the visible rows stay put.
+        """
+        positions = {row[0]: i for i, row in enumerate(self._cache)}
+        removed = set()
+
+        for rid, op in changes.items():
+            row = rows.get(rid)
+            if rid in positions:
+                if row is None:
+                    removed.add(rid)
+                    if self._cache_start + positions[rid] < self.offset:
+                        self.offset -= 1
+                else:
+                    self._cache[positions[rid]] = row
+                    self._changed.add(rid)
+            elif row is not None and op == 'insert':
+                self._insert_row(row)
+            elif op == 'delete':
+                self.selected_ids.discard(rid)
+                self.total -= 1
+                if self._cache and rid > self._cache[0][0]:
+                    self._cache_start -= 1
+                    self.offset -= 1
+
+        if removed:
+            self.selected_ids.difference_update(removed)
+            self._cache = [row for row in self._cache if row[0] not in removed]
+            self.total -= len(removed)
+        self.offset = max(0, self.offset)
+        self._cache_start = max(0, self._cache_start)
+
+    def _insert_row(self, row):
+        at_end = self._cache_start + len(self._cache) >= self.total
+        self.total += 1
+        if self._cache and row[0] < self._cache[-1][0] and not at_end:
+            return
+        if self._cache and row[0] > self._cache[0][0] and self._cache_start > 0:
+            self._cache_start += 1
+            self.offset += 1
+            return
+        index = 0
+        while index < len(self._cache) and self._cache[index][0] > row[0]:
+            index += 1
+        self._cache.insert(index, row)
+        if self._cache_start + index < self.offset:
+            self.offset += 1
+
+    def yview(self, *args):
+        if not args:
+            return self._fractions()
+        if args[0] == 'moveto':
+            self.offset = int(float(args[1]) * self.total)
+            self._show()
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= self.visible_rows
+            self._scroll_by(step)
+
+    def _scroll_by(self, rows):
+        self.offset += rows
+        self._show()
+        return 'break'
+
+    def _on_mousewheel(self, event):
+        return self._scroll_by(-3 if event.delta > 0 else 3)
+
+    def _on_configure(self, event):
+        children = self.get_children()
+        bbox = self.bbox(children[0]) if children else None
+        if bbox:
+            heading, rowheight = bbox[1], bbox[3]
+        else:
+            heading = rowheight = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        visible = max(1, (event.height - heading) // rowheight)
+        if visible != self.visible_rows:
+            self.visible_rows = visible
+            self._show()
+
+    def _show(self):
+        if self._pending or not self.loaded:
+            return
+        if self._sync_requested and self.collect_changes is not None:
+            self._sync_requested = False
+            self._request(self._pull, self._on_pulled)
+            return
+
+        self.offset = max(0, min(self.offset, self.total - self.visible_rows))
+        fetch = self._plan_fetch(self.offset, min(self.offset + self.visible_rows, self.total))
+        if fetch is not None:
+            if not self._pulled and self.collect_changes is not None:
+                self._request(self._pull, self._on_pulled)
+            else:
+                self._pulled = False
+                kwargs, store = fetch
+                if self.filters:
+                    kwargs['filters'] = self.filters
+                if self.sort:
+                    kwargs['sort'] = self.sort
+                self._request(lambda: self.fetch_page(**kwargs), store)
+            return
+
+        start = self.offset - self._cache_start
+        self._render(self._cache[start:start + self.visible_rows], self._changed)
+        self._changed = set()
+        self._pulled = False
+        self._update_scrollbar()
+        self._update_footer()
+
+    def _plan_fetch(self, first, last):
+        """Return ``(fetch_page kwargs, store callback)``, or None if cached"""
+        cache_end = self._cache_start + len(self._cache)
+        if last <= first or (self._cache and self._cache_start <= first and last <= cache_end):
+            return None
+
+        if self._cache and first >= self._cache_start and last - cache_end <= self.buffer_rows:
+            limit = last - cache_end + self.buffer_rows
+
+            def store(rows):
+                self._cache.extend(rows)
+                if len(rows) < limit:
+                    self.total = self._cache_start + len(self._cache)
+                self._trim_cache(first)
+
+            return dict(limit=limit, after_id=self._cache[-1][0]), store
+
+        if self._cache and last <= cache_end and self._cache_start - first <= self.buffer_rows:
+            limit = self._cache_start - first + self.buffer_rows
+
+            def store(rows):
+                self._cache[:0] = rows
+                self._cache_start -= len(rows)
+                if len(rows) < limit and self._cache_start:
+                    self.offset -= self._cache_start
+                    self.total -= self._cache_start
+                    self._cache_start = 0
+                self._trim_cache(first)
+
+            return dict(limit=limit, before_id=self._cache[0][0]), store
+
+        start = max(0, first - self.buffer_rows)
+        limit = last - start + self.buffer_rows
+
+        def store(rows):
+            self._cache = rows
+            self._cache_start = start
+            if len(rows) < limit:
+                self.total = start + len(rows)
+            self._trim_cache(first)
+
+        return dict(limit=limit, offset=start), store
+
+    def _trim_cache(self, first):
+        keep = self.visible_rows + 2 * self.buffer_rows
+        if len(self._cache) <= keep:
+            return
+        drop = max(0, min(first - self.buffer_rows - self._cache_start, len(self._cache) - keep))
+        del self._cache[:drop]
+        self._cache_start += drop
+        del self._cache[keep:]
+
+    def _render(self, rows, changed=()):
+        """Bring the Treeview items in line with ``rows`` by iid.
+
+        Items that stay on screen are only moved; their values are rewritten
+        only when their id is in ``changed``.
+        """
+        wanted = [str(row[0]) for row in rows]
+        stale = set(self.get_children()) - set(wanted)
+        if stale:
+            self.delete(*stale)
+        for index, (iid, row) in enumerate(zip(wanted, rows)):
+            if not self.exists(iid):
+                self.insert('', index, iid=iid, values=row)
+                continue
+            if row[0] in changed:
+                self.item(iid, values=row)
+            if self.index(iid) != index:
+                self.move(iid, '', index)
+        selected = [iid for iid in wanted if int(iid) in self.selected_ids]
+        if set(selected) != set(self.selection()):
+            self.selection_set(selected)
+
+    def _fractions(self):
+        if not self.total:
+            return (0.0, 1.0)
+        first = self.offset / self.total
+        last = min(1.0, (self.offset + self.visible_rows) / self.total)
+        return (first, last)
+
+    def _update_scrollbar(self):
+        if self._scrollbar is not None:
+            self._scrollbar.set(*self._fractions())
+
+    def _update_footer(self):
+        if self._footer is None:
+            return
+        if self.total:
+            last = min(self.total, self.offset + self.visible_rows)
+            kind = "matching reservations" if self.filters else "reservations"
+            text = f"Showing {self.offset + 1}-{last} of {self.total} {kind}"
+            if self.selected_ids:
+                text += f", {len(self.selected_ids)} selected"
+        else:
+            text = "No matching reservations" if self.filters else "No reservations"
+        self._footer.configure(text=text)